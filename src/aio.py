@@ -0,0 +1,181 @@
+import asyncio
+import io
+import sys
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.util import await_only, greenlet_spawn
+from werkzeug.exceptions import HTTPException
+
+
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+# Blueprints whose GET endpoints are served on the event loop. The comments blueprint is registered both on its own
+# and under posts, and its own rules answer /posts/<post_id>/comments.
+ASYNC_BLUEPRINTS = frozenset({"posts", "posts.comments", "comments", "threads", "likes", "follower"})
+
+
+def async_url(url):
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver is configured for '{backend}' databases.")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+class Database(SQLAlchemy):
+    """
+    Flask-SQLAlchemy extension that creates the engines of apps with DATABASE_ASYNC set on an asyncio driver
+    (asyncpg or aiosqlite). Those apps must be called inside sqlalchemy's greenlet_spawn, as AsyncReads does; every
+    query then waits for the database on the event loop instead of blocking the thread, exactly as an AsyncSession
+    would, while the views keep using the ordinary db.session.
+
+    SQLite connections of either kind get foreign keys switched on, so the ON DELETE CASCADE of the models applies
+    there as it does on PostgreSQL.
+    """
+
+    def _make_engine(self, bind_key, options, app):
+        if app.config.get("DATABASE_ASYNC"):
+            options = dict(options)
+            engine = create_async_engine(async_url(options.pop("url")), **options).sync_engine
+        else:
+            engine = super()._make_engine(bind_key, options, app)
+        if engine.dialect.name == "sqlite":
+            event.listen(engine, "connect", enable_foreign_keys)
+        return engine
+
+
+def enable_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def wsgi_environ(scope, body):
+    """
+    Builds the WSGI environ of an ASGI HTTP request whose body has been read.
+    """
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("ascii"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+    for name, value in scope["headers"]:
+        name = name.decode("latin-1")
+        if name == "content-length":
+            key = "CONTENT_LENGTH"
+        elif name == "content-type":
+            key = "CONTENT_TYPE"
+        else:
+            key = "HTTP_" + name.upper().replace("-", "_")
+        value = value.decode("latin-1")
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+def run_wsgi(app, environ, send):
+    """
+    Calls a WSGI app and passes its response to send() as ASGI messages, one body message per chunk, so streamed
+    responses are sent as they are produced.
+    """
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response["start"] = {
+            "type": "http.response.start",
+            "status": int(status.split(" ", 1)[0]),
+            "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+        }
+
+    body = app(environ, start_response)
+    try:
+        send(response["start"])
+        for chunk in body:
+            if chunk:
+                send({"type": "http.response.body", "body": chunk, "more_body": True})
+        send({"type": "http.response.body", "body": b"", "more_body": False})
+    finally:
+        if hasattr(body, "close"):
+            body.close()
+
+
+class AsyncReads:
+    """
+    ASGI application holding many slow requests in one process.
+
+    GET requests to the post, thread, comment, like and follower blueprints are served by an app created with
+    async engines, inside greenlets on the event loop, so a request waiting on the database costs a greenlet rather
+    than a worker thread. Every other request, including all writes and password hashing, is served by the regular
+    app in the event loop's thread pool. The async app reads a redis response cache with an asyncio client, so cache
+    and read-after-write lookups do not block the loop either.
+
+    Args:
+        async_app (Flask): App created with create_app(async_engines=True, sync_app=sync_app).
+        sync_app (Flask): App created with create_app().
+    """
+
+    def __init__(self, async_app, sync_app):
+        self.async_app = async_app
+        self.sync_app = sync_app
+        self.urls = async_app.url_map.bind("localhost")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+        if scope["type"] != "http":
+            raise ValueError(f"Unsupported ASGI scope type '{scope['type']}'.")
+
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        environ = wsgi_environ(scope, body)
+
+        if self.is_async_read(scope):
+            await greenlet_spawn(run_wsgi, self.async_app, environ, lambda message: await_only(send(message)))
+        else:
+            loop = asyncio.get_running_loop()
+            await asyncio.to_thread(
+                run_wsgi, self.sync_app, environ, lambda message: asyncio.run_coroutine_threadsafe(send(message), loop).result()
+            )
+
+    def is_async_read(self, scope):
+        if scope["method"] not in ("GET", "HEAD"):
+            return False
+        try:
+            endpoint, _ = self.urls.match(scope["path"], method="GET")
+        except HTTPException:
+            return False
+        return endpoint.rpartition(".")[0] in ASYNC_BLUEPRINTS
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await greenlet_spawn(self.dispose)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def dispose(self):
+        with self.async_app.app_context():
+            for engine in self.async_app.extensions["sqlalchemy"].engines.values():
+                engine.dispose()
@@ -0,0 +1,7 @@
+from aio import AsyncReads
+from main import create_app
+
+
+# Serve with any ASGI server, e.g. `uvicorn asgi:app`.
+sync_app = create_app()
+app = AsyncReads(create_app(async_engines=True, sync_app=sync_app), sync_app)
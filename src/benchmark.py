@@ -0,0 +1,364 @@
+import json
+import os
+import platform
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+import click
+from sqlalchemy import event
+
+
+SEED_OPTIONS = ("users", "posts", "threads", "comments", "likes", "follows")
+
+
+class StatementCounter:
+    """
+    Counts the SQL statements executed by each thread. The test client runs every request in the calling thread,
+    so the count read after a request is the number of statements that request issued.
+    """
+
+    def __init__(self, engine):
+        self._local = threading.local()
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self._local.count = getattr(self._local, "count", 0) + 1
+
+    def reset(self):
+        self._local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self._local, "count", 0)
+
+
+class Recorder:
+    """
+    Collects the latency, status code and statement count of every request, grouped by route.
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statements = defaultdict(int)
+        self.statuses = defaultdict(Counter)
+        self._lock = threading.Lock()
+
+    def record(self, route, seconds, status, statements):
+        with self._lock:
+            self.latencies[route].append(seconds * 1000)
+            self.statements[route] += statements
+            self.statuses[route][status] += 1
+
+    def report(self, elapsed):
+        routes = {route: self.summarise(route, elapsed) for route in sorted(self.latencies)}
+        everything = [latency for latencies in self.latencies.values() for latency in latencies]
+        totals = summarise(
+            everything,
+            sum(self.statements.values()),
+            sum(self.statuses.values(), Counter()),
+            elapsed
+        )
+        return {"totals": totals, "routes": routes}
+
+    def summarise(self, route, elapsed):
+        return summarise(self.latencies[route], self.statements[route], self.statuses[route], elapsed)
+
+
+def percentile(ordered, fraction):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not ordered:
+        return None
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+def summarise(latencies, statements, statuses, elapsed):
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        "requests": count,
+        "errors": sum(total for status, total in statuses.items() if status >= 500),
+        "statuses": {str(status): total for status, total in sorted(statuses.items())},
+        "requests_per_sec": round(count / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(ordered, 0.50), 3) if count else None,
+        "p95_ms": round(percentile(ordered, 0.95), 3) if count else None,
+        "p99_ms": round(percentile(ordered, 0.99), 3) if count else None,
+        "mean_ms": round(sum(ordered) / count, 3) if count else None,
+        "max_ms": round(ordered[-1], 3) if count else None,
+        "sql_per_request": round(statements / count, 2) if count else None,
+    }
+
+
+class VirtualUser:
+    """
+    One simulated client: a logged-in seeded user with its own test client, issuing requests from the workload mix.
+
+    Handlers that act on the client's own earlier writes return None while there is nothing to act on yet.
+    """
+
+    def __init__(self, app, dataset, password, rng):
+        self.client = app.test_client()
+        self.dataset = dataset
+        self.rng = rng
+        self.user_id = rng.randint(*dataset["users"])
+        self.own_posts = []
+        self.own_likes = []
+        self.follows = []
+        response = self.client.post("/auth/login", json={"email": f"seed{self.user_id}@example.com", "password": password})
+        if response.status_code != 200:
+            raise click.ClickException(f"Login as seed{self.user_id} failed with status {response.status_code}.")
+        self.headers = {"Authorization": f"Bearer {response.get_json()['token']}"}
+        self.password = password
+
+    def pick(self, kind):
+        low, high = self.dataset[kind]
+        return self.rng.randint(low, high)
+
+    def words(self, count):
+        return " ".join(self.rng.choice(("load", "test", "flask", "benchmark", "latency", "post")) for _ in range(count))
+
+    # READS
+
+    def list_posts(self):
+        return self.client.get("/posts/?limit=20")
+
+    def view_post(self):
+        return self.client.get(f"/posts/{self.pick('posts')}")
+
+    def list_comments(self):
+        return self.client.get(f"/posts/{self.pick('posts')}/comments/?limit=20")
+
+    def list_likes(self):
+        return self.client.get(f"/posts/{self.pick('posts')}/likes/")
+
+    def list_threads(self):
+        return self.client.get("/threads/?limit=20")
+
+    def view_thread(self):
+        return self.client.get(f"/threads/{self.pick('threads')}")
+
+    def list_thread_posts(self):
+        return self.client.get(f"/posts/threads/{self.pick('threads')}?limit=20")
+
+    def list_followers(self):
+        return self.client.get(f"/users/{self.pick('users')}/followers")
+
+    def list_following(self):
+        return self.client.get(f"/users/{self.pick('users')}/following")
+
+    def view_profile(self):
+        return self.client.get(f"/auth/user/{self.pick('users')}")
+
+    def view_feed(self):
+        return self.client.get("/feed/?limit=20", headers=self.headers)
+
+    # WRITES
+
+    def create_post(self):
+        response = self.client.post("/posts/", json={"body": self.words(12)}, headers=self.headers)
+        if response.status_code == 201:
+            self.own_posts.append(response.get_json()["id"])
+        return response
+
+    def edit_post(self):
+        if not self.own_posts:
+            return None
+        post_id = self.rng.choice(self.own_posts)
+        return self.client.patch(f"/posts/{post_id}", json={"body": self.words(12)}, headers=self.headers)
+
+    def create_comment(self):
+        return self.client.post(f"/posts/{self.pick('posts')}/comments/", json={"comment_body": self.words(6)}, headers=self.headers)
+
+    def like_post(self):
+        post_id = self.pick("posts")
+        response = self.client.post(f"/posts/{post_id}/likes/", headers=self.headers)
+        if response.status_code == 201:
+            self.own_likes.append((post_id, response.get_json()["id"]))
+        return response
+
+    def unlike_post(self):
+        if not self.own_likes:
+            return None
+        post_id, like_id = self.own_likes.pop()
+        return self.client.delete(f"/posts/{post_id}/likes/{like_id}", headers=self.headers)
+
+    def follow_user(self):
+        user_id = self.pick("users")
+        response = self.client.post("/users/follow", json={"followed_id": user_id}, headers=self.headers)
+        if response.status_code == 201:
+            self.follows.append(user_id)
+        return response
+
+    def unfollow_user(self):
+        if not self.follows:
+            return None
+        return self.client.delete(f"/users/{self.follows.pop()}/unfollow", headers=self.headers)
+
+    def create_thread(self):
+        return self.client.post("/threads/", json={"title": self.words(3), "content": self.words(20)}, headers=self.headers)
+
+    def post_to_thread(self):
+        return self.client.post(f"/posts/threads/{self.pick('threads')}", json={"body": self.words(12)}, headers=self.headers)
+
+    def login(self):
+        return self.client.post("/auth/login", json={"email": f"seed{self.user_id}@example.com", "password": self.password})
+
+
+# Route name, handler and relative weight within its side of the read/write mix.
+READ_MIX = (
+    ("GET /posts/", VirtualUser.list_posts, 10),
+    ("GET /posts/<post_id>", VirtualUser.view_post, 20),
+    ("GET /posts/<post_id>/comments/", VirtualUser.list_comments, 8),
+    ("GET /posts/<post_id>/likes/", VirtualUser.list_likes, 5),
+    ("GET /threads/", VirtualUser.list_threads, 4),
+    ("GET /threads/<thread_id>", VirtualUser.view_thread, 6),
+    ("GET /posts/threads/<thread_id>", VirtualUser.list_thread_posts, 4),
+    ("GET /users/<user_id>/followers", VirtualUser.list_followers, 4),
+    ("GET /users/<user_id>/following", VirtualUser.list_following, 4),
+    ("GET /auth/user/<user_id>", VirtualUser.view_profile, 6),
+    ("GET /feed/", VirtualUser.view_feed, 15),
+)
+
+WRITE_MIX = (
+    ("POST /posts/", VirtualUser.create_post, 6),
+    ("PATCH /posts/<post_id>", VirtualUser.edit_post, 2),
+    ("POST /posts/<post_id>/comments/", VirtualUser.create_comment, 5),
+    ("POST /posts/<post_id>/likes/", VirtualUser.like_post, 6),
+    ("DELETE /posts/<post_id>/likes/<like_id>", VirtualUser.unlike_post, 2),
+    ("POST /users/follow", VirtualUser.follow_user, 3),
+    ("DELETE /users/<user_id>/unfollow", VirtualUser.unfollow_user, 1),
+    ("POST /threads/", VirtualUser.create_thread, 1),
+    ("POST /posts/threads/<thread_id>", VirtualUser.post_to_thread, 2),
+    ("POST /auth/login", VirtualUser.login, 1),
+)
+
+
+def seeded_ranges(db):
+    """
+    Returns the (min, max) ID ranges of the users created by seed-scale and of all threads and posts.
+    """
+    from models.user import User
+    from models.post import Post
+    from models.thread import InnovationThread
+
+    seeded = db.select(db.func.min(User.id), db.func.max(User.id)).where(User.email.like("seed%@example.com"))
+    ranges = {"users": db.session.execute(seeded).one()}
+    for name, model in (("posts", Post), ("threads", InnovationThread)):
+        ranges[name] = db.session.execute(db.select(db.func.min(model.id), db.func.max(model.id))).one()
+    for name, (low, high) in ranges.items():
+        if low is None:
+            raise click.ClickException(f"The database has no {name}. Run with --seed or `flask db seed-scale` first.")
+    return {name: tuple(bounds) for name, bounds in ranges.items()}
+
+def dataset_size(dataset, name):
+    low, high = dataset[name]
+    return high - low + 1
+
+def run_client(user, reads, writes, write_ratio, deadline, counter, recorder):
+    while time.perf_counter() < deadline:
+        side = writes if writes and (not reads or user.rng.random() < write_ratio) else reads
+        route, handler, _ = user.rng.choices(side, weights=[weight for _, _, weight in side])[0]
+        counter.reset()
+        started = time.perf_counter()
+        response = handler(user)
+        if response is not None:
+            recorder.record(route, time.perf_counter() - started, response.status_code, counter.count)
+
+
+@click.command()
+@click.option("--database-url", default="sqlite:///benchmark.db", show_default=True, help="Database the app is built against.")
+@click.option("--seed/--no-seed", default=True, show_default=True, help="Recreate and seed the database before running.")
+@click.option("--users", default=1000, show_default=True)
+@click.option("--posts", default=10000, show_default=True)
+@click.option("--threads", default=200, show_default=True)
+@click.option("--comments", default=20000, show_default=True)
+@click.option("--likes", default=50000, show_default=True)
+@click.option("--follows", default=20000, show_default=True)
+@click.option("--password", default="123456", show_default=True, help="Password of the seeded users.")
+@click.option("--clients", default=4, show_default=True, help="Number of concurrent clients.")
+@click.option("--duration", default=30.0, show_default=True, help="Seconds to drive load for.")
+@click.option("--write-ratio", default=0.1, show_default=True, help="Fraction of requests that are writes.")
+@click.option("--routes", "route_filter", default=None, help="Comma separated substrings; only matching routes are driven.")
+@click.option("--random-seed", type=int, default=None, help="Seed for a reproducible request sequence.")
+@click.option("--output", type=click.File("w"), default="-", show_default=True, help="File the JSON report is written to.")
+def benchmark(database_url, seed, password, clients, duration, write_ratio, route_filter, random_seed, output, **scale):
+    """
+    Drives a read/write request mix against the app built by create_app and reports per-route latency percentiles,
+    throughput and SQL statements per request as JSON.
+
+    Requests are made through Flask's test client from one thread per client, so the figures measure the application
+    and database rather than a WSGI server, and are meant to be compared between runs on the same machine.
+    """
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+    # A fixed hashing cost keeps login latency comparable between machines; calibration would change it.
+    os.environ.setdefault("BCRYPT_LOG_ROUNDS", "10")
+
+    from main import create_app
+    from init import db
+
+    app = create_app()
+    if seed:
+        runner = app.test_cli_runner()
+        seed_args = [arg for name in SEED_OPTIONS for arg in (f"--{name}", str(scale[name]))]
+        seed_args += ["--password", password]
+        if random_seed is not None:
+            seed_args += ["--random-seed", str(random_seed)]
+        for args in (["db", "drop"], ["db", "create"], ["db", "seed-scale", *seed_args]):
+            result = runner.invoke(args=args)
+            if result.exit_code != 0:
+                raise click.ClickException(f"`flask {' '.join(args)}` failed: {result.output or result.exception}")
+
+    with app.app_context():
+        dataset = seeded_ranges(db)
+        dialect = db.engine.dialect.name
+        counter = StatementCounter(db.engine)
+
+    def selected(mix):
+        return [entry for entry in mix if not route_filter or any(part in entry[0] for part in route_filter.split(","))]
+
+    reads, writes = selected(READ_MIX), selected(WRITE_MIX)
+    if not reads and not writes:
+        raise click.ClickException(f"No route matches '{route_filter}'.")
+
+    rng = random.Random(random_seed)
+    users = [VirtualUser(app, dataset, password, random.Random(rng.random())) for _ in range(clients)]
+    recorder = Recorder()
+    started = time.perf_counter()
+    deadline = started + duration
+    workers = [
+        threading.Thread(target=run_client, args=(user, reads, writes, write_ratio, deadline, counter, recorder))
+        for user in users
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "database": dialect,
+            "python": platform.python_version(),
+            "clients": clients,
+            "duration_s": duration,
+            "write_ratio": write_ratio,
+            "routes": route_filter,
+            "random_seed": random_seed,
+            "scale": {name: dataset_size(dataset, name) for name in ("users", "posts", "threads")},
+            "response_cache": app.config["RESPONSE_CACHE_BACKEND"],
+            "bcrypt_log_rounds": app.config["BCRYPT_LOG_ROUNDS"],
+        },
+        **recorder.report(elapsed),
+    }
+    json.dump(report, output, indent=2)
+    output.write("\n")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,380 @@
+import fnmatch
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import inspect
+from sqlalchemy.util import await_only
+
+
+class LocalBackend:
+    """
+    In-process LRU store with per-entry expiry.
+
+    Every worker process keeps its own copy, so an invalidation only reaches the worker that made the write and other
+    workers keep serving their copy until it expires. Use the redis backend when running more than one worker.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._fences = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at, tags = entry
+            if expires_at < time.monotonic():
+                self._evict(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl, tags=()):
+        with self._lock:
+            self._evict(key)
+            self._entries[key] = (value, time.monotonic() + ttl, tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._evict(next(iter(self._entries)))
+
+    def invalidate(self, *tags, fence=0):
+        with self._lock:
+            now = time.monotonic()
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._evict(key)
+                if fence:
+                    self._fences.pop(tag, None)
+                    self._fences[tag] = now + fence
+            # Every fence lasts the same time, so they expire in the order they were set.
+            while self._fences and next(iter(self._fences.values())) < now:
+                self._fences.popitem(last=False)
+
+    def fenced(self, tags):
+        with self._lock:
+            now = time.monotonic()
+            return any(self._fences.get(tag, now) > now for tag in tags)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._fences.clear()
+
+    def _evict(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class RedisBackend:
+    """
+    Store shared by every worker. Entries are JSON strings with a TTL, each tag is a set of the keys it covers and
+    each fence is a key expiring when the fence is lifted.
+    """
+
+    def __init__(self, client, prefix="response-cache:"):
+        self.client = client
+        self.prefix = prefix
+
+    def call(self, result):
+        return result
+
+    def get(self, key):
+        value = self.call(self.client.get(self.prefix + key))
+        return None if value is None else json.loads(value)
+
+    def set(self, key, value, ttl, tags=()):
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, json.dumps(value), ex=ttl)
+        for tag in tags:
+            pipe.sadd(self.prefix + "tag:" + tag, key)
+            pipe.expire(self.prefix + "tag:" + tag, ttl)
+        self.call(pipe.execute())
+
+    def invalidate(self, *tags, fence=0):
+        for tag in tags:
+            tag_key = self.prefix + "tag:" + tag
+            pipe = self.client.pipeline()
+            if fence:
+                pipe.set(self.prefix + "fence:" + tag, 1, ex=fence)
+            for key in self.call(self.client.smembers(tag_key)):
+                pipe.delete(self.prefix + (key.decode("utf-8") if isinstance(key, bytes) else key))
+            pipe.delete(tag_key)
+            self.call(pipe.execute())
+
+    def fenced(self, tags):
+        if not tags:
+            return False
+        return any(self.call(self.client.mget([self.prefix + "fence:" + tag for tag in tags])))
+
+    def clear(self):
+        keys = self.scan(self.prefix + "*")
+        if keys:
+            self.call(self.client.delete(*keys))
+
+    def scan(self, pattern):
+        return list(self.client.scan_iter(pattern))
+
+
+class GreenletRedisBackend(RedisBackend):
+    """
+    RedisBackend over a redis.asyncio client, for apps served inside greenlets on the event loop (aio.AsyncReads).
+    Every command is awaited with await_only, so a lookup suspends the request's greenlet instead of blocking the loop.
+    """
+
+    def call(self, result):
+        return await_only(result)
+
+    def scan(self, pattern):
+        async def collect():
+            return [key async for key in self.client.scan_iter(pattern)]
+        return await_only(collect())
+
+
+class LocalRedis:
+    """
+    Minimal in-process stand-in for the subset of the Redis client used by RedisBackend.
+
+    Selected with RESPONSE_CACHE_URL=memory:// so the shared backend can run in development and tests without a server.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._expiry = {}
+        self._lock = threading.RLock()
+
+    def get(self, key):
+        with self._lock:
+            return self._values.get(key) if self._alive(key) else None
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._values[key] = value
+            self._expire(key, ex)
+
+    def sadd(self, key, *members):
+        with self._lock:
+            if not self._alive(key):
+                self._values[key] = set()
+            self._values[key].update(members)
+
+    def mget(self, keys):
+        with self._lock:
+            return [self.get(key) for key in keys]
+
+    def smembers(self, key):
+        with self._lock:
+            return set(self._values.get(key, ())) if self._alive(key) else set()
+
+    def expire(self, key, seconds):
+        with self._lock:
+            if key in self._values:
+                self._expire(key, seconds)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._values.pop(key, None)
+                self._expiry.pop(key, None)
+
+    def scan_iter(self, pattern):
+        with self._lock:
+            return [key for key in list(self._values) if self._alive(key) and fnmatch.fnmatchcase(key, pattern)]
+
+    def pipeline(self):
+        return LocalPipeline(self)
+
+    def _expire(self, key, seconds):
+        if seconds is None:
+            self._expiry.pop(key, None)
+        else:
+            self._expiry[key] = time.monotonic() + seconds
+
+    def _alive(self, key):
+        if key in self._expiry and self._expiry[key] < time.monotonic():
+            self.delete(key)
+        return key in self._values
+
+
+class LocalPipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((getattr(self.client, name), args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        with self.client._lock:
+            return [command(*args, **kwargs) for command, args, kwargs in self.commands]
+
+
+class NullBackend:
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl, tags=()):
+        pass
+
+    def invalidate(self, *tags, fence=0):
+        pass
+
+    def fenced(self, tags):
+        return False
+
+    def clear(self):
+        pass
+
+
+class ResponseCache:
+    """
+    Caches the serialised responses of read endpoints and evicts them by entity tag when those entities change.
+
+    Configured with RESPONSE_CACHE_BACKEND ("local", "redis" or "null"), RESPONSE_CACHE_TTL in seconds,
+    RESPONSE_CACHE_MAX_ENTRIES for the local backend and RESPONSE_CACHE_URL for the redis backend
+    (memory:// selects the in-process stand-in).
+    """
+
+    def __init__(self, app=None):
+        self._null = NullBackend()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, shared_with=None):
+        """
+        Creates the store of an app. Apps created with async engines get a redis.asyncio client for a redis server.
+
+        Args:
+            app (Flask): The app whose responses are cached.
+            shared_with (Flask): An initialised app of the same process whose in-process store (local, memory:// or
+                null) this app uses too, so invalidations made by either app reach both. A redis server is shared by
+                connecting to it.
+        """
+        kind = app.config.get("RESPONSE_CACHE_BACKEND", "local")
+        url = app.config.get("RESPONSE_CACHE_URL", "memory://")
+        if kind not in ("local", "redis", "null"):
+            raise ValueError(f"Unknown response cache backend '{kind}'.")
+
+        if kind == "redis" and url != "memory://":
+            backend = redis_backend(app, url)
+        elif shared_with is not None:
+            backend = shared_with.extensions["response_cache"]
+        elif kind == "local":
+            backend = LocalBackend(app.config.get("RESPONSE_CACHE_MAX_ENTRIES", 1024))
+        elif kind == "redis":
+            backend = RedisBackend(LocalRedis())
+        else:
+            backend = NullBackend()
+        app.extensions["response_cache"] = backend
+
+    @property
+    def backend(self):
+        """
+        The store of the current app; a NullBackend outside an app context or before init_app.
+        """
+        if not has_app_context():
+            return self._null
+        return current_app.extensions.get("response_cache", self._null)
+
+    def cached(self, func):
+        """
+        Serves a view from the cache, keyed by its route and query arguments.
+
+        Only 200 responses returned as (dict, status) are stored. The view declares which entities its response
+        embeds by calling tag_response(); a write to any of them evicts the entry.
+
+        Requests that ReadReplicas pinned to the primary neither read nor fill the cache, so a writer is never
+        answered with an entry older than their write. Responses read from the replica are not stored while one of
+        their tags is fenced, i.e. within READ_AFTER_WRITE_SECONDS of a write to it, when the replica may still
+        return the rows from before the write.
+        """
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            pinned = g.get("pinned_to_primary", False)
+            key = cache_key()
+            if not pinned:
+                hit = self.backend.get(key)
+                if hit is not None:
+                    return hit, 200
+
+            g.cache_tags = set()
+            rv = func(*args, **kwargs)
+            if (
+                isinstance(rv, tuple) and len(rv) == 2 and rv[1] == 200 and isinstance(rv[0], (dict, list))
+                and not pinned and not (g.get("read_replica", False) and self.backend.fenced(g.cache_tags))
+            ):
+                self.backend.set(key, rv[0], current_app.config.get("RESPONSE_CACHE_TTL", 60), g.cache_tags)
+            return rv
+
+        return wrapper
+
+    def invalidate(self, *tags):
+        """
+        Evicts the entries of the tags. With a read replica configured, the tags are also fenced for
+        READ_AFTER_WRITE_SECONDS, so replica reads from before the write cannot put the entries back.
+        """
+        fence = 0
+        if has_app_context() and current_app.config.get("DATABASE_READ_URL"):
+            fence = current_app.config.get("READ_AFTER_WRITE_SECONDS", 5)
+        self.backend.invalidate(*tags, fence=fence)
+
+    def clear(self):
+        self.backend.clear()
+
+
+def redis_backend(app, url, prefix="response-cache:"):
+    """
+    Returns a RedisBackend connected to a redis server, over a redis.asyncio client for apps with async engines.
+    """
+    if app.config.get("DATABASE_ASYNC"):
+        import redis.asyncio
+        return GreenletRedisBackend(redis.asyncio.Redis.from_url(url), prefix)
+    import redis
+    return RedisBackend(redis.Redis.from_url(url), prefix)
+
+def cache_key():
+    args = "&".join(f"{name}={value}" for name, value in sorted(request.args.items(multi=True)))
+    return f"{request.path}?{args}"
+
+def tag_response(*tags):
+    """
+    Records the entity tags (e.g. "post:1") that the response of the current cached view depends on.
+    """
+    if "cache_tags" in g:
+        g.cache_tags.update(tags)
+
+def embedded(instance, relationship):
+    """
+    Returns whether a relationship was loaded with the instance, i.e. whether the response can embed it.
+    """
+    return relationship not in inspect(instance).unloaded
+
+def post_tags(post):
+    """
+    Tags for a serialised post: the post itself and every user whose username it embeds.
+    """
+    tags = {f"post:{post.id}", f"user:{post.user_id}"}
+    if embedded(post, "comments"):
+        tags.update(f"user:{comment.user_id}" for comment in post.comments)
+    if embedded(post, "likes"):
+        tags.update(f"user:{like.user_id}" for like in post.likes)
+    return tags
@@ -5,32 +5,68 @@ from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from marshmallow.exceptions import ValidationError
 from flask_jwt_extended import create_access_token, get_jwt_identity, jwt_required
 
-from init import bcrypt, db
-from models.user import User, user_schema, UserSchema
-from utils import auth_user_action, handle_db_exceptions, get_user_by_id
+from init import db, cache, hasher
+from hashing import HasherBusy
+from cache import tag_response, post_tags
+from models.user import User, profile_schema, user_schema, UserSchema
+from models.post import Post
+from models.comment import Comment
+from models.like import Like
+from models.thread import InnovationThread
+from serializers import dump
+from utils import (authorize, conditional, get_fieldset, handle_db_exceptions, get_user_by_id, load_profile_summary,
+                   loader_options, release_user_counters)
 
 
 auth_bp = Blueprint("auth", __name__, url_prefix="/auth")
 
 
+def profile_versions(user_id):
+    """
+    Summarises every collection embedded in a profile with its row count and latest change.
+    """
+    columns = [User.version, User.updated_at]
+    for model, latest in ((Post, Post.updated_at), (Comment, Comment.updated_at), (InnovationThread, InnovationThread.updated_at), (Like, Like.id)):
+        owned = model.user_id == user_id
+        columns.append(db.select(db.func.count()).where(owned).scalar_subquery())
+        columns.append(db.select(db.func.max(latest)).where(owned).scalar_subquery())
+    return db.select(*columns).where(User.id == user_id)
+
+
 # View User Profile - GET - /auth/user/<int:user_id>
 @auth_bp.route("/user/<int:user_id>", methods=["GET"])
+@conditional(profile_versions)
+@cache.cached
 def view_profile(user_id):
     """
-    Retrieves a specific user's profile.
+    Retrieves a summary of a specific user's profile.
 
-    Queries the database for a User record with the specified ID.
+    Queries the database for a User record with the specified ID and returns its details with the number of threads,
+    posts, comments and likes the user has made and the most recent few of each. The full collections are paged
+    through at /users/<user_id>/threads, /posts, /comments and /likes.
 
     Args:
         user_id (int): The ID of the user to retrieve.
 
     Returns:
         JSON: Serialised user profile with a 200 Ok status if the user exists.
+        JSON: Error message with a 400 Bad Request status if a requested field does not exist.
         JSON: Error message with a 404 Not Found status if the user is not found.
     """
-    profile = get_user_by_id(user_id)
+    try:
+        schema = get_fieldset(profile_schema)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    profile = get_user_by_id(user_id, *loader_options(User, schema))
     if profile:
-        return user_schema.dump(profile), 200
+        load_profile_summary(profile, schema)
+        tag_response(f"user:{user_id}", f"profile:{user_id}")
+        tag_response(*[f"thread:{thread.id}" for thread in getattr(profile, "recent_threads", [])])
+        tag_response(*[f"post:{item.post_id}" for item in getattr(profile, "recent_comments", []) + getattr(profile, "recent_likes", [])])
+        for post in getattr(profile, "recent_posts", []):
+            tag_response(*post_tags(post))
+        return dump(schema, profile), 200
     else:
         return {"error": f"User with ID {user_id} not found."}, 404
 
@@ -48,6 +84,7 @@ def register_user():
         JSON: Serialised user profile with a 201 Created status upon successful registration
         JSON: Error message with a 400 Bad Request status if validation fails.
         JSON: Error message with a 409 Conflict status if a database integrity error occurs.
+        JSON: Error message with a 503 Service Unavailable status if password hashing is saturated.
     """
     try:
         body_data = UserSchema().load(request.get_json())
@@ -58,7 +95,7 @@ def register_user():
 
 
         user = User(**body_data)
-        user.password = bcrypt.generate_password_hash(password).decode('utf-8')
+        user.password = hasher.hash(password)
 
         db.session.add(user)
         db.session.commit()
@@ -72,6 +109,9 @@ def register_user():
     except IntegrityError as err:
         return handle_db_exceptions(err)
 
+    except HasherBusy as e:
+        return {"error": str(e)}, 503, {"Retry-After": "1"}
+
 
 
 # Login user - POST - /auth/login
@@ -81,11 +121,13 @@ def login_user():
     Logs in a user and creates a JWT token.
 
     Validates the user's email and password, then creates a JWT token for authenticated users.
+    A password hashed at a different cost than the configured one is rehashed transparently.
 
     Returns:
         JSON: User's email, admin status and JWT token with a 200 OK status upon successful login.
         JSON: Error message with a 401 Unauthorized status if email or password is incorrect.
         JSON: Error message with a 500 Internal Server Error status if a database error occurs.
+        JSON: Error message with a 503 Service Unavailable status if password hashing is saturated.
     """
     try:
         body_data = request.get_json()
@@ -93,12 +135,20 @@ def login_user():
         stmt = db.select(User).filter_by(email=email)
         user = db.session.scalar(stmt)
 
-        if user and bcrypt.check_password_hash(user.password, body_data.get("password")):
+        password = body_data.get("password")
+
+        if user and hasher.check(user.password, password):
+            if hasher.needs_rehash(user.password):
+                user.password = hasher.hash(password)
+                db.session.commit()
             token = create_access_token(identity=str(user.id), expires_delta=timedelta(days=1))
             return {"email": user.email, "is_admin": user.is_admin, "token": token}, 200
         else:
             return {"error": "Invalid email or password"}, 401
         
+    except HasherBusy as e:
+        return {"error": str(e)}, 503, {"Retry-After": "1"}
+
     except SQLAlchemyError:
         return {"error": "Database error"}, 500
     
@@ -107,8 +157,8 @@ def login_user():
 # Update user - PUT, PATCH - auth/editprofile/<int:user_id>
 @auth_bp.route("/editprofile/<int:user_id>", methods=["PUT", "PATCH"])
 @jwt_required()
-@auth_user_action(User, "user_id")
-def edit_profile(user_id):
+@authorize(User, "user_id", inject="user", owner_field="id")
+def edit_profile(user_id, user):
     """
     Updates users profile information.
 
@@ -116,12 +166,14 @@ def edit_profile(user_id):
 
     Args:
         user_id (int): The ID of the user to update.
+        user (User): The user, loaded and authorised by the decorator.
     
     Returns:
         JSON: Updated user profile with a 200 OK status if successful.
         JSON: Error message with a 400 Bad Request staus if email is attempted to be updated.
         JSON: Error message with a 404 Not Found status if the user does not exist or access is unauthorised.
         JSON: Error message with a 500 Internal Server Error status if a database error occurs.
+        JSON: Error message with a 503 Service Unavailable status if password hashing is saturated.
     """
     try:
         body_data = UserSchema().load(request.get_json(), partial=True)
@@ -130,22 +182,23 @@ def edit_profile(user_id):
         if "email" in body_data:
             return {"error": "This email is unique to this account and cannot be changed. Please register a new account."}, 400
 
-        user = get_user_by_id(user_id)
+        password_hash = hasher.hash(password) if password else None
 
-        if user:
-            for key, value in body_data.items():
-                if key != "password":
-                    setattr(user, key, value.strip() if isinstance(value,str) else value)
-            if password:
-                user.password = bcrypt.generate_password_hash(password).decode('utf-8')
-            db.session.commit()
-            return user_schema.dump(user), 200
-        else:
-            return {"error": "User does not exist or unauthorized access."}, 404
+        for key, value in body_data.items():
+            if key != "password":
+                setattr(user, key, value.strip() if isinstance(value,str) else value)
+        if password_hash:
+            user.password = password_hash
+        db.session.commit()
+        cache.invalidate(f"user:{user_id}")
+        return user_schema.dump(user), 200
         
     except ValidationError as err:
         return {"error": err.messages}, 400
 
+    except HasherBusy as e:
+        return {"error": str(e)}, 503, {"Retry-After": "1"}
+
     except SQLAlchemyError:
         return {"error": "Database error"}, 500
     
@@ -155,15 +208,18 @@ def edit_profile(user_id):
 # Delete account - DELETE - /auth/deleteaccount/<int:user_id>
 @auth_bp.route("/deleteaccount/<int:user_id>", methods=["DELETE"])
 @jwt_required()
-@auth_user_action(User, "user_id")
-def delete_account(user_id):
+@authorize(User, "user_id", inject="account", owner_field="id", name="User")
+def delete_account(user_id, account):
     """
     Deletes a user account.
 
-    Deletes the user account with the specified ID from the database.
+    Deletes the user account with the specified ID from the database. Its threads, posts, comments, likes, follows,
+    timeline and suggestions are removed by the database's ON DELETE CASCADE in the same statement, after the
+    counters the user contributed to on other users' rows have been released.
 
     Args:
         user_id (int): The ID of the user to delete.
+        account (User): The user, loaded and authorised by the decorator.
 
     Returns:
         JSON: Success message with a 200 OK status if the account is deleted.
@@ -171,14 +227,11 @@ def delete_account(user_id):
         JSON: Error message with a 500 Internal Server Error status if a database error occurs.
     """
     try:
-        account = get_user_by_id(user_id)
-
-        if account:
-            db.session.delete(account)
-            db.session.commit()
-            return {"message": "Account successfully deleted."}, 200
-        else:
-            return {"error": "User does not exist."}, 404
+        release_user_counters(user_id)
+        db.session.delete(account)
+        db.session.commit()
+        cache.clear()
+        return {"message": "Account successfully deleted."}, 200
         
     except SQLAlchemyError:
         return {"error": "Database error."}, 500
\ No newline at end of file
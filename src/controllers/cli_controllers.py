@@ -1,14 +1,30 @@
-from datetime import date, datetime
+import csv
+import io
+import math
+import random
+from array import array
+from collections import Counter
+from datetime import date, datetime, timedelta
+from itertools import accumulate
 
-from flask import Blueprint
+import click
+from flask import Blueprint, current_app, has_request_context, request
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from sqlalchemy.schema import AddConstraint
 
-from init import db, bcrypt
+from init import db, bcrypt, hasher
 from models.user import User
 from models.post import Post
 from models.comment import Comment
 from models.like import Like
 from models.follower import Follower
 from models.thread import InnovationThread
+from models.timeline import TimelineEntry
+from models.suggestion import Suggestion
+from models.ranking import Ranking
+from controllers.feed_controller import has_many_followers
+from search import DOCUMENTS, search_ddl
 
 db_commands = Blueprint("db", __name__)
 
@@ -18,6 +34,47 @@ def create_tables():
     print("Tables created")
 
 
+@db_commands.cli.command("create-search-index")
+def create_search_index():
+    """
+    Adds the full-text search columns and indexes to the tables of an existing PostgreSQL database.
+    `flask db create` adds them to new databases.
+    """
+    if db.session.get_bind().dialect.name != "postgresql":
+        print("Search uses an in-process index on this database. Nothing to create.")
+        return
+    for model, columns in DOCUMENTS.values():
+        for statement in search_ddl(model.__tablename__, columns):
+            db.session.execute(db.text(statement))
+    db.session.commit()
+    print("Search index created.")
+
+
+@db_commands.cli.command("cascade-deletes")
+def cascade_deletes():
+    """
+    Recreates the foreign keys of an existing PostgreSQL database with the ON DELETE rules of the models, so the
+    database removes the rows of deleted users, threads and posts. `flask db create` declares them on new databases.
+    """
+    connection = db.session.connection()
+    if connection.dialect.name != "postgresql":
+        print("Foreign keys cannot be altered on this database. Recreate it with `flask db drop` and `flask db create`.")
+        return
+    inspector = db.inspect(connection)
+    altered = 0
+    for table in db.metadata.sorted_tables:
+        existing = {tuple(fk["constrained_columns"]): fk for fk in inspector.get_foreign_keys(table.name)}
+        for constraint in table.foreign_key_constraints:
+            current = existing.get(tuple(constraint.column_keys))
+            if current is None or (current["options"].get("ondelete") or "").upper() == (constraint.ondelete or "").upper():
+                continue
+            db.session.execute(db.text(f'ALTER TABLE {table.name} DROP CONSTRAINT "{current["name"]}"'))
+            db.session.execute(AddConstraint(constraint))
+            altered += 1
+    db.session.commit()
+    print(f"{altered} foreign keys updated.")
+
+
 @db_commands.cli.command("drop")
 def drop_tables():
     db.drop_all()
@@ -207,4 +264,646 @@ def seed_tables():
     db.session.add_all(threads)
     db.session.commit()
 
-    print("Tables seeded.")
\ No newline at end of file
+    reconcile_post_counters()
+    reconcile_user_counters()
+
+    print("Tables seeded.")
+
+
+def reconcile_post_counters(batch_size=10000):
+    """
+    Recomputes Post.like_count and Post.comment_count from the likes and comments tables.
+
+    Posts are processed in primary key ranges of batch_size, each repaired with one set-based UPDATE and committed
+    separately, so no transaction holds locks on more than one range. Only posts whose counts have drifted are written.
+
+    Returns:
+        int: The number of posts whose counts were corrected.
+    """
+    like_total = db.select(db.func.count()).where(Like.post_id == Post.id).scalar_subquery()
+    comment_total = db.select(db.func.count()).where(Comment.post_id == Post.id).scalar_subquery()
+
+    low, high = db.session.execute(db.select(db.func.min(Post.id), db.func.max(Post.id))).one()
+    repaired = 0
+    if low is None:
+        return repaired
+
+    for start in range(low, high + 1, batch_size):
+        stmt = (
+            db.update(Post)
+            .where(
+                Post.id >= start,
+                Post.id < start + batch_size,
+                db.or_(Post.like_count != like_total, Post.comment_count != comment_total)
+            )
+            .values(like_count=like_total, comment_count=comment_total)
+            .execution_options(synchronize_session=False)
+        )
+        repaired += db.session.execute(stmt).rowcount
+        db.session.commit()
+    return repaired
+
+
+def reconcile_user_counters(batch_size=10000):
+    """
+    Recomputes User.follower_count and User.following_count from the followers table, in primary key ranges of
+    batch_size like reconcile_post_counters.
+
+    Returns:
+        int: The number of users whose counts were corrected.
+    """
+    follower_total = db.select(db.func.count()).where(Follower.followed_id == User.id).scalar_subquery()
+    following_total = db.select(db.func.count()).where(Follower.follower_id == User.id).scalar_subquery()
+
+    low, high = db.session.execute(db.select(db.func.min(User.id), db.func.max(User.id))).one()
+    repaired = 0
+    if low is None:
+        return repaired
+
+    for start in range(low, high + 1, batch_size):
+        stmt = (
+            db.update(User)
+            .where(
+                User.id >= start,
+                User.id < start + batch_size,
+                db.or_(User.follower_count != follower_total, User.following_count != following_total)
+            )
+            .values(follower_count=follower_total, following_count=following_total)
+            .execution_options(synchronize_session=False)
+        )
+        repaired += db.session.execute(stmt).rowcount
+        db.session.commit()
+    return repaired
+
+
+@db_commands.cli.command("reconcile-counters")
+@click.option("--batch-size", default=10000, show_default=True, help="Number of post or user IDs repaired per transaction.")
+def reconcile_counters(batch_size):
+    repaired = reconcile_post_counters(batch_size)
+    users_repaired = reconcile_user_counters(batch_size)
+    print(f"Counters reconciled. {repaired} posts and {users_repaired} users corrected.")
+
+
+
+SEED_WORDS = (
+    "python flask django sqlalchemy postgres api rest design testing deploy docker cloud data model query index "
+    "cache scale latency startup product team remote career learning open source community review release bug "
+    "feature idea launch frontend backend security performance async queue stream analytics machine learning"
+).split()
+
+SEED_JOB_TITLES = ("Software Developer", "Backend Engineer", "Data Scientist", "Product Manager", "Designer", "Founder")
+
+
+def power_law(n, alpha):
+    """
+    Returns cumulative Zipf weights (rank ** -alpha) for n items, with ranks assigned in random order.
+
+    The result is an array of doubles so it can be passed to random.choices as cum_weights for millions of items.
+    """
+    ranks = list(range(1, n + 1))
+    random.shuffle(ranks)
+    return array("d", accumulate(rank ** -alpha for rank in ranks))
+
+def draw(first_id, cum_weights, k):
+    """
+    Draws k IDs from first_id onwards, weighted by cum_weights.
+    """
+    return [first_id + index for index in random.choices(range(len(cum_weights)), cum_weights=cum_weights, k=k)]
+
+def draw_counts(first_id, cum_weights, k, batch_size):
+    """
+    Splits k draws across IDs by weight, returning how many each ID received.
+    """
+    counts = Counter()
+    for start in range(0, k, batch_size):
+        counts.update(draw(first_id, cum_weights, min(batch_size, k - start)))
+    return counts
+
+def draw_distinct(first_id, cum_weights, count, exclude=None):
+    """
+    Draws up to count distinct IDs by weight, skipping exclude. Gives up after a bounded number of draws, so the
+    most active users of a small dataset may end up with slightly fewer rows than drawn for them.
+    """
+    chosen = set()
+    for _ in range(4):
+        chosen.update(draw(first_id, cum_weights, count - len(chosen)))
+        chosen.discard(exclude)
+        if len(chosen) >= count:
+            break
+    return chosen
+
+def seed_timestamp(now, earliest):
+    """
+    Returns a uniformly random epoch time between earliest and now.
+    """
+    return earliest + random.random() * (now - earliest)
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def bulk_insert(model, columns, rows, batch_size):
+    """
+    Streams rows into a model's table, one transaction per batch.
+
+    On PostgreSQL each batch is sent with COPY ... FROM STDIN; other databases use a batched executemany.
+
+    Returns:
+        int: The number of rows inserted.
+    """
+    table = model.__table__
+    inserted = 0
+    for batch in batched(rows, batch_size):
+        connection = db.session.connection()
+        if connection.dialect.name == "postgresql":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(batch)
+            buffer.seek(0)
+            with connection.connection.driver_connection.cursor() as cursor:
+                cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        else:
+            db.session.execute(db.insert(table), [dict(zip(columns, row)) for row in batch])
+        db.session.commit()
+        inserted += len(batch)
+    return inserted
+
+def reset_sequences(*models):
+    """
+    Moves the ID sequences of the given models past the explicit IDs written by seed-scale. Only needed on PostgreSQL.
+    """
+    if db.session.connection().dialect.name != "postgresql":
+        return
+    for model in models:
+        table = model.__table__.name
+        db.session.execute(db.text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT COALESCE(MAX(id), 1) FROM {table}))"
+        ))
+    db.session.commit()
+
+def build_timelines(first_user_id):
+    """
+    Materialises the home timelines of the seeded users with one INSERT ... SELECT: each follower receives the latest
+    FEED_BACKFILL posts of every followed user below the fan-out limit, as if the posts had been fanned out on write.
+    """
+    ranked = (
+        db.select(
+            Post.id, Post.user_id, Post.timestamp,
+            db.func.row_number().over(partition_by=Post.user_id, order_by=(Post.timestamp.desc(), Post.id.desc())).label("rank")
+        )
+        .where(Post.user_id >= first_user_id)
+        .subquery()
+    )
+    follow = db.aliased(Follower)
+    stmt = db.insert(TimelineEntry).from_select(
+        ["user_id", "post_id", "timestamp"],
+        db.select(follow.follower_id, ranked.c.id, ranked.c.timestamp)
+        .join(ranked, ranked.c.user_id == follow.followed_id)
+        .where(
+            follow.follower_id >= first_user_id,
+            ranked.c.rank <= current_app.config["FEED_BACKFILL"],
+            ~has_many_followers(follow.followed_id)
+        )
+    )
+    inserted = db.session.execute(stmt).rowcount
+    db.session.commit()
+    return inserted
+
+
+@db_commands.cli.command("seed-scale")
+@click.option("--users", default=1000, show_default=True, help="Number of users to create.")
+@click.option("--posts", default=10000, show_default=True, help="Number of posts to create.")
+@click.option("--threads", default=200, show_default=True, help="Number of Innovation Threads to create.")
+@click.option("--comments", default=20000, show_default=True, help="Number of comments to create.")
+@click.option("--likes", default=50000, show_default=True, help="Number of likes to draw (duplicates are dropped).")
+@click.option("--follows", default=20000, show_default=True, help="Number of follow edges to draw (duplicates are dropped).")
+@click.option("--alpha", default=1.1, show_default=True, help="Power-law exponent of user activity and content popularity.")
+@click.option("--thread-share", default=0.1, show_default=True, help="Fraction of posts made inside a thread.")
+@click.option("--days", default=365, show_default=True, help="Number of past days the timestamps are spread over.")
+@click.option("--password", default="123456", show_default=True, help="Password shared by every seeded user.")
+@click.option("--batch-size", default=10000, show_default=True, help="Number of rows sent per COPY or executemany.")
+@click.option("--random-seed", type=int, default=None, help="Seed for a reproducible dataset.")
+def seed_scale(users, posts, threads, comments, likes, follows, alpha, thread_share, days, password, batch_size, random_seed):
+    """
+    Generates a synthetic dataset for capacity testing on top of any existing rows.
+
+    How much users post, comment, like and follow, and how often users, posts and threads are followed, liked or
+    posted into, all follow power laws. Every seeded user shares one password, hashed once.
+    """
+    if users < 1:
+        raise click.BadParameter("At least one user is required.", param_hint="--users")
+    if posts < 1 and (comments or likes):
+        raise click.BadParameter("Comments and likes need at least one post.", param_hint="--posts")
+    random.seed(random_seed)
+
+    first_user, first_thread, first_post = (
+        (db.session.scalar(db.select(db.func.max(model.id))) or 0) + 1 for model in (User, InnovationThread, Post)
+    )
+    now = datetime.now().timestamp()
+    earliest = now - days * 86400
+    activity = power_law(users, alpha)
+    popularity = power_law(users, alpha)
+
+    password_hash = hasher.hash(password)
+    user_rows = (
+        (user_id, f"seed{user_id}", f"seed{user_id}@example.com", password_hash, False, random.choice(SEED_JOB_TITLES))
+        for user_id in range(first_user, first_user + users)
+    )
+    inserted = bulk_insert(User, ("id", "username", "email", "password", "is_admin", "job_title"), user_rows, batch_size)
+    print(f"{inserted} users created.")
+
+    thread_times = array("d", (seed_timestamp(now, earliest) for _ in range(threads)))
+    thread_rows = (
+        (
+            first_thread + index,
+            " ".join(random.choices(SEED_WORDS, k=random.randint(3, 8))).capitalize(),
+            " ".join(random.choices(SEED_WORDS, k=random.randint(10, 40))),
+            datetime.fromtimestamp(thread_times[index]),
+            author
+        )
+        for index, author in enumerate(draw(first_user, activity, threads))
+    )
+    inserted = bulk_insert(InnovationThread, ("id", "title", "content", "timestamp", "user_id"), thread_rows, batch_size)
+    print(f"{inserted} threads created.")
+
+    # Posts, and which posts are commented on and liked, are drawn before anything is written so that each post row
+    # can carry its final like_count and comment_count and no reconciliation pass is needed afterwards.
+    thread_weights = power_law(threads, alpha) if threads else None
+    post_authors = array("l")
+    post_threads = array("l")
+    post_times = array("d")
+    for start in range(0, posts, batch_size):
+        for author in draw(first_user, activity, min(batch_size, posts - start)):
+            thread_id = 0
+            timestamp = seed_timestamp(now, earliest)
+            if thread_weights and random.random() < thread_share:
+                thread_id = draw(first_thread, thread_weights, 1)[0]
+                timestamp = seed_timestamp(now, thread_times[thread_id - first_thread])
+            post_authors.append(author)
+            post_threads.append(thread_id)
+            post_times.append(timestamp)
+
+    post_weights = power_law(posts, alpha) if posts else None
+    comment_counts = array("l", bytes(posts * array("l").itemsize))
+    comment_posts = array("l")
+    for start in range(0, comments, batch_size):
+        for post_id in draw(first_post, post_weights, min(batch_size, comments - start)):
+            comment_posts.append(post_id)
+            comment_counts[post_id - first_post] += 1
+
+    like_counts = array("l", bytes(posts * array("l").itemsize))
+    like_users = array("l")
+    like_posts = array("l")
+    for user_id, count in sorted(draw_counts(first_user, activity, likes, batch_size).items()):
+        for post_id in sorted(draw_distinct(first_post, post_weights, min(count, posts))):
+            like_users.append(user_id)
+            like_posts.append(post_id)
+            like_counts[post_id - first_post] += 1
+
+    post_rows = (
+        (
+            first_post + index,
+            " ".join(random.choices(SEED_WORDS, k=random.randint(5, 40))),
+            datetime.fromtimestamp(post_times[index]),
+            post_authors[index],
+            post_threads[index] or None,
+            like_counts[index],
+            comment_counts[index]
+        )
+        for index in range(posts)
+    )
+    columns = ("id", "body", "timestamp", "user_id", "thread_id", "like_count", "comment_count")
+    inserted = bulk_insert(Post, columns, post_rows, batch_size)
+    print(f"{inserted} posts created.")
+    reset_sequences(User, InnovationThread, Post)
+
+    comment_rows = (
+        (
+            " ".join(random.choices(SEED_WORDS, k=random.randint(3, 20))),
+            datetime.fromtimestamp(seed_timestamp(now, post_times[post_id - first_post])),
+            author,
+            post_id
+        )
+        for author, post_id in zip(draw(first_user, activity, comments), comment_posts)
+    )
+    inserted = bulk_insert(Comment, ("comment_body", "timestamp", "user_id", "post_id"), comment_rows, batch_size)
+    print(f"{inserted} comments created.")
+
+    inserted = bulk_insert(Like, ("user_id", "post_id"), zip(like_users, like_posts), batch_size)
+    print(f"{inserted} likes created.")
+
+    def follow_rows():
+        for user_id, count in sorted(draw_counts(first_user, activity, follows, batch_size).items()):
+            for followed_id in sorted(draw_distinct(first_user, popularity, min(count, users - 1), exclude=user_id)):
+                yield (user_id, followed_id)
+
+    inserted = bulk_insert(Follower, ("follower_id", "followed_id"), follow_rows(), batch_size) if users > 1 else 0
+    print(f"{inserted} follow edges created.")
+    reconcile_user_counters(batch_size)
+
+    print(f"{build_timelines(first_user)} timeline entries created.")
+    print("Tables seeded.")
+
+
+def sequential_scans(connection, statement, parameters):
+    """
+    Returns the tables a statement reads with a full sequential scan, according to the database's query plan.
+
+    On PostgreSQL sequential scans are disabled for the EXPLAIN, so the planner only falls back to one when no index
+    can serve the query at all, whatever the table sizes. On SQLite the EXPLAIN QUERY PLAN lines are inspected.
+    """
+    tables = set(db.metadata.tables)
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+        nodes = [plan[0]["Plan"]]
+        scans = set()
+        while nodes:
+            node = nodes.pop()
+            if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in tables:
+                scans.add(node["Relation Name"])
+            nodes.extend(node.get("Plans", ()))
+        return scans
+
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    scans = set()
+    for row in rows:
+        words = row[-1].split()
+        if words[0] == "SCAN" and words[1] in tables and "USING" not in words:
+            scans.add(words[1])
+    return scans
+
+def hot_requests(client):
+    """
+    Issues the read requests the query plan check covers, following the first page cursor of each list endpoint.
+    """
+    post = db.session.scalars(db.select(Post).order_by(Post.comment_count.desc(), Post.like_count.desc())).first()
+    comment = db.session.scalars(db.select(Comment).filter_by(post_id=post.id)).first() if post else None
+    thread_post = db.session.scalars(db.select(Post).where(Post.thread_id.is_not(None))).first()
+    user_id = db.session.scalar(db.select(Follower.followed_id).group_by(Follower.followed_id).order_by(db.func.count().desc()))
+    if not (post and comment and thread_post and user_id):
+        raise click.ClickException("The query plan check needs a seeded database. Run `flask db seed` or `flask db seed-scale` first.")
+
+    token = create_access_token(identity=str(user_id))
+    headers = {"Authorization": f"Bearer {token}"}
+    urls = [
+        "/posts/?limit=2",
+        f"/posts/{post.id}",
+        f"/posts/{post.id}/comments/?limit=1",
+        f"/posts/{post.id}/comments/{comment.id}",
+        f"/posts/{post.id}/likes/",
+        "/threads/?limit=1",
+        f"/threads/{thread_post.thread_id}?limit=1",
+        f"/posts/threads/{thread_post.thread_id}?limit=1",
+        f"/posts/{thread_post.id}/threads/{thread_post.thread_id}",
+        f"/users/{user_id}/followers?limit=1",
+        f"/users/{user_id}/following?limit=1",
+        f"/users/{user_id}/suggestions",
+        f"/users/{user_id}/threads?limit=1",
+        f"/users/{user_id}/posts?limit=1",
+        f"/users/{user_id}/comments?limit=1",
+        f"/users/{user_id}/likes?limit=1",
+        f"/auth/user/{user_id}",
+        "/feed/?limit=1",
+        "/posts/trending?limit=5",
+        "/threads/trending?limit=5",
+    ]
+    for url in urls:
+        response = client.get(url, headers=headers)
+        cursor = response.get_json().get("next_cursor") if response.is_json and isinstance(response.get_json(), dict) else None
+        if cursor:
+            client.get(f"{url}&cursor={cursor}", headers=headers)
+
+
+def plan_failures():
+    """
+    Runs the hot read requests against the current database, EXPLAINs every SELECT they issue and returns
+    (path, statement, tables) for each distinct statement reading tables with a sequential scan, and the number of
+    statements checked.
+    """
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and statement.lstrip().upper().startswith("SELECT") and not executemany:
+            captured.append((request.path, statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        hot_requests(current_app.test_client())
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+    failures = []
+    seen = set()
+    with db.engine.connect() as connection:
+        for path, statement, parameters in captured:
+            if (path, statement) in seen:
+                continue
+            seen.add((path, statement))
+            scans = sequential_scans(connection, statement, parameters)
+            connection.rollback()
+            if scans:
+                failures.append((path, statement, scans))
+    return failures, len(seen)
+
+
+@db_commands.cli.command("check-query-plans")
+def check_query_plans():
+    """
+    Runs the hot read endpoints against the current database, EXPLAINs every SELECT they issue and fails when any of
+    them reads a table with a sequential scan.
+    """
+    failures, checked = plan_failures()
+    for path, statement, scans in failures:
+        print(f"{path}: sequential scan on {', '.join(sorted(scans))}\n    {' '.join(statement.split())}")
+
+    print(f"{checked} queries checked, {len(failures)} with sequential scans.")
+    if failures:
+        raise SystemExit(1)
+
+
+
+def top_suggestions(adjacency, popularity, start, stop, top_k, min_score):
+    """
+    Scores the friends-of-friends of the users in rows start..stop of the follow graph and keeps the best top_k each.
+
+    A candidate's score is the number of users the user follows who follow the candidate, read off one block of the
+    squared adjacency matrix. Users already followed, and the user themselves, are dropped. Ties go to the candidate
+    with the most followers.
+
+    Returns:
+        tuple: Arrays of user indices, ranks from 1, candidate indices and scores, ordered by user and rank.
+    """
+    import numpy as np
+
+    block = adjacency[start:stop]
+    scores = block @ adjacency
+    scores = (scores - scores.multiply(block)).tocoo()
+    keep = (scores.data >= min_score) & (scores.col != scores.row + start)
+    rows, cols, values = scores.row[keep] + start, scores.col[keep], scores.data[keep]
+
+    order = np.lexsort((-popularity[cols], -values, rows))
+    rows, cols, values = rows[order], cols[order], values[order]
+    ranks = np.arange(len(rows)) - np.searchsorted(rows, rows) + 1
+    top = ranks <= top_k
+    return rows[top], ranks[top], cols[top], values[top]
+
+
+@db_commands.cli.command("suggest-follows")
+@click.option("--top-k", default=10, show_default=True, help="Number of suggestions stored per user.")
+@click.option("--min-score", default=1, show_default=True, help="Minimum number of followed users who must follow a suggestion.")
+@click.option("--batch-size", default=10000, show_default=True, help="Number of users scored and written per transaction.")
+def suggest_follows(top_k, min_score, batch_size):
+    """
+    Recomputes the follow suggestions of every user from the friends-of-friends of the follow graph.
+
+    The followers table is loaded into a SciPy sparse adjacency matrix and scored in blocks of batch_size users with
+    vectorised sparse products, so the work grows with the number of two-hop paths rather than with users squared.
+    Each block's stored suggestions are replaced as it is written.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    user_ids = np.fromiter(db.session.scalars(db.select(User.id).order_by(User.id)), dtype=np.int64)
+    followers, followed = array("q"), array("q")
+    for follower_id, followed_id in db.session.execute(
+        db.select(Follower.follower_id, Follower.followed_id), execution_options={"yield_per": batch_size}
+    ):
+        followers.append(follower_id)
+        followed.append(followed_id)
+    db.session.commit()
+
+    size = len(user_ids)
+    rows = np.searchsorted(user_ids, np.frombuffer(followers, dtype=np.int64))
+    cols = np.searchsorted(user_ids, np.frombuffer(followed, dtype=np.int64))
+    adjacency = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(size, size))
+    popularity = np.asarray(adjacency.sum(axis=0)).ravel()
+
+    stored = 0
+    for start in range(0, size, batch_size):
+        stop = min(start + batch_size, size)
+        users, ranks, suggested, scores = top_suggestions(adjacency, popularity, start, stop, top_k, min_score)
+        db.session.execute(
+            db.delete(Suggestion).where(Suggestion.user_id >= int(user_ids[start]), Suggestion.user_id <= int(user_ids[stop - 1]))
+        )
+        rows_out = zip(user_ids[users].tolist(), ranks.tolist(), user_ids[suggested].tolist(), scores.tolist())
+        stored += bulk_insert(Suggestion, ("user_id", "rank", "suggested_id", "score"), rows_out, batch_size * top_k)
+        db.session.commit()
+
+    print(f"{stored} suggestions stored for {size} users.")
+
+
+
+TRENDING_EPOCH = datetime(2024, 1, 1)
+TRENDING_COMMENT_WEIGHT = 2
+# Items changed this long before the last run's watermark are scored again, to catch transactions that committed late.
+TRENDING_OVERLAP = timedelta(minutes=5)
+
+
+def trending_score(engagement, active_at, half_life_hours):
+    """
+    Returns log2 of the engagement plus the number of half-lives between TRENDING_EPOCH and the item's activity.
+
+    Doubling the engagement is worth as much as being one half-life newer, so ordering by the score is ordering by
+    engagement decayed exponentially with age. The score does not depend on the current time, which is why an item
+    only has to be scored again when its engagement changes.
+    """
+    return math.log2(engagement) + (active_at - TRENDING_EPOCH).total_seconds() / (half_life_hours * 3600)
+
+def ranking_watermark(kind):
+    latest = db.session.scalar(db.select(db.func.max(Ranking.scored_at)).where(Ranking.kind == kind))
+    return latest - TRENDING_OVERLAP if latest else None
+
+def store_rankings(kind, entries):
+    """
+    Replaces the rankings of the given (item ID, score, scored_at) entries in one transaction.
+    """
+    db.session.execute(db.delete(Ranking).where(Ranking.kind == kind, Ranking.item_id.in_([entry[0] for entry in entries])))
+    db.session.execute(
+        db.insert(Ranking),
+        [{"kind": kind, "item_id": item_id, "score": score, "scored_at": scored_at} for item_id, score, scored_at in entries]
+    )
+    db.session.commit()
+
+def rank_posts(window_start, since, half_life_hours, batch_size):
+    stmt = (
+        db.select(Post.id, Post.like_count, Post.comment_count, Post.timestamp, Post.updated_at)
+        .where(Post.timestamp >= window_start)
+    )
+    if since is not None:
+        stmt = stmt.where(Post.updated_at >= since)
+    rows = db.session.execute(stmt).all()
+
+    for batch in batched(rows, batch_size):
+        store_rankings("post", [
+            (post_id, trending_score(1 + likes + TRENDING_COMMENT_WEIGHT * comments, timestamp, half_life_hours), updated_at)
+            for post_id, likes, comments, timestamp, updated_at in batch
+        ])
+    return len(rows)
+
+def rank_threads(window_start, since, half_life_hours, batch_size):
+    stmt = (
+        db.select(InnovationThread.id, InnovationThread.timestamp, InnovationThread.updated_at)
+        .where(InnovationThread.updated_at >= window_start)
+    )
+    if since is not None:
+        stmt = stmt.where(InnovationThread.updated_at >= since)
+    rows = db.session.execute(stmt).all()
+
+    for batch in batched(rows, batch_size):
+        activity_stmt = (
+            db.select(
+                Post.thread_id,
+                db.func.count(),
+                db.func.sum(Post.like_count),
+                db.func.sum(Post.comment_count),
+                db.func.max(Post.timestamp)
+            )
+            .where(Post.thread_id.in_([row[0] for row in batch]))
+            .group_by(Post.thread_id)
+        )
+        activity = {row[0]: row[1:] for row in db.session.execute(activity_stmt)}
+
+        entries = []
+        for thread_id, timestamp, updated_at in batch:
+            posts, likes, comments, latest = activity.get(thread_id, (0, 0, 0, None))
+            engagement = 1 + posts + likes + TRENDING_COMMENT_WEIGHT * comments
+            active_at = max(filter(None, (timestamp, latest)), default=updated_at)
+            entries.append((thread_id, trending_score(engagement, active_at, half_life_hours), updated_at))
+        store_rankings("thread", entries)
+    return len(rows)
+
+def prune_rankings(window_start):
+    """
+    Removes the rankings of posts and threads that were deleted or have left the trending window.
+    """
+    removed = 0
+    for kind, model, active in (("post", Post, Post.timestamp), ("thread", InnovationThread, InnovationThread.updated_at)):
+        live = db.select(model.id).where(model.id == Ranking.item_id, active >= window_start).exists()
+        removed += db.session.execute(db.delete(Ranking).where(Ranking.kind == kind, ~live)).rowcount
+    db.session.commit()
+    return removed
+
+
+@db_commands.cli.command("rank-trending")
+@click.option("--full", is_flag=True, help="Score every item in the window, not only those changed since the last run.")
+@click.option("--batch-size", default=1000, show_default=True, help="Number of items scored per transaction.")
+def rank_trending(full, batch_size):
+    """
+    Updates the trending scores served by /posts/trending and /threads/trending. Meant to run every few minutes.
+
+    Only posts and threads whose updated_at moved since the last run are scored again, since likes, comments and new
+    thread posts all bump it. Run with --full after changing TRENDING_HALF_LIFE_HOURS.
+    """
+    half_life_hours = current_app.config["TRENDING_HALF_LIFE_HOURS"]
+    window_start = datetime.now() - timedelta(days=current_app.config["TRENDING_WINDOW_DAYS"])
+
+    posts = rank_posts(window_start, None if full else ranking_watermark("post"), half_life_hours, batch_size)
+    threads = rank_threads(window_start, None if full else ranking_watermark("thread"), half_life_hours, batch_size)
+    removed = prune_rankings(window_start)
+    print(f"{posts} posts and {threads} threads scored. {removed} rankings removed.")
@@ -2,46 +2,79 @@ from datetime import date
 
 from flask import Blueprint, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.orm import joinedload
 from marshmallow.exceptions import ValidationError
 
-from init import db
+from init import db, cache
+from cache import tag_response
 from models.comment import Comment, comment_schema, comments_schema
 from models.post import Post
-from utils import auth_comment_action, get_comment, get_post
+from utils import (adjust_post_counters, authorize, conditional, embedded_user_versions, get_comment, get_fieldset,
+                   get_page_args, get_post, get_stream_format, keyset, loader_options, page_response, stream_response,
+                   touch_post, user_versions)
 
 
 comments_bp = Blueprint("comments", __name__, url_prefix="/posts/<int:post_id>/comments")
 
 
+def comments_versions(post_id):
+    commenters = user_versions(Comment.user_id, Comment.post_id == post_id)
+    return db.select(Post.version, Post.updated_at, commenters).where(Post.id == post_id)
+
+def comment_versions(post_id, comment_id):
+    return (
+        db.select(Comment.version, Comment.updated_at, Post.version, Post.updated_at, *embedded_user_versions(Comment))
+        .join(Post)
+        .where(Comment.id == comment_id, Comment.post_id == post_id)
+    )
+
+
 
 # Fetch all comments - GET - /posts/<int:post_id>/comments
 @comments_bp.route("/", methods=["GET"])
+@conditional(comments_versions)
+@cache.cached
 def get_all_comments(post_id):
     """
     Retrieves all the comments for a given post.
 
-    Queries the database for comments associated with a specific post ID and returns them ordered by timestamp.
+    Queries the database for one page of comments associated with a specific post ID and returns them ordered by timestamp (then ID) in descending order.
+    Pages are selected with the `limit` and `cursor` query parameters, or administrators can pass `stream=json` or
+    `stream=ndjson` to receive every comment on the post in a single streamed response.
 
     Args:
         post_id (int): The ID of the post for which to retrieve the comments.
     
     Returns:
-        JSON: Serialised comments with a 200 OK status if comments exist.
+        JSON: Serialised page of comments and the next page cursor with a 200 OK status if comments exist.
+        JSON: Error message with a 400 Bad Request status if the cursor, limit or stream format is invalid.
+        JSON: Error message with a 401 Unauthorized or 403 Forbidden status if a stream is requested without an
+              access token or by a user who is not an administrator.
         JSON: Error message with a 404 Not Found status if the post is not found.
     """
     try:
+        schema = get_fieldset(comments_schema)
         post = get_post(post_id)
         if not post:
             return {"error": f"Post with ID '{post_id}' not found."}, 404
         
-        stmt = db.select(Comment).filter_by(post_id=post_id).order_by(Comment.timestamp.desc())
-        comments = db.session.scalars(stmt).all()
-
-        if not comments:
+        stmt = db.select(Comment).filter_by(post_id=post_id).options(*loader_options(Comment, schema, Comment.timestamp))
+        stream_format = get_stream_format()
+        if stream_format:
+            return stream_response(stmt, schema, stream_format, Comment.timestamp, Comment.id)
+        cursor, limit = get_page_args()
+        comments = db.session.scalars(keyset(stmt, cursor, limit, Comment.timestamp, Comment.id)).all()
+        tag_response(f"post:{post_id}", *{f"user:{comment.user_id}" for comment in comments})
+        page = page_response(schema, comments, limit, Comment.timestamp, Comment.id)
+
+        if not page["data"] and not request.args.get("cursor"):
             return {"message": "There are no comments that belong to this post yet."}, 200
 
-        return comments_schema.dump(comments), 200
+        return page, 200
     
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
     except Exception as e:
         db.session.rollback()
         return {"error": "Internal Server Error"}, 500
@@ -50,6 +83,7 @@ def get_all_comments(post_id):
 
 # Fetch one particular comment - GET - /posts/<int:post_id>/comments/<int:comment_id>
 @comments_bp.route("/<int:comment_id>", methods=["GET"])
+@conditional(comment_versions, last_modified=True)
 def get_single_comment(post_id, comment_id):
     """
     Retrieves a single comment by its ID for a given post.
@@ -63,15 +97,19 @@ def get_single_comment(post_id, comment_id):
         JSON: Error message with a 404 Not Found status if the comment is not found.
     """
     try:
+        schema = get_fieldset(comment_schema)
         post = get_post(post_id)
         if not post:
             return {"error": f"Post with ID '{post_id}' not found."}, 404
         
-        comment = get_comment(comment_id, post_id)
+        comment = get_comment(comment_id, post_id, *loader_options(Comment, schema))
         if not comment:
             return {"error": f"Comment with ID {comment_id} not found for Post with ID {post_id}"}, 404
 
-        return comment_schema.dump(comment), 200
+        return schema.dump(comment), 200
+
+    except ValueError as e:
+        return {"error": str(e)}, 400
     
     except Exception as e:
         db.session.rollback()
@@ -113,7 +151,9 @@ def create_comment(post_id):
             user_id=get_jwt_identity()
         )
         db.session.add(comment)
+        adjust_post_counters(post.id, comments=1)
         db.session.commit()
+        cache.invalidate(f"post:{post.id}", f"profile:{comment.user_id}")
 
         return comment_schema.dump(comment), 201
     
@@ -130,14 +170,15 @@ def create_comment(post_id):
 # Update comment - PUT, PATCH - /posts/<int:post_id>/comments/<int:comment_id>
 @comments_bp.route("/<int:comment_id>", methods=["PUT", "PATCH"])
 @jwt_required()
-@auth_comment_action
-def edit_comment(post_id, comment_id):
+@authorize(Comment, "comment_id", inject="comment", options=(joinedload(Comment.posts),), post_id="post_id")
+def edit_comment(post_id, comment_id, comment):
     """
     Updates an existing comment by its ID foe a given post.
 
     Args:
         post_id (int): The ID of the post.
         comment_id (int): The ID of the comment to update.
+        comment (Comment): The comment and its post, loaded and authorised by the decorator.
 
     Returns:
         JSON: Serialised comment with a 200 OK status if update is successful.
@@ -145,17 +186,8 @@ def edit_comment(post_id, comment_id):
         JSON: Error message with a 400 Bad Request status if validation fails.
     """
     try:
-        post = get_post(post_id)
-        if not post:
-            return {"error": f"Post with ID {post_id} not found."}, 404
-        
-        comment = get_comment(comment_id, post_id)
-        if not comment:
-            return {"error": f"Comment with ID '{comment_id}' not found"}, 404
-        
-        if comment.post_id != post_id:
-            return {"error": f"Comment with ID '{comment_id}' does not belong to Post with ID {post_id}"}, 404
-        
+        post = comment.posts
+
         body_data = request.get_json()
         comment_body = body_data.get("comment_body", "").strip()
 
@@ -163,13 +195,16 @@ def edit_comment(post_id, comment_id):
             return {"error": "Comment body must be between 1 and 200 characters and cannot be empty."}, 400
         
         comment.comment_body = comment_body or comment.comment_body
+        touch_post(post)
         db.session.commit()
+        cache.invalidate(f"post:{post_id}", f"profile:{comment.user_id}")
         return comment_schema.dump(comment), 200
     
     except ValidationError as e:
         return {"error": str(e)}, 400
     
-    except Exception as e:
+    except Exception:
+        db.session.rollback()
         return {"error": "Internal Server Error"}, 500
     
 
@@ -178,33 +213,27 @@ def edit_comment(post_id, comment_id):
 # Delete Comment - DELETE - /posts/<int:post_id>/comments/<int:comment_id>
 @comments_bp.route("/<int:comment_id>", methods=["DELETE"])
 @jwt_required()
-@auth_comment_action
-def delete_comment(post_id, comment_id):
+@authorize(Comment, "comment_id", inject="comment", options=(joinedload(Comment.posts),), post_id="post_id")
+def delete_comment(post_id, comment_id, comment):
     """
     Deleted a comment by its ID for a given post.
 
     Args:
         post_id (int): The ID of the post.
         comment_id (int): The ID of the comment to delete.
+        comment (Comment): The comment and its post, loaded and authorised by the decorator.
 
     Returns:
         JSON: Success message with a 200 OK status if deleted is successful.
         JSON: Error message with a 404 Not Found status if the post or comment is not found.
     """
     try:
-        post = get_post(post_id)
-        if not post:
-            return {"error": f"Post with ID {post_id} not found."}, 404
-        
-        comment = get_comment(comment_id, post_id)
-        if not comment:
-            return {"error": f"Comment with ID '{comment_id}' not found"}, 404
-        
-        if comment.post_id != post_id:
-            return {"error": f"Comment with ID '{comment_id}' does not belong to Post with ID {post_id}"}, 404
-        
+        post = comment.posts
+        author_id = comment.user_id
         db.session.delete(comment)
+        adjust_post_counters(post.id, comments=-1)
         db.session.commit()
+        cache.invalidate(f"post:{post_id}", f"profile:{author_id}")
 
         return {"message": f"Comment with ID '{comment_id}' deleted successfully"}, 200
     
@@ -0,0 +1,154 @@
+from flask import Blueprint, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from init import db
+from models.post import Post, posts_schema
+from models.follower import Follower
+from models.user import User
+from models.timeline import TimelineEntry
+from utils import (conditional, embedded_user_versions, get_fieldset, get_page_args, keyset, loader_options,
+                   page_response)
+
+
+feed_bp = Blueprint("feed", __name__, url_prefix="/feed")
+
+
+# HELPERS KEEPING THE MATERIALISED TIMELINES IN STEP WITH POSTS AND FOLLOWS
+
+
+def has_many_followers(user_id):
+    """
+    Returns a clause that is true when a user has more followers than the fan-out limit.
+
+    Authors above the limit are not fanned out on write; their posts are pulled into each follower's feed when it is read.
+    The check reads the author's cached follower count, so it costs a single primary key lookup.
+    """
+    limit = current_app.config["FEED_FANOUT_LIMIT"]
+    author = db.aliased(User)
+    return db.select(author.id).where(author.id == user_id, author.follower_count > limit).exists()
+
+def fan_out_post(post):
+    """
+    Pushes a newly flushed post onto the timeline of every follower of its author with a single INSERT ... SELECT.
+    """
+    if db.session.scalar(db.select(has_many_followers(post.user_id))):
+        return
+    stmt = db.insert(TimelineEntry).from_select(
+        ["user_id", "post_id", "timestamp"],
+        db.select(Follower.follower_id, Post.id, Post.timestamp)
+        .join(Post, Post.user_id == Follower.followed_id)
+        .where(Post.id == post.id)
+    )
+    db.session.execute(stmt)
+
+def backfill_timeline(follower_id, *followed_ids):
+    """
+    Copies the most recent posts of newly followed users onto the follower's timeline.
+
+    A single user's posts are read with an index-ordered LIMIT. Several users' posts are ranked per author with a
+    window function, so a batch of follows is backfilled with one INSERT ... SELECT.
+    """
+    limit = current_app.config["FEED_BACKFILL"]
+    eligible = db.select(User.id).where(User.id.in_(followed_ids), ~has_many_followers(User.id))
+    followed_ids = db.session.scalars(eligible).all()
+    if not followed_ids:
+        return
+
+    if len(followed_ids) == 1:
+        recent_posts = (
+            db.select(db.literal(follower_id), Post.id, Post.timestamp)
+            .where(Post.user_id == followed_ids[0])
+            .order_by(Post.timestamp.desc(), Post.id.desc())
+            .limit(limit)
+        )
+    else:
+        rank = db.func.row_number().over(partition_by=Post.user_id, order_by=(Post.timestamp.desc(), Post.id.desc()))
+        ranked = db.select(Post.id, Post.timestamp, rank.label("rank")).where(Post.user_id.in_(followed_ids)).subquery()
+        recent_posts = db.select(db.literal(follower_id), ranked.c.id, ranked.c.timestamp).where(ranked.c.rank <= limit)
+    stmt = db.insert(TimelineEntry).from_select(["user_id", "post_id", "timestamp"], recent_posts)
+    db.session.execute(stmt)
+
+def prune_author(follower_id, *followed_ids):
+    """
+    Removes every post of the unfollowed users from the follower's timeline.
+    """
+    authored = db.select(Post.id).where(Post.user_id.in_(followed_ids))
+    stmt = db.delete(TimelineEntry).where(
+        TimelineEntry.user_id == follower_id,
+        TimelineEntry.post_id.in_(authored)
+    )
+    db.session.execute(stmt)
+
+
+
+def pulled_authors(user_id):
+    """
+    Selects the followed users whose posts are pulled into the feed on read.
+    """
+    followed = db.aliased(Follower)
+    return (
+        db.select(followed.followed_id)
+        .where(followed.follower_id == user_id, has_many_followers(followed.followed_id))
+    )
+
+def feed_versions():
+    """
+    Selects the versions of the posts the feed page can be built from: one keyset page of the timeline and one keyset
+    page per pulled author, so the cost is bounded by the page size rather than the size of the timeline.
+    """
+    user_id = get_jwt_identity()
+    cursor, limit = get_page_args()
+    pages = [
+        keyset(
+            db.select(TimelineEntry.post_id).where(TimelineEntry.user_id == user_id),
+            cursor, limit, TimelineEntry.timestamp, TimelineEntry.post_id
+        )
+    ]
+    for author_id in db.session.scalars(pulled_authors(user_id)):
+        pages.append(keyset(db.select(Post.id).where(Post.user_id == author_id), cursor, limit, Post.timestamp, Post.id))
+    post_ids = db.union_all(*[db.select(page.subquery()) for page in pages])
+    return (
+        db.select(Post.id, Post.version, Post.updated_at, *embedded_user_versions(Post))
+        .where(Post.id.in_(post_ids))
+        .order_by(Post.timestamp.desc(), Post.id.desc())
+    )
+
+
+
+# Fetch the home feed of the current user - GET - /feed
+@feed_bp.route("/", methods=["GET"])
+@jwt_required()
+@conditional(feed_versions)
+def get_feed():
+    """
+    Retrieves the posts of every user the current user follows, newest first.
+
+    Reads one keyset page from the user's materialised timeline and merges in the posts of followed authors whose
+    follower count is above the fan-out limit, which are pulled on read rather than pushed on write.
+    Pages are selected with the `limit` and `cursor` query parameters.
+
+    Returns:
+        JSON: Serialised page of posts and the next page cursor with a 200 OK status.
+        JSON: Error message with a 400 Bad Request status if the cursor or limit is invalid.
+    """
+    user_id = get_jwt_identity()
+    try:
+        schema = get_fieldset(posts_schema)
+        cursor, limit = get_page_args()
+
+        entries_stmt = keyset(
+            db.select(TimelineEntry.post_id).where(TimelineEntry.user_id == user_id),
+            cursor, limit, TimelineEntry.timestamp, TimelineEntry.post_id
+        )
+        post_ids = db.session.scalars(entries_stmt).all()
+        options = loader_options(Post, schema, Post.timestamp)
+        posts = db.session.scalars(db.select(Post).where(Post.id.in_(post_ids)).options(*options)).all() if post_ids else []
+
+        pulled_stmt = keyset(db.select(Post).where(Post.user_id.in_(pulled_authors(user_id))).options(*options), cursor, limit, Post.timestamp, Post.id)
+        posts.extend(post for post in db.session.scalars(pulled_stmt) if post.id not in post_ids)
+
+        posts.sort(key=lambda post: (post.timestamp, post.id), reverse=True)
+        return page_response(schema, posts[:limit + 1], limit, Post.timestamp, Post.id), 200
+
+    except ValueError as e:
+        return {"error": str(e)}, 400
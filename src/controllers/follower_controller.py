@@ -2,67 +2,142 @@ from flask import Blueprint, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from marshmallow.exceptions import ValidationError
 
-from init import db
+from init import db, cache
 from models.follower import Follower, follower_schema, followers_schema
 from models.user import User
-from utils import auth_unfollow_action, get_user_by_id
+from models.suggestion import Suggestion, suggestions_schema
+from controllers.feed_controller import backfill_timeline, prune_author
+from serializers import dump
+from utils import (adjust_follow_counters, auth_unfollow_action, authorize, conditional, get_batch_ids, get_fieldset,
+                   get_page_args, get_user_by_id, insert_ignore, keyset, page_response)
 
 
 follower_bp = Blueprint("follower", __name__, url_prefix="/users")
 
 
+def follow_page(user_id, side):
+    """
+    Selects one keyset page of a user's follow edges on the given side, with the username of the user on the other side.
+
+    Args:
+        user_id (int): The ID of the user whose followers or following list is read.
+        side (str): "followers" for the users following them, "following" for the users they follow.
+    """
+    cursor, limit = get_page_args()
+    own, other = (Follower.followed_id, Follower.follower_id) if side == "followers" else (Follower.follower_id, Follower.followed_id)
+    stmt = (
+        db.select(Follower.follower_id, Follower.followed_id, User.username, User.version)
+        .join(User, User.id == other)
+        .where(own == user_id)
+    )
+    return keyset(stmt, cursor, limit, other), limit, other
+
+def get_follow_page(user_id, side):
+    try:
+        schema = get_fieldset(followers_schema)
+        stmt, limit, key = follow_page(user_id, side)
+        rows = db.session.execute(stmt).all()
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    if not rows and db.session.get(User, user_id) is None:
+        return {"error": f"User with ID {user_id} not found."}, 404
+    return page_response(schema, rows, limit, key), 200
+
+def followers_versions(user_id):
+    return follow_page(user_id, "followers")[0]
+
+def following_versions(user_id):
+    return follow_page(user_id, "following")[0]
+
+
 # Fetches followers of a specific user - GET - /users/<int:user_id>/followers
 @follower_bp.route("/<int:user_id>/followers", methods=["GET"])
+@conditional(followers_versions)
 def get_followers(user_id):
     """
-    Fetches the followers of a specific user.
+    Fetches one page of the followers of a specific user.
+
+    Followers are ordered by user ID, newest accounts first, and each carries its username, read with a join.
+    The page size is set with the `limit` query parameter and the following page is requested by passing the returned `next_cursor` as `cursor`.
 
     Args:
         user_id (int): The ID of the user.
 
     Returns:
-        JSON: Serialised followers with a 200 OK status if successful.
+        JSON: Serialised page of followers and the next page cursor with a 200 OK status if successful.
+        JSON: Error message with a 400 Bad Request status if the cursor or limit is invalid.
         JSON: Error message with a 404 Not Found status if the user is not found.
     """
-    user = get_user_by_id(user_id)
-    
-    if user is None:
-        return {"error": f"User with ID {user_id} not found."}, 404
-    
-    followers = user.followers_assoc.all()
-    return followers_schema.dump(followers), 200
+    return get_follow_page(user_id, "followers")
 
 
 
 # /users/<int:user_id>/following
 @follower_bp.route("/<int:user_id>/following", methods=["GET"])
+@conditional(following_versions)
 def get_following(user_id):
     """
-    Fetches the users that a specific user is following.
+    Fetches one page of the users that a specific user is following.
+
+    Followed users are ordered by user ID, newest accounts first, and each carries its username, read with a join.
+    Pages are selected with the `limit` and `cursor` query parameters.
 
     Args:
         user_id (int): The ID of the user.
     
     Returns:
-        JSON: Serialised following list with a 200 OK status if successful.
+        JSON: Serialised page of the following list and the next page cursor with a 200 OK status if successful.
+        JSON: Error message with a 400 Bad Request status if the cursor or limit is invalid.
         JSON: Error message with a 404 Not Found status if the user is not found.
     """
-    user = get_user_by_id()
+    return get_follow_page(user_id, "following")
+
+
 
-    if user is None:
-        return {"error": f"User with ID {user_id} not found."}, 404
 
-    followed_stmt = db.select(Follower.followed_id).filter_by(follower_id=user_id)
-    followed_ids = db.session.scalars(followed_stmt).all()
 
-    if not followed_ids:
-        return {"message": "This user is not following anyone."}, 200
+# Fetches follow suggestions for a specific user - GET - /users/<int:user_id>/suggestions
+@follower_bp.route("/<int:user_id>/suggestions", methods=["GET"])
+@jwt_required()
+@authorize(User, "user_id", inject="user", owner_field="id")
+def get_suggestions(user_id, user):
+    """
+    Fetches the users a specific user may want to follow, best match first.
 
-    following_list = [{"follower_id": user_id, "followed_id": followed_id} for followed_id in followed_ids]
+    Suggestions are precomputed by the `flask db suggest-follows` command, so serving them is one read of the
+    suggestions primary key. Users followed since the command last ran are left out.
+
+    Args:
+        user_id (int): The ID of the user.
+        user (User): The user, loaded and authorised by the decorator.
+
+    Returns:
+        JSON: Serialised suggestions, each with the number of followed users who follow the suggested user as its
+              score, with a 200 OK status.
+        JSON: Error message with a 400 Bad Request status if a requested field does not exist.
+        JSON: Error message with a 403 Forbidden status if the JWT belongs to neither the user nor an administrator.
+        JSON: Error message with a 404 Not Found status if the user is not found.
+    """
+    try:
+        schema = get_fieldset(suggestions_schema)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    already_followed = (
+        db.select(Follower.followed_id)
+        .where(Follower.follower_id == user_id, Follower.followed_id == Suggestion.suggested_id)
+        .exists()
+    )
+    stmt = (
+        db.select(Suggestion.suggested_id, User.username, Suggestion.score)
+        .join(User, User.id == Suggestion.suggested_id)
+        .where(Suggestion.user_id == user_id, ~already_followed)
+        .order_by(Suggestion.rank)
+    )
+    return dump(schema, db.session.execute(stmt).all()), 200
 
-    return following_list, 200
 
-    
 
 
 # Follows a specific user - POST - /users/follow
@@ -72,7 +147,9 @@ def follow():
     """
     Follows a specific user.
 
-    Users can follow other users except themselves.
+    Users can follow other users except themselves. The follow is written with a single INSERT ... SELECT ...
+    ON CONFLICT DO NOTHING RETURNING, which only inserts when the followed user exists and relies on the unique
+    follow pair to reject duplicates.
 
     Returns:
         JSON: Serialised follow data with a 201 Created status if successful.
@@ -86,27 +163,26 @@ def follow():
             return {"error": "Missing 'followed_id' in request."}, 400
         
         followed_id = int(followed_id)
-        stmt = db.select(User).where(User.id == followed_id)
-        user_to_follow = db.session.scalar(stmt)
+        current_user_id = int(current_user_id)
 
-        if user_to_follow is None:
-            return {"error": f"User with ID {followed_id} not found"}, 404
-
-        if int(current_user_id) == followed_id:
+        if current_user_id == followed_id:
             return {"error": "You cannot follow yourself."}, 400
 
-        existing_follow = Follower.query.filter_by(follower_id=current_user_id, followed_id=followed_id).first()
-        if existing_follow:
+        followable = db.select(db.literal(current_user_id), User.id).where(User.id == followed_id)
+        stmt = insert_ignore(Follower).from_select(["follower_id", "followed_id"], followable).returning(Follower.followed_id)
+
+        if db.session.scalar(stmt) is None:
+            db.session.rollback()
+            if get_user_by_id(followed_id) is None:
+                return {"error": f"User with ID {followed_id} not found"}, 404
             return {"error": "You are already following this user."}, 400
-        
-        new_follow = Follower(
-            follower_id=current_user_id,
-            followed_id=followed_id
-        )
-        db.session.add(new_follow)
+
+        adjust_follow_counters(current_user_id, followed_id, delta=1)
+        backfill_timeline(current_user_id, followed_id)
         db.session.commit()
+        cache.invalidate(f"profile:{current_user_id}", f"profile:{followed_id}")
 
-        return follower_schema.dump(new_follow), 201
+        return follower_schema.dump({"follower_id": current_user_id, "followed_id": followed_id}), 201
         
     except ValidationError as e:
         return {"error": str(e)}, 400
@@ -122,12 +198,13 @@ def follow():
 @follower_bp.route("/<int:user_id>/unfollow", methods=["DELETE"])
 @jwt_required()
 @auth_unfollow_action
-def unfollow_user(user_id):
+def unfollow_user(user_id, follow):
     """
     Unfollow a specific user.
 
     Args:
         user_id (int): The ID of the user to unfollow.
+        follow (Follower): The follow relationship, loaded by the decorator.
 
     Return:
         JSON: Success message with a 200 OK status if successful.
@@ -136,21 +213,11 @@ def unfollow_user(user_id):
     """
     current_user_id = get_jwt_identity()
     try:
-        if int(current_user_id) == int(user_id):
-            return {"error": "You cannot follow or unfollow yourself."}, 400
-        
-        stmt = db.select(User).filter_by(id=user_id)
-        user_to_unfollow = db.session.scalar(stmt)
-
-        if user_to_unfollow is None:
-            return {"error": f"User with ID {user_id} not found."}, 404
-
-        existing_follow = Follower.query.filter_by(follower_id=current_user_id, followed_id=user_id).first()
-        if existing_follow is None:
-            return {"error": "You are already not following this user."}, 400
-        
-        db.session.delete(existing_follow)
+        db.session.delete(follow)
+        adjust_follow_counters(current_user_id, user_id, delta=-1)
+        prune_author(current_user_id, user_id)
         db.session.commit()
+        cache.invalidate(f"profile:{current_user_id}", f"profile:{user_id}")
 
         return {"message": f"You have successfully unfollowed user with ID {user_id}"}, 200
 
@@ -159,3 +226,130 @@ def unfollow_user(user_id):
         return {"error": str(e)}, 500
     
 
+
+
+
+def followable_users(current_user_id, user_ids):
+    """
+    Loads the given users in one query, each with whether the current user already follows them.
+    """
+    stmt = (
+        db.select(User.id, Follower.followed_id)
+        .outerjoin(Follower, db.and_(Follower.followed_id == User.id, Follower.follower_id == current_user_id))
+        .where(User.id.in_(user_ids))
+    )
+    return {user_id: followed_id is not None for user_id, followed_id in db.session.execute(stmt)}
+
+
+# Follow several users - POST - /users/follow/batch
+@follower_bp.route("/follow/batch", methods=["POST"])
+@jwt_required()
+def follow_users():
+    """
+    Follows a list of users in one transaction, applying the same rules as following a single user.
+
+    The users are validated with one query, the follows written with one multi-row INSERT ... ON CONFLICT DO NOTHING
+    and the followed users' recent posts backfilled onto the timeline with one INSERT ... SELECT.
+    Expects a JSON body such as {"user_ids": [1, 2, 3]}.
+
+    Returns:
+        JSON: A result per user with a 200 OK status: status 201 if it was followed, otherwise the status and error
+              message following it on its own would have returned.
+        JSON: Error message with a 400 Bad Request status if user_ids is missing or invalid.
+    """
+    current_user_id = int(get_jwt_identity())
+    try:
+        user_ids = get_batch_ids("user_ids")
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    try:
+        users = followable_users(current_user_id, user_ids)
+        results = {}
+        for user_id in user_ids:
+            if user_id == current_user_id:
+                results[user_id] = {"user_id": user_id, "status": 400, "error": "You cannot follow yourself."}
+            elif user_id not in users:
+                results[user_id] = {"user_id": user_id, "status": 404, "error": f"User with ID {user_id} not found"}
+            elif users[user_id]:
+                results[user_id] = {"user_id": user_id, "status": 400, "error": "You are already following this user."}
+
+        to_follow = [user_id for user_id in user_ids if user_id not in results]
+        followed = set()
+        if to_follow:
+            rows = [{"follower_id": current_user_id, "followed_id": user_id} for user_id in to_follow]
+            stmt = insert_ignore(Follower).values(rows).returning(Follower.followed_id)
+            followed = set(db.session.scalars(stmt).all())
+            if followed:
+                adjust_follow_counters(current_user_id, *followed, delta=1)
+                backfill_timeline(current_user_id, *followed)
+            db.session.commit()
+            cache.invalidate(*(f"profile:{user_id}" for user_id in (current_user_id, *followed)))
+
+        for user_id in to_follow:
+            if user_id in followed:
+                results[user_id] = {"user_id": user_id, "status": 201}
+            else:
+                results[user_id] = {"user_id": user_id, "status": 400, "error": "You are already following this user."}
+        return {"results": [results[user_id] for user_id in user_ids]}, 200
+
+    except Exception as e:
+        db.session.rollback()
+        return {"error": str(e)}, 500
+
+
+
+# Unfollow several users - DELETE - /users/unfollow/batch
+@follower_bp.route("/unfollow/batch", methods=["DELETE"])
+@jwt_required()
+def unfollow_users():
+    """
+    Unfollows a list of users in one transaction.
+
+    The users are validated with one query and the follows removed with one multi-row DELETE, after which the
+    unfollowed users' posts are pruned from the timeline with one DELETE.
+    Expects a JSON body such as {"user_ids": [1, 2, 3]}.
+
+    Returns:
+        JSON: A result per user with a 200 OK status: status 200 if it was unfollowed, otherwise the status and
+              error message unfollowing it on its own would have returned.
+        JSON: Error message with a 400 Bad Request status if user_ids is missing or invalid.
+    """
+    current_user_id = int(get_jwt_identity())
+    try:
+        user_ids = get_batch_ids("user_ids")
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    try:
+        users = followable_users(current_user_id, user_ids)
+        to_unfollow = [user_id for user_id in user_ids if users.get(user_id) and user_id != current_user_id]
+        unfollowed = set()
+        if to_unfollow:
+            stmt = (
+                db.delete(Follower)
+                .where(Follower.follower_id == current_user_id, Follower.followed_id.in_(to_unfollow))
+                .returning(Follower.followed_id)
+            )
+            unfollowed = set(db.session.scalars(stmt).all())
+            if unfollowed:
+                adjust_follow_counters(current_user_id, *unfollowed, delta=-1)
+                prune_author(current_user_id, *unfollowed)
+            db.session.commit()
+            cache.invalidate(*(f"profile:{user_id}" for user_id in (current_user_id, *unfollowed)))
+
+        results = []
+        for user_id in user_ids:
+            if user_id == current_user_id:
+                results.append({"user_id": user_id, "status": 400, "error": "You cannot follow or unfollow yourself."})
+            elif user_id not in users:
+                results.append({"user_id": user_id, "status": 404, "error": f"User with ID {user_id} not found."})
+            elif user_id in unfollowed:
+                results.append({"user_id": user_id, "status": 200, "message": f"You have successfully unfollowed user with ID {user_id}"})
+            else:
+                results.append({"user_id": user_id, "status": 400, "error": "You are already not following this user."})
+        return {"results": results}, 200
+
+    except Exception as e:
+        db.session.rollback()
+        return {"error": str(e)}, 500
@@ -1,18 +1,27 @@
 from flask import Blueprint
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.orm import joinedload
 from marshmallow.exceptions import ValidationError
 
-from init import db
+from init import db, cache
 from models.like import Like, like_schema, likes_schema
 from models.post import Post
-from utils import auth_like_action, get_post
+from serializers import dump
+from utils import (adjust_post_counters, authorize, conditional, get_batch_ids, get_fieldset, get_post, insert_ignore,
+                   loader_options, user_versions)
 
 
 likes_bp = Blueprint("likes", __name__, url_prefix="/posts/<int:post_id>/likes")
 
 
+def likes_versions(post_id):
+    likers = user_versions(Like.user_id, Like.post_id == post_id)
+    return db.select(Post.version, Post.updated_at, likers).where(Post.id == post_id)
+
+
 # Fetch all likes on a post - GET - /post/<int:post_id>/likes
 @likes_bp.route("/", methods=["GET"])
+@conditional(likes_versions)
 def get_post_likes(post_id):
     """
     Fetch all likes on a specific post.
@@ -24,13 +33,19 @@ def get_post_likes(post_id):
         JSON: Serialised likes with 200 OK status if successful.
         JSON: Error message with a 404 Not Found status if the post is not found.
     """
+    try:
+        schema = get_fieldset(likes_schema)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
     post = get_post(post_id)
 
     if post is None:
         return {"error": f"Post with ID {post_id} not found."}, 404
         
-    likes = Like.query.filter_by(post_id=post.id).all()
-    return likes_schema.dump(likes), 200
+    stmt = db.select(Like).filter_by(post_id=post.id).options(*loader_options(Like, schema))
+    likes = db.session.scalars(stmt).all()
+    return dump(schema, likes), 200
 
 
 
@@ -43,6 +58,10 @@ def like_post(post_id):
 
     Users can like a post they do not own. Prevents liking a post more than once.
 
+    The like is written with a single INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING, which only inserts when
+    the post exists and belongs to someone else, and relies on the unique (user_id, post_id) constraint to reject
+    duplicates. The post is only looked up to explain why nothing was inserted.
+
     Args:
         post_id (int): The ID of the post to like.
 
@@ -50,27 +69,27 @@ def like_post(post_id):
         JSON: Serialised like with a 201 Created status if successful.
         JSON: Error message with a 404 Not Found status if the post is not found.
         JSON: Error message with a 403 Forbidden status if the user attempts to like their own post.
+        JSON: Error message with a 400 Bad Request status if the post is already liked.
     """
     try:
-        user_id = get_jwt_identity()
-        post = get_post(post_id)
-
-        if not post:
-            return {"error": f"Post with ID {post_id} not found."}, 404
-        
-        if str(post.user_id) == str(user_id):
-            return {"error": f"You cannot like your own post."}, 403
-        
-        existing_like = Like.query.filter_by(user_id=user_id, post_id=post.id).first()
-        if existing_like:
+        user_id = int(get_jwt_identity())
+        likeable = db.select(db.literal(user_id), Post.id).where(Post.id == post_id, Post.user_id != user_id)
+        stmt = insert_ignore(Like).from_select(["user_id", "post_id"], likeable).returning(Like.id)
+        like_id = db.session.scalar(stmt)
+
+        if like_id is None:
+            db.session.rollback()
+            post = get_post(post_id)
+            if not post:
+                return {"error": f"Post with ID {post_id} not found."}, 404
+            if post.user_id == user_id:
+                return {"error": f"You cannot like your own post."}, 403
             return {"error": f"Post with ID {post_id} already liked."}, 400
-        
-        new_like = Like(
-            user_id=user_id,
-            post_id=post.id
-        )
-        db.session.add(new_like)
+
+        adjust_post_counters(post_id, likes=1)
         db.session.commit()
+        cache.invalidate(f"post:{post_id}", f"profile:{user_id}")
+        new_like = db.session.get(Like, like_id, options=[joinedload(Like.user), joinedload(Like.posts)])
         return like_schema.dump(new_like), 201
     
     except ValidationError as e:
@@ -85,34 +104,147 @@ def like_post(post_id):
 # Unlike a post - DELETE - /post/<int:post_id>/likes/<int:like_id>
 @likes_bp.route("/<int:like_id>", methods=["DELETE"])
 @jwt_required()
-@auth_like_action
-def unlike_post(post_id, like_id):
+@authorize(Like, "like_id", inject="like", options=(joinedload(Like.posts),), post_id="post_id")
+def unlike_post(post_id, like_id, like):
     """
     Removes a like from a specific post.
 
     Args:
         post_id (int): The ID of the post.
         like_id (int): The Id of the like to remove.
+        like (Like): The like and its post, loaded and authorised by the decorator.
 
     Returns:
         JSON: Success message with a 200 OK status if like is successful.
         JSON: Error message with a 404 Not Found status if the like is not found.
     """
     try:
-        user_id = get_jwt_identity()
-        post = get_post(post_id)
+        post = like.posts
+        user_id = like.user_id
 
-        if post is None:
-            return {"error": f"Post with ID {post_id} not found"}, 404
-        
-        existing_like = Like.query.filter_by(user_id=user_id, post_id=post.id).first()
-        if not existing_like:
-            return {"error": "Like not found"}, 404
-        
-        db.session.delete(existing_like)
+        db.session.delete(like)
+        adjust_post_counters(post.id, likes=-1)
         db.session.commit()
+        cache.invalidate(f"post:{post.id}", f"profile:{user_id}")
         return {"message": "Like removed"}, 200
         
     except Exception as e:
         db.session.rollback()
         return {"error": str(e)}, 500
+
+
+
+likes_batch_bp = Blueprint("likes_batch", __name__, url_prefix="/posts/likes")
+
+
+def likeable_posts(user_id, post_ids):
+    """
+    Loads the given posts in one query, each with the ID of the user's like on it (None when not liked).
+    """
+    stmt = (
+        db.select(Post.id, Post.user_id, Like.id)
+        .outerjoin(Like, db.and_(Like.post_id == Post.id, Like.user_id == user_id))
+        .where(Post.id.in_(post_ids))
+    )
+    return {post_id: (author_id, like_id) for post_id, author_id, like_id in db.session.execute(stmt)}
+
+
+# Like several posts - POST - /posts/likes/batch
+@likes_batch_bp.route("/batch", methods=["POST"])
+@jwt_required()
+def like_posts():
+    """
+    Likes a list of posts in one transaction, applying the same rules as liking a single post.
+
+    The posts are validated with one query and the likes written with one multi-row INSERT ... ON CONFLICT DO NOTHING.
+    Expects a JSON body such as {"post_ids": [1, 2, 3]}.
+
+    Returns:
+        JSON: A result per post with a 200 OK status: status 201 and the like ID if it was liked, otherwise the
+              status and error message liking it on its own would have returned.
+        JSON: Error message with a 400 Bad Request status if post_ids is missing or invalid.
+    """
+    user_id = int(get_jwt_identity())
+    try:
+        post_ids = get_batch_ids("post_ids")
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    try:
+        posts = likeable_posts(user_id, post_ids)
+        results = {}
+        for post_id in post_ids:
+            if post_id not in posts:
+                results[post_id] = {"post_id": post_id, "status": 404, "error": f"Post with ID {post_id} not found."}
+            elif posts[post_id][0] == user_id:
+                results[post_id] = {"post_id": post_id, "status": 403, "error": "You cannot like your own post."}
+            elif posts[post_id][1] is not None:
+                results[post_id] = {"post_id": post_id, "status": 400, "error": f"Post with ID {post_id} already liked."}
+
+        to_like = [post_id for post_id in post_ids if post_id not in results]
+        liked = {}
+        if to_like:
+            stmt = insert_ignore(Like).values([{"user_id": user_id, "post_id": post_id} for post_id in to_like])
+            liked = dict(db.session.execute(stmt.returning(Like.post_id, Like.id)).all())
+            adjust_post_counters(*liked, likes=1)
+            db.session.commit()
+            cache.invalidate(*(f"post:{post_id}" for post_id in liked), f"profile:{user_id}")
+
+        for post_id in to_like:
+            if post_id in liked:
+                results[post_id] = {"post_id": post_id, "status": 201, "like_id": liked[post_id]}
+            else:
+                results[post_id] = {"post_id": post_id, "status": 400, "error": f"Post with ID {post_id} already liked."}
+        return {"results": [results[post_id] for post_id in post_ids]}, 200
+
+    except Exception as e:
+        db.session.rollback()
+        return {"error": "Internal Server Error"}, 500
+
+
+
+# Unlike several posts - DELETE - /posts/likes/batch
+@likes_batch_bp.route("/batch", methods=["DELETE"])
+@jwt_required()
+def unlike_posts():
+    """
+    Removes the current user's likes from a list of posts in one transaction.
+
+    The posts are validated with one query and the likes removed with one multi-row DELETE.
+    Expects a JSON body such as {"post_ids": [1, 2, 3]}.
+
+    Returns:
+        JSON: A result per post with a 200 OK status: status 200 if the like was removed, 404 if the post does not
+              exist or 400 if it was not liked.
+        JSON: Error message with a 400 Bad Request status if post_ids is missing or invalid.
+    """
+    user_id = int(get_jwt_identity())
+    try:
+        post_ids = get_batch_ids("post_ids")
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    try:
+        posts = likeable_posts(user_id, post_ids)
+        to_unlike = [post_id for post_id in post_ids if post_id in posts and posts[post_id][1] is not None]
+        unliked = set()
+        if to_unlike:
+            stmt = db.delete(Like).where(Like.user_id == user_id, Like.post_id.in_(to_unlike)).returning(Like.post_id)
+            unliked = set(db.session.scalars(stmt).all())
+            adjust_post_counters(*unliked, likes=-1)
+            db.session.commit()
+            cache.invalidate(*(f"post:{post_id}" for post_id in unliked), f"profile:{user_id}")
+
+        results = []
+        for post_id in post_ids:
+            if post_id not in posts:
+                results.append({"post_id": post_id, "status": 404, "error": f"Post with ID {post_id} not found."})
+            elif post_id in unliked:
+                results.append({"post_id": post_id, "status": 200, "message": "Like removed"})
+            else:
+                results.append({"post_id": post_id, "status": 400, "error": f"Post with ID {post_id} is not liked."})
+        return {"results": results}, 200
+
+    except Exception as e:
+        db.session.rollback()
+        return {"error": "Internal Server Error"}, 500
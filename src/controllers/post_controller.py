@@ -4,45 +4,105 @@ from flask import Blueprint, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from marshmallow.exceptions import ValidationError
 
-from init import db
+from init import db, cache
+from cache import tag_response, post_tags
 from models.post import Post, post_schema, posts_schema
-from models.like import Like
-from models.comment import Comment
 from models.thread import InnovationThread
 from controllers.comment_controller import comments_bp
-from utils import auth_user_action, get_post, get_thread, get_thread_post
+from controllers.feed_controller import fan_out_post
+from serializers import dump
+from utils import (authorize, conditional, embedded_user_versions, get_fieldset, get_page_args, get_post,
+                   get_stream_format, get_thread, get_thread_post, keyset, loader_options, paginate, stream_response,
+                   touch_thread, trending)
 
 
 posts_bp = Blueprint("posts", __name__, url_prefix="/posts")
 posts_bp.register_blueprint(comments_bp)
 
 
+def post_versions(post_id, thread_id=None):
+    stmt = db.select(Post.id, Post.version, Post.updated_at, *embedded_user_versions(Post)).where(Post.id == post_id)
+    return stmt if thread_id is None else stmt.where(Post.thread_id == thread_id)
+
+def post_page_versions(thread_id=None):
+    cursor, limit = get_page_args()
+    stmt = db.select(Post.id, Post.version, Post.updated_at, *embedded_user_versions(Post))
+    if thread_id is not None:
+        stmt = stmt.where(Post.thread_id == thread_id)
+    return keyset(stmt, cursor, limit, Post.timestamp, Post.id)
+
+
+def trending_post_versions():
+    _, limit = get_page_args()
+    return trending("post", Post, limit, Post.id, Post.version, Post.updated_at, *embedded_user_versions(Post))
+
+
 # POST CONTROLLERS ALLOWING USERS TO POST FROM THEIR ACCOUNT
 
 
 # Fetch all posts - GET - /posts
 @posts_bp.route("/", methods=["GET"])
+@conditional(post_page_versions)
 def get_all_posts():
     """
     Retrieves all posts from the datase, ordered by timestamp in descending order.
 
-    Queries the database for all Post records, orders them by timestamp in descending order, and returns the serialised list of posts.
+    Queries the database for one page of Post records, ordered by timestamp (then ID) in descending order, and returns the serialised page of posts.
+    The page size is set with the `limit` query parameter and the following page is requested by passing the returned `next_cursor` as `cursor`.
+
+    Administrators can pass `stream=json` or `stream=ndjson` to receive every post in a single streamed response instead.
 
     Returns:
-    JSON: Serialised list of all posts with a 200 OK status if posts exist.
+    JSON: Serialised page of posts and the next page cursor with a 200 OK status if posts exist.
+    JSON: Error message with a 400 Bad Request status if the cursor, limit or stream format is invalid.
+    JSON: Error message with a 401 Unauthorized or 403 Forbidden status if a stream is requested without an
+          access token or by a user who is not an administrator.
     JSON: Error message with a 404 Not Found status if no posts are found.
     """
-    stmt = db.select(Post).order_by(Post.timestamp.desc())
-    posts = db.session.scalars(stmt)
+    try:
+        schema = get_fieldset(posts_schema)
+        stmt = db.select(Post).options(*loader_options(Post, schema, Post.timestamp))
+        stream_format = get_stream_format()
+        if stream_format:
+            return stream_response(stmt, schema, stream_format, Post.timestamp, Post.id)
+        page = paginate(stmt, schema, Post.timestamp, Post.id)
+    except ValueError as e:
+        return {"error": str(e)}, 400
 
-    if posts:
-         return posts_schema.dump(posts), 200
+    if page["data"] or request.args.get("cursor"):
+        return page, 200
     else:
         return {"error": "No posts found."}, 404
 
 
+# Fetch trending posts - GET - /posts/trending
+@posts_bp.route("/trending", methods=["GET"])
+@conditional(trending_post_versions)
+def get_trending_posts():
+    """
+    Retrieves the posts that are trending right now, highest score first.
+
+    Scores weigh a post's likes and comments against its age and are precomputed by `flask db rank-trending`, so
+    this reads the top of the rankings table. The number of posts is set with the `limit` query parameter.
+
+    Returns:
+        JSON: Serialised trending posts with a 200 OK status.
+        JSON: Error message with a 400 Bad Request status if the limit is invalid.
+    """
+    try:
+        _, limit = get_page_args()
+        schema = get_fieldset(posts_schema)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    stmt = trending("post", Post, limit, Post).options(*loader_options(Post, schema))
+    return {"data": dump(schema, db.session.scalars(stmt).all())}, 200
+
+
 # Fetch a single post - GET - /posts/<int:post_id>
 @posts_bp.route("/<int:post_id>", methods=["GET"])
+@conditional(post_versions, last_modified=True)
+@cache.cached
 def get_single_post(post_id):
     """
     Retrieves a single post via its ID.
@@ -56,9 +116,15 @@ def get_single_post(post_id):
         JSON: Serialised post with a 200 OK status if the post exists.
         JSON: Error message with a 404 Not Found status if the post is not found.
     """
-    post = get_post(post_id)
+    try:
+        schema = get_fieldset(post_schema)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    post = get_post(post_id, *loader_options(Post, schema))
     if post:
-        return post_schema.dump(post), 200
+        tag_response(*post_tags(post))
+        return schema.dump(post), 200
     else:
         return {"error": f"Post with ID {post_id} not found."}, 404
 
@@ -89,7 +155,10 @@ def create_post():
             user_id=get_jwt_identity()
         )
         db.session.add(new_post)
+        db.session.flush()
+        fan_out_post(new_post)
         db.session.commit()
+        cache.invalidate(f"profile:{new_post.user_id}")
 
         return post_schema.dump(new_post), 201
     
@@ -106,8 +175,8 @@ def create_post():
 # Edit a post - PUT, PATCH - /posts/<int:post_id>
 @posts_bp.route("/<int:post_id>", methods=["PUT", "PATCH"])
 @jwt_required()
-@auth_user_action(Post, "post_id")
-def update_post(post_id):
+@authorize(Post, "post_id", inject="post")
+def update_post(post_id, post):
     """
     Updates an existing post by its ID.
 
@@ -115,6 +184,7 @@ def update_post(post_id):
 
     Args:
         post_id (int): The ID of the post to update.
+        post (Post): The post, loaded and authorised by the decorator.
 
     Return:
         JSON: Serlialised updated post with a 200 OK status if update is successful.
@@ -124,11 +194,7 @@ def update_post(post_id):
     """
     try:
         body_data = post_schema.load(request.get_json(), partial=True)
-        post = get_post(post_id)
 
-        if not post:
-            return {"error": f"Post with ID {post_id} not found."}, 404
-        
         if not body_data or not isinstance(body_data["body"], str) or not body_data.get("body").strip():
             return {"error": "Invalid request body"}, 400
 
@@ -136,7 +202,9 @@ def update_post(post_id):
         if body_data.get("timestamp"):
             post.timestamp = datetime.strptime(body_data["timestamp"], "%Y-%m-%d").date()
 
+        touch_thread(post.thread_id)
         db.session.commit()
+        cache.invalidate(f"post:{post_id}")
 
         return post_schema.dump(post), 200
     
@@ -153,15 +221,17 @@ def update_post(post_id):
 # Delete a post - DELETE - /posts/<int:post_id>
 @posts_bp.route("/<int:post_id>", methods=["DELETE"])
 @jwt_required()
-@auth_user_action(Post, "post_id")
-def delete_post(post_id):
+@authorize(Post, "post_id", inject="post")
+def delete_post(post_id, post):
     """
     Deletes a post by its ID.
 
-    Removes the Post record with the speicfied ID from the database, along with all associated lieks and comments.
+    Removes the Post record with the speicfied ID from the database. Its likes, comments and timeline entries are removed
+    by the database's ON DELETE CASCADE in the same statement.
 
     Args:
         post_id (int): The ID of the post to delete.
+        post (Post): The post, loaded and authorised by the decorator.
 
     Returns:
         JSON: Success message with a 200 OK status fi deletion is successful.
@@ -169,16 +239,11 @@ def delete_post(post_id):
         JSON: Error message with a 500 Internal Server Error status if an exception occurs.
     """
     try:
-        post = get_post(post_id)
-        
-        if not post:
-            return {"error": f"Post with ID {post_id} not found."}, 404
-
-        db.session.query(Like).filter_by(post_id=post_id).delete()
-        db.session.query(Comment).filter_by(post_id=post_id).delete()
-
+        tags = (f"post:{post_id}", f"profile:{post.user_id}", f"thread:{post.thread_id}")
+        touch_thread(post.thread_id)
         db.session.delete(post)
         db.session.commit()
+        cache.invalidate(*tags)
 
         return {"message": f"Post with ID {post_id} successfully deleted."}, 200
     
@@ -195,28 +260,41 @@ def delete_post(post_id):
 
 # Get all posts on a specific thread - GET - /posts/threads/<int:thread_id>
 @posts_bp.route("threads/<int:thread_id>", methods=["GET"])
+@conditional(post_page_versions)
 def get_all_posts_in_thread(thread_id):
     """
     Retrieves all posts in a specific thread.
 
-    Queries the database for all Post records within a specific thread, ordered by timestamp in descending order.
+    Queries the database for one page of Post records within a specific thread, ordered by timestamp (then ID) in descending order.
+    Pages are selected with the `limit` and `cursor` query parameters, or administrators can pass `stream=json` or
+    `stream=ndjson` to receive every post in the thread in a single streamed response.
 
     Args:
         thread_id (int): The ID of the thread to retrieve posts from.
 
     Returns:
-        JSON: Serialised list of posts within the thread with a 200 OK status if posts exist.
+        JSON: Serialised page of posts within the thread and the next page cursor with a 200 OK status if posts exist.
+        JSON: Error message with a 400 Bad Request status if the cursor, limit or stream format is invalid.
+        JSON: Error message with a 401 Unauthorized or 403 Forbidden status if a stream is requested without an
+              access token or by a user who is not an administrator.
         JSON: Error message with a 404 Not Found status ifi no posts are found in the thread. 
     """
     try:
-        stmt = db.select(Post).filter_by(thread_id=thread_id).order_by(Post.timestamp.desc())
-        posts = db.session.scalars(stmt).all()
-
-        if not posts:
+        schema = get_fieldset(posts_schema)
+        stmt = db.select(Post).filter_by(thread_id=thread_id).options(*loader_options(Post, schema, Post.timestamp))
+        stream_format = get_stream_format()
+        if stream_format:
+            return stream_response(stmt, schema, stream_format, Post.timestamp, Post.id)
+        page = paginate(stmt, schema, Post.timestamp, Post.id)
+
+        if not page["data"] and not request.args.get("cursor"):
             return {"error": f"No posts found in Thread with ID {thread_id}."}, 404
         
-        return posts_schema.dump(posts), 200
+        return page, 200
     
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
     except Exception:
         db.session.rollback()
         return {"error": "Internal Server Error."}, 500
@@ -225,6 +303,7 @@ def get_all_posts_in_thread(thread_id):
 
 # Get a specfic post on a specific thread - GET - /posts/<int:post_id>/threads/<int:thread_id>
 @posts_bp.route("<int:post_id>/threads/<int:thread_id>", methods=["GET"])
+@conditional(post_versions, last_modified=True)
 def get_posts_in_thread(thread_id, post_id):
     """
     Retrieves a specific post in a speicific thread.
@@ -240,12 +319,16 @@ def get_posts_in_thread(thread_id, post_id):
         JSON: Error message with a 404 Not Found status fi the post is not found within the thread.
     """
     try:
-        post = get_thread_post(post_id, thread_id)
+        schema = get_fieldset(post_schema)
+        post = get_thread_post(post_id, thread_id, *loader_options(Post, schema))
 
         if not post:
             return {"error": f"Post with ID {post_id} not found in Thread with ID {thread_id}."}, 404
         
-        return post_schema.dump(post), 200
+        return schema.dump(post), 200
+
+    except ValueError as e:
+        return {"error": str(e)}, 400
     
     except Exception:
         db.session.rollback()
@@ -288,7 +371,11 @@ def post_to_thread(thread_id):
                 thread_id=thread_id
             )
             db.session.add(new_post)
+            db.session.flush()
+            fan_out_post(new_post)
+            touch_thread(thread_id)
             db.session.commit()
+            cache.invalidate(f"profile:{new_post.user_id}", f"thread:{thread_id}")
 
             return post_schema.dump(new_post), 201
         
@@ -304,8 +391,8 @@ def post_to_thread(thread_id):
 # Edit post on a thread - EDIT - /post/<int:post_id>/threads/<int:thread_id>
 @posts_bp.route("/<int:post_id>/threads/<int:thread_id>", methods=["PUT", "PATCH"])
 @jwt_required()
-@auth_user_action(Post, "post_id")
-def update_post_in_thread(thread_id, post_id):
+@authorize(Post, "post_id", inject="post", thread_id="thread_id")
+def update_post_in_thread(thread_id, post_id, post):
     """
     Updates an existing post in a specific thread.
 
@@ -314,6 +401,7 @@ def update_post_in_thread(thread_id, post_id):
     Args:
         thread_id (int): The ID of the thread containing the post.
         post_id (int): The ID of the post to update.
+        post (Post): The post, loaded and authorised by the decorator.
 
     Returns:
         JSON: Serialised updated post with a 200 OK status if update is successful.
@@ -323,16 +411,14 @@ def update_post_in_thread(thread_id, post_id):
     """
     try:
         body_data = post_schema.load(request.get_json(), partial=True)
-        post = get_thread_post(post_id, thread_id)
-
-        if not post:
-            return {"error": f"Post with ID {post_id} not found in Thread with ID {thread_id}."}, 404
 
         post.body = body_data.get("body", post.body)
         if body_data.get("timestamp"):
             post.timestamp = datetime.strptime(body_data["timestamp"], "%Y-%m-%d").date()
 
+        touch_thread(thread_id)
         db.session.commit()
+        cache.invalidate(f"post:{post_id}", f"thread:{thread_id}")
 
         return post_schema.dump(post), 200
     
@@ -348,16 +434,18 @@ def update_post_in_thread(thread_id, post_id):
 # Delete post in thread - DELETE - /post/<int:post_id>/threads/<int:thread_id>
 @posts_bp.route("/<int:post_id>/threads/<int:thread_id>", methods=["DELETE"])
 @jwt_required()
-@auth_user_action(Post, "post_id")
-def delete_post_in_thread(thread_id, post_id):
+@authorize(Post, "post_id", inject="post", thread_id="thread_id")
+def delete_post_in_thread(thread_id, post_id, post):
     """
     Deletes a post in a specific thread.
 
-    Removes the Post record with the specified ID from the specified thread, along with all associated likes and comments.
+    Removes the Post record with the specified ID from the specified thread. Its likes, comments and timeline
+    entries are removed by the database's ON DELETE CASCADE in the same statement.
 
     Args:
         thread_id (int): The ID of the thread containing the post.
         post_id (int): The Id of the post to delete.
+        post (Post): The post, loaded and authorised by the decorator.
 
     Returns:
         JSON: Success message with a 200 OK status if deletion is successful.
@@ -365,16 +453,11 @@ def delete_post_in_thread(thread_id, post_id):
         JSON: Error message with a 500 Internal Server Error status if an exception occurs.
     """
     try:
-        post = get_thread_post(post_id, thread_id)
-
-        if not post:
-            return {"error": f"Post with ID {post_id} not found in Thread with ID {thread_id}."}, 404
-
-        db.session.query(Like).filter_by(post_id=post_id).delete()
-        db.session.query(Comment).filter_by(post_id=post_id).delete()
-
+        tags = (f"post:{post_id}", f"profile:{post.user_id}", f"thread:{thread_id}")
+        touch_thread(thread_id)
         db.session.delete(post)
         db.session.commit()
+        cache.invalidate(*tags)
 
         return {"message": f"Post with ID {post_id} deleted successfully."}, 200
     
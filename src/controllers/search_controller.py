@@ -0,0 +1,36 @@
+from flask import Blueprint, request
+
+from search import search
+from utils import get_page_args
+
+
+search_bp = Blueprint("search", __name__, url_prefix="/search")
+
+MAX_QUERY_LENGTH = 200
+
+
+# Search posts, comments and threads - GET - /search?q=<text>
+@search_bp.route("/", methods=["GET"])
+def search_content():
+    """
+    Searches the text of posts, comments and Innovation Threads, best match first.
+
+    Every word of the `q` query parameter must appear in a result. Words in a thread's title rank above words in its
+    content. Each result carries its type, ID (and post ID for comments), rank and a snippet with the matching words
+    wrapped in <b></b>. Pages are selected with the `limit` and `cursor` query parameters.
+
+    Returns:
+        JSON: Serialised page of results and the next page cursor with a 200 OK status.
+        JSON: Error message with a 400 Bad Request status if the query is missing or too long, or the cursor or limit is invalid.
+    """
+    text = request.args.get("q", "").strip()
+    if not text:
+        return {"error": "Missing 'q' search query."}, 400
+    if len(text) > MAX_QUERY_LENGTH:
+        return {"error": f"Search query cannot be longer than {MAX_QUERY_LENGTH} characters."}, 400
+
+    try:
+        cursor, limit = get_page_args()
+        return search(text, cursor, limit), 200
+    except ValueError as e:
+        return {"error": str(e)}, 400
@@ -4,57 +4,141 @@ from flask import Blueprint, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from marshmallow import ValidationError
 
-from init import db
-from models.thread import InnovationThread, thread_schema, threads_schema
-from models.post import Post
-from utils import auth_thread_action, get_thread
+from init import db, cache
+from cache import tag_response, post_tags
+from models.thread import InnovationThread, thread_detail_schema, thread_schema, threads_schema
+from models.post import Post, thread_posts_schema
+from serializers import dump
+from utils import (authorize, conditional, embedded_user_versions, get_fieldset, get_page_args, get_stream_format,
+                   get_thread, keyset, loader_options, page_response, paginate, stream_response, trending)
 
 
 thread_bp = Blueprint("threads", __name__, url_prefix="/threads")
 
 
+def thread_versions(thread_id):
+    cursor, limit = get_page_args()
+    thread = (
+        db.select(InnovationThread.id, InnovationThread.version, InnovationThread.updated_at,
+                  *embedded_user_versions(InnovationThread, nested=False))
+        .where(InnovationThread.id == thread_id)
+    )
+    posts = keyset(
+        db.select(Post.id, Post.version, Post.updated_at, *embedded_user_versions(Post, nested=False))
+        .where(Post.thread_id == thread_id),
+        cursor, limit, Post.timestamp, Post.id
+    )
+    return db.union_all(thread, db.select(posts.subquery()))
+
+def thread_page_versions():
+    cursor, limit = get_page_args()
+    stmt = db.select(
+        InnovationThread.id, InnovationThread.version, InnovationThread.updated_at,
+        *embedded_user_versions(InnovationThread)
+    )
+    return keyset(stmt, cursor, limit, InnovationThread.timestamp, InnovationThread.id)
+
+def trending_thread_versions():
+    _, limit = get_page_args()
+    columns = (InnovationThread.id, InnovationThread.version, InnovationThread.updated_at)
+    return trending("thread", InnovationThread, limit, *columns, *embedded_user_versions(InnovationThread))
+
+
 # Fetch all threads - GET - /threads
 @thread_bp.route("/", methods=["GET"])
+@conditional(thread_page_versions)
 def get_all_threads():
     """
     Retrieves all threads from the database, ordered by timestamp in descending order.
 
-    Queries the database for all InnovationThread records, orders them by timestamp in descending order, and returns the serlialised list of threads.
+    Queries the database for one page of InnovationThread records, orders them by timestamp (then ID) in descending order, and returns the serlialised page of threads.
+    Pages are selected with the `limit` and `cursor` query parameters, or administrators can pass `stream=json` or
+    `stream=ndjson` to receive every thread in a single streamed response.
 
     Returns:
-        JSON: Serialised lists of all threads with a 200 OK status if threads exist.
+        JSON: Serialised page of threads and the next page cursor with a 200 OK status if threads exist.
+        JSON: Error message with a 400 Bad Request status if the cursor, limit or stream format is invalid.
+        JSON: Error message with a 401 Unauthorized or 403 Forbidden status if a stream is requested without an
+              access token or by a user who is not an administrator.
         JSON: Error message with a 404 Not Found status if no threads are found.
     """
-    stmt = db.select(InnovationThread).order_by(InnovationThread.timestamp.desc())
-    threads = db.session.scalars(stmt)
-    
-    if threads:
-        return threads_schema.dump(threads), 200
+    try:
+        schema = get_fieldset(threads_schema)
+        stmt = db.select(InnovationThread).options(*loader_options(InnovationThread, schema, InnovationThread.timestamp))
+        stream_format = get_stream_format()
+        if stream_format:
+            return stream_response(stmt, schema, stream_format, InnovationThread.timestamp, InnovationThread.id)
+        page = paginate(stmt, schema, InnovationThread.timestamp, InnovationThread.id)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    if page["data"] or request.args.get("cursor"):
+        return page, 200
     else:
         return {"error": "No threads found."}, 404
 
 
+# Fetch trending threads - GET - /threads/trending
+@thread_bp.route("/trending", methods=["GET"])
+@conditional(trending_thread_versions)
+def get_trending_threads():
+    """
+    Retrieves the threads that are trending right now, highest score first.
+
+    Scores weigh the posts, likes and comments in a thread against how recently it was active and are precomputed by
+    `flask db rank-trending`. The number of threads is set with the `limit` query parameter.
+
+    Returns:
+        JSON: Serialised trending threads with a 200 OK status.
+        JSON: Error message with a 400 Bad Request status if the limit is invalid.
+    """
+    try:
+        schema = get_fieldset(threads_schema)
+        _, limit = get_page_args()
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    stmt = trending("thread", InnovationThread, limit, InnovationThread).options(*loader_options(InnovationThread, schema))
+    return {"data": dump(schema, db.session.scalars(stmt).all())}, 200
+
+
 # Fetch a single thread - GET - /threads/<int:thread_id>
 @thread_bp.route("/<int:thread_id>", methods=["GET"])
+@conditional(thread_versions, last_modified=True)
+@cache.cached
 def get_single_thread(thread_id):
     """
-    Retrieve a single thread by its ID.
+    Retrieve a single thread by its ID, with one page of its posts.
 
-    Queries the database for an InnovationThread record with the specified ID and returns the serialised thread.
+    Queries the database for an InnovationThread record with the specified ID and returns the serialised thread, with
+    one keyset page of its posts (newest first) under `posts`. Each post carries its like and comment counts; the
+    likes and comments themselves are fetched from the post's own endpoints, so the response size does not grow with
+    the thread. Pages of posts are selected with the `limit` and `cursor` query parameters.
 
     Args:
         thread_id (int): The ID of the thread to retrieve.
     
     Returns:
-        JSON: Serialised thread with a 200 OK status if the thread exists.
+        JSON: Serialised thread and page of posts with a 200 OK status if the thread exists.
+        JSON: Error message with a 400 Bad Request status if the cursor, limit or a requested field is invalid.
         JSON: Error message with a 404 Not Found status if the thread is not found.
     """
-    thread = get_thread(thread_id)
+    try:
+        schema = get_fieldset(thread_detail_schema)
+        cursor, limit = get_page_args()
+        thread = get_thread(thread_id, *loader_options(InnovationThread, schema))
+        if not thread:
+            return {"error": f"Thread with ID {thread_id} not found."}, 404
 
-    if thread:
-        return thread_schema.dump(thread), 200
-    else:
-        return {"error": f"Thread with ID {thread_id} not found."}, 404
+        stmt = db.select(Post).filter_by(thread_id=thread_id).options(*loader_options(Post, thread_posts_schema, Post.timestamp))
+        posts = db.session.scalars(keyset(stmt, cursor, limit, Post.timestamp, Post.id)).all()
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    tag_response(f"thread:{thread_id}", f"user:{thread.user_id}")
+    for post in posts:
+        tag_response(*post_tags(post))
+    return {**dump(schema, thread), "posts": page_response(thread_posts_schema, posts, limit, Post.timestamp, Post.id)}, 200
 
 
 
@@ -86,8 +170,9 @@ def create_thread():
         )
         db.session.add(new_thread)
         db.session.commit()
+        cache.invalidate(f"profile:{new_thread.user_id}")
 
-        return thread_schema.dump(new_thread), 201
+        return thread_detail_schema.dump(new_thread), 201
     
     except ValidationError as err:
         return {"error": str(err)}, 400
@@ -101,8 +186,8 @@ def create_thread():
 # Edit a thread - PUT, PATCH - /thread/<int:thread_id>
 @thread_bp.route("/<int:thread_id>", methods=["PUT", "PATCH"])
 @jwt_required()
-@auth_thread_action
-def edit_thread(thread_id):
+@authorize(InnovationThread, "thread_id", inject="thread", name="Thread")
+def edit_thread(thread_id, thread):
     """
     Updates an existing thread by its ID.
 
@@ -110,6 +195,7 @@ def edit_thread(thread_id):
 
     Args:
         thread_id (int): The ID of the thread to update.
+        thread (InnovationThread): The thread, loaded and authorised by the decorator.
 
     Returns:
         JSON: Serialised updated thread with a 200 OK status if update is successful.
@@ -119,11 +205,7 @@ def edit_thread(thread_id):
     """
     try:
         body_data = thread_schema.load(request.get_json(), partial=True)
-        thread = get_thread(thread_id)
 
-        if not thread:
-            return {"error": f"Thread with ID {thread_id} not found."}, 404
-        
         if not body_data or not isinstance(body_data.get("title"), str) or not body_data.get("title").strip():
             return {"error": "Invalid request title."}, 400
         
@@ -133,8 +215,9 @@ def edit_thread(thread_id):
             thread.timestamp = datetime.strptime(body_data["timestamp"], "%Y-%m-%d %H:%M:%S")
         
         db.session.commit()
+        cache.invalidate(f"thread:{thread_id}")
 
-        return thread_schema.dump(thread), 200
+        return thread_detail_schema.dump(thread), 200
 
     except ValidationError as err:
         return {"error": err.messages}, 400
@@ -148,15 +231,17 @@ def edit_thread(thread_id):
 # Delete a thread - DELETE - /thread/<int:thread_id>
 @thread_bp.route("/<int:thread_id>", methods=["DELETE"])
 @jwt_required()
-@auth_thread_action
-def delete_thread(thread_id):
+@authorize(InnovationThread, "thread_id", inject="thread", name="Thread")
+def delete_thread(thread_id, thread):
     """
     Deleted a thread by its ID.
 
-    Removes the InnovationThread record witht the specified ID from the database, along with associated posts.
+    Removes the InnovationThread record witht the specified ID from the database. The database's ON DELETE CASCADE
+    removes its posts, with their likes, comments and timeline entries, in the same statement.
 
     Args:
         thread_id (int): The Id of the thread to delete.
+        thread (InnovationThread): The thread, loaded and authorised by the decorator.
     
     Returns:
         JSON: Success message with a 200 OK status if deletion is successful.
@@ -164,15 +249,12 @@ def delete_thread(thread_id):
         JSON: Error message with a 500 Internal Server Error status if an exception occurs.
     """
     try:
-        thread = get_thread(thread_id)
-
-        if not thread:
-            return {"error": f"Thread with ID {thread_id} not found."}, 404
-        
-        db.session.query(Post).filter_by(thread_id=thread_id).delete()
+        post_ids = db.session.scalars(db.select(Post.id).filter_by(thread_id=thread_id)).all()
+        tags = [f"thread:{thread_id}", f"profile:{thread.user_id}", *[f"post:{post_id}" for post_id in post_ids]]
 
         db.session.delete(thread)
         db.session.commit()
+        cache.invalidate(*tags)
 
         return {"message": f"Thread with ID {thread_id} deleted successfully."}, 200
     
@@ -0,0 +1,156 @@
+from flask import Blueprint
+
+from init import db
+from models.user import User
+from models.thread import threads_schema
+from models.post import posts_schema
+from models.comment import comments_schema
+from models.like import likes_schema
+from utils import (USER_COLLECTIONS, conditional, embedded_user_versions, get_fieldset, get_page_args,
+                   get_stream_format, keyset, page_response, stream_response, user_collection)
+
+
+users_bp = Blueprint("users", __name__, url_prefix="/users")
+
+COLLECTION_SCHEMAS = {
+    "threads": threads_schema,
+    "posts": posts_schema,
+    "comments": comments_schema,
+    "likes": likes_schema,
+}
+
+
+def collection_versions(user_id, collection):
+    model, keys = USER_COLLECTIONS[collection]
+    cursor, limit = get_page_args()
+    columns = [getattr(model, name) for name in ("id", "version", "updated_at") if hasattr(model, name)]
+    columns.extend(embedded_user_versions(model))
+    return keyset(db.select(*columns).where(model.user_id == user_id), cursor, limit, *keys)
+
+def get_collection_page(user_id, collection):
+    """
+    Reads one keyset page of a user's threads, posts, comments or likes, newest first, from the index on
+    (user_id, timestamp, id), or (user_id, id) for likes. With the `stream` query parameter the whole collection is
+    streamed instead, to the user or an administrator.
+    """
+    _, keys = USER_COLLECTIONS[collection]
+    try:
+        schema = get_fieldset(COLLECTION_SCHEMAS[collection])
+        stream_format = get_stream_format()
+        if stream_format:
+            if db.session.get(User, user_id) is None:
+                return {"error": f"User with ID {user_id} not found."}, 404
+            return stream_response(user_collection(user_id, collection, schema), schema, stream_format, *keys, owner_id=user_id)
+        cursor, limit = get_page_args()
+        rows = db.session.scalars(keyset(user_collection(user_id, collection, schema), cursor, limit, *keys)).all()
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    if not rows and db.session.get(User, user_id) is None:
+        return {"error": f"User with ID {user_id} not found."}, 404
+    return page_response(schema, rows, limit, *keys), 200
+
+
+def threads_versions(user_id):
+    return collection_versions(user_id, "threads")
+
+def posts_versions(user_id):
+    return collection_versions(user_id, "posts")
+
+def comments_versions(user_id):
+    return collection_versions(user_id, "comments")
+
+def likes_versions(user_id):
+    return collection_versions(user_id, "likes")
+
+
+# Fetch the threads of a specific user - GET - /users/<int:user_id>/threads
+@users_bp.route("/<int:user_id>/threads", methods=["GET"])
+@conditional(threads_versions)
+def get_user_threads(user_id):
+    """
+    Fetches one page of the Innovation Threads a specific user has started, newest first.
+
+    Pages are selected with the `limit` and `cursor` query parameters. The user and administrators can instead pass
+    `stream=json` or `stream=ndjson` to receive the whole collection in a single streamed response.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        JSON: Serialised page of threads and the next page cursor with a 200 OK status.
+        JSON: Error message with a 400 Bad Request status if the cursor, limit, stream format or a requested field is invalid.
+        JSON: Error message with a 401 Unauthorized or 403 Forbidden status if a stream is requested without the
+              user's or an administrator's access token.
+        JSON: Error message with a 404 Not Found status if the user is not found.
+    """
+    return get_collection_page(user_id, "threads")
+
+
+# Fetch the posts of a specific user - GET - /users/<int:user_id>/posts
+@users_bp.route("/<int:user_id>/posts", methods=["GET"])
+@conditional(posts_versions)
+def get_user_posts(user_id):
+    """
+    Fetches one page of the posts a specific user has made, newest first.
+
+    Pages are selected with the `limit` and `cursor` query parameters. The user and administrators can instead pass
+    `stream=json` or `stream=ndjson` to receive the whole collection in a single streamed response.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        JSON: Serialised page of posts and the next page cursor with a 200 OK status.
+        JSON: Error message with a 400 Bad Request status if the cursor, limit, stream format or a requested field is invalid.
+        JSON: Error message with a 401 Unauthorized or 403 Forbidden status if a stream is requested without the
+              user's or an administrator's access token.
+        JSON: Error message with a 404 Not Found status if the user is not found.
+    """
+    return get_collection_page(user_id, "posts")
+
+
+# Fetch the comments of a specific user - GET - /users/<int:user_id>/comments
+@users_bp.route("/<int:user_id>/comments", methods=["GET"])
+@conditional(comments_versions)
+def get_user_comments(user_id):
+    """
+    Fetches one page of the comments a specific user has made, newest first.
+
+    Pages are selected with the `limit` and `cursor` query parameters. The user and administrators can instead pass
+    `stream=json` or `stream=ndjson` to receive the whole collection in a single streamed response.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        JSON: Serialised page of comments and the next page cursor with a 200 OK status.
+        JSON: Error message with a 400 Bad Request status if the cursor, limit, stream format or a requested field is invalid.
+        JSON: Error message with a 401 Unauthorized or 403 Forbidden status if a stream is requested without the
+              user's or an administrator's access token.
+        JSON: Error message with a 404 Not Found status if the user is not found.
+    """
+    return get_collection_page(user_id, "comments")
+
+
+# Fetch the likes of a specific user - GET - /users/<int:user_id>/likes
+@users_bp.route("/<int:user_id>/likes", methods=["GET"])
+@conditional(likes_versions)
+def get_user_likes(user_id):
+    """
+    Fetches one page of the likes a specific user has given, most recent first.
+
+    Pages are selected with the `limit` and `cursor` query parameters. The user and administrators can instead pass
+    `stream=json` or `stream=ndjson` to receive the whole collection in a single streamed response.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        JSON: Serialised page of likes and the next page cursor with a 200 OK status.
+        JSON: Error message with a 400 Bad Request status if the cursor, limit, stream format or a requested field is invalid.
+        JSON: Error message with a 401 Unauthorized or 403 Forbidden status if a stream is requested without the
+              user's or an administrator's access token.
+        JSON: Error message with a 404 Not Found status if the user is not found.
+    """
+    return get_collection_page(user_id, "likes")
@@ -0,0 +1,168 @@
+import math
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+import bcrypt
+
+
+MIN_LOG_ROUNDS = 10
+MAX_LOG_ROUNDS = 16
+
+
+class HasherBusy(Exception):
+    """
+    Raised when every hashing slot is taken, so the request can be rejected instead of queueing behind the others.
+    """
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+def _check(pw_hash, password):
+    return bcrypt.checkpw(password.encode("utf-8"), pw_hash.encode("utf-8"))
+
+
+def calibrate(target_ms, probe_rounds=MIN_LOG_ROUNDS):
+    """
+    Returns the bcrypt log-rounds whose hashing time is closest to, without exceeding, the target.
+
+    Times a single hash at the probe cost and extrapolates, since every extra round doubles the work.
+    The result is clamped to MIN_LOG_ROUNDS..MAX_LOG_ROUNDS.
+    """
+    started = time.perf_counter()
+    _hash("calibration", probe_rounds)
+    elapsed_ms = max((time.perf_counter() - started) * 1000, 0.001)
+    rounds = probe_rounds + math.floor(math.log2(target_ms / elapsed_ms))
+    return min(max(rounds, MIN_LOG_ROUNDS), MAX_LOG_ROUNDS)
+
+def shared_rounds(path, target_ms):
+    """
+    Returns the log-rounds stored in a file, calibrating and storing them first if the file does not exist yet.
+
+    The file is published with a hard link, which fails if another process got there first, so every process reading
+    the same file uses the cost of whichever calibrated first.
+    """
+    try:
+        with open(path) as file:
+            return int(file.read())
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temporary = f"{path}.{os.getpid()}"
+    with open(temporary, "w") as file:
+        file.write(str(calibrate(target_ms)))
+    try:
+        os.link(temporary, path)
+    except FileExistsError:
+        pass
+    finally:
+        os.remove(temporary)
+    with open(path) as file:
+        return int(file.read())
+
+
+class PasswordHasher:
+    """
+    Hashes and checks passwords with bcrypt in a dedicated process pool so request workers are not pinned by it.
+
+    At most PASSWORD_HASH_QUEUE operations may be running or waiting at once; beyond that HasherBusy is raised and
+    the view answers 503. A pool broken by a crashed worker is replaced on the next operation.
+
+    The cost is BCRYPT_LOG_ROUNDS when set. Otherwise it is calibrated to take about BCRYPT_TARGET_MS by the first
+    process to start and stored in BCRYPT_ROUNDS_FILE, which the other workers read, so they all hash at one cost.
+    init_app must run before Flask-Bcrypt's. PASSWORD_HASH_WORKERS=0 hashes in the calling thread, which suits the
+    CLI.
+    """
+
+    def __init__(self, app=None):
+        self.rounds = 12
+        self.workers = 0
+        self.timeout = None
+        self._slots = threading.BoundedSemaphore(1)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.workers = app.config.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 1)
+        self.timeout = app.config.get("PASSWORD_HASH_TIMEOUT", 10)
+        queue_size = app.config.get("PASSWORD_HASH_QUEUE", max(self.workers, 1) * 4)
+        self._slots = threading.BoundedSemaphore(queue_size)
+
+        rounds = app.config.get("BCRYPT_LOG_ROUNDS")
+        if not rounds:
+            path = app.config.get("BCRYPT_ROUNDS_FILE") or os.path.join(app.instance_path, "bcrypt_rounds")
+            rounds = shared_rounds(path, app.config.get("BCRYPT_TARGET_MS", 250))
+        self.rounds = rounds
+        # Flask-Bcrypt reads the same key, so hashes made through it (e.g. by the seed command) use this cost too.
+        app.config["BCRYPT_LOG_ROUNDS"] = self.rounds
+
+    def hash(self, password):
+        """
+        Returns the bcrypt hash of a password at the configured cost.
+        """
+        return self._run(_hash, password, self.rounds)
+
+    def check(self, pw_hash, password):
+        """
+        Returns whether a password matches a stored bcrypt hash.
+        """
+        if not pw_hash or not password:
+            return False
+        return self._run(_check, pw_hash, password)
+
+    def needs_rehash(self, pw_hash):
+        """
+        Returns whether a stored hash was made at a lower cost than the configured one. Hashes made at a higher cost
+        are kept, so a cost that differs between deployments never rehashes a password back and forth.
+        """
+        try:
+            return int(pw_hash.split("$")[2]) < self.rounds
+        except (AttributeError, IndexError, ValueError):
+            return True
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy("Too many password operations in progress. Please try again shortly.")
+        if not self.workers:
+            try:
+                return func(*args)
+            finally:
+                self._slots.release()
+
+        try:
+            executor = self._pool()
+            try:
+                future = executor.submit(func, *args)
+            except BrokenProcessPool:
+                executor = self._pool(broken=executor)
+                future = executor.submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # The slot is held until the job finishes, even if the caller stops waiting for it.
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HasherBusy("Password hashing timed out. Please try again shortly.")
+        except BrokenProcessPool:
+            self._pool(broken=executor)
+            raise HasherBusy("A password hashing worker stopped. Please try again shortly.")
+
+    def _pool(self, broken=None):
+        # Created on first use so that each forked web worker gets its own pool, and again when a worker crash has
+        # broken it.
+        with self._executor_lock:
+            if self._executor is not None and self._executor is broken:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=get_context("spawn"))
+            return self._executor
@@ -1,9 +1,16 @@
-from flask_sqlalchemy import SQLAlchemy
 from flask_marshmallow import Marshmallow
 from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager
 
-db = SQLAlchemy()
+from aio import Database
+from cache import ResponseCache
+from hashing import PasswordHasher
+from replicas import ReadReplicas, RoutingSession
+
+db = Database(session_options={"class_": RoutingSession})
 ma = Marshmallow()
 bcrypt = Bcrypt()
-jwt = JWTManager()
\ No newline at end of file
+jwt = JWTManager()
+cache = ResponseCache()
+hasher = PasswordHasher()
+replicas = ReadReplicas()
\ No newline at end of file
@@ -2,22 +2,80 @@ import os
 
 from flask import Flask
 
-from init import db, ma, bcrypt, jwt
+from init import db, ma, bcrypt, jwt, cache, hasher, replicas
+from replicas import READ_BIND, engine_options
+from serializers import ORJSONProvider
 
 
-def create_app():
+def create_app(async_engines=False, sync_app=None):
+    """
+    Creates the app.
+
+    Args:
+        async_engines (bool): Creates the database engines on asyncio drivers, for the app serving reads in asgi.py.
+        sync_app (Flask): The regular app of the same process, when creating the async one. The two share the
+            in-process response cache, and the password hasher, its process pool and its calibrated cost stay with
+            the regular app, which serves every password route.
+    """
     app = Flask(__name__)
 
+    app.json = ORJSONProvider(app)
     app.json.sort_keys = False
 
     app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL")
+    app.config["DATABASE_ASYNC"] = async_engines
+    app.config["DATABASE_READ_URL"] = os.environ.get("DATABASE_READ_URL")
+    app.config["DATABASE_POOL_SIZE"] = int(os.environ.get("DATABASE_POOL_SIZE", 5))
+    app.config["DATABASE_MAX_OVERFLOW"] = int(os.environ.get("DATABASE_MAX_OVERFLOW", 10))
+    app.config["DATABASE_POOL_TIMEOUT"] = int(os.environ.get("DATABASE_POOL_TIMEOUT", 30))
+    app.config["DATABASE_POOL_RECYCLE"] = int(os.environ.get("DATABASE_POOL_RECYCLE", 1800))
+    app.config["DATABASE_POOL_PRE_PING"] = os.environ.get("DATABASE_POOL_PRE_PING", "true").lower() == "true"
+    app.config["READ_AFTER_WRITE_SECONDS"] = int(os.environ.get("READ_AFTER_WRITE_SECONDS", 5))
+
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config, app.config["SQLALCHEMY_DATABASE_URI"])
+    if app.config["DATABASE_READ_URL"]:
+        read_url = app.config["DATABASE_READ_URL"]
+        app.config["SQLALCHEMY_BINDS"] = {READ_BIND: {"url": read_url, **engine_options(app.config, read_url)}}
 
     app.config["JWT_SECRET_KEY"] = os.environ.get("JWT_SECRET_KEY")
 
+    app.config["FEED_FANOUT_LIMIT"] = int(os.environ.get("FEED_FANOUT_LIMIT", 10000))
+    app.config["FEED_BACKFILL"] = int(os.environ.get("FEED_BACKFILL", 50))
+
+    app.config["PROFILE_RECENT_ITEMS"] = int(os.environ.get("PROFILE_RECENT_ITEMS", 5))
+    app.config["STREAM_BATCH_SIZE"] = int(os.environ.get("STREAM_BATCH_SIZE", 1000))
+
+    app.config["TRENDING_HALF_LIFE_HOURS"] = float(os.environ.get("TRENDING_HALF_LIFE_HOURS", 12))
+    app.config["TRENDING_WINDOW_DAYS"] = int(os.environ.get("TRENDING_WINDOW_DAYS", 7))
+
+    app.config["RESPONSE_CACHE_BACKEND"] = os.environ.get("RESPONSE_CACHE_BACKEND", "local")
+    app.config["RESPONSE_CACHE_URL"] = os.environ.get("RESPONSE_CACHE_URL", "memory://")
+    app.config["RESPONSE_CACHE_TTL"] = int(os.environ.get("RESPONSE_CACHE_TTL", 60))
+    app.config["RESPONSE_CACHE_MAX_ENTRIES"] = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 1024))
+
+    # Read-after-write markers go to the redis server of the response cache unless another one is given.
+    cache_server = app.config["RESPONSE_CACHE_BACKEND"] == "redis" and app.config["RESPONSE_CACHE_URL"] != "memory://"
+    app.config["READ_AFTER_WRITE_URL"] = os.environ.get(
+        "READ_AFTER_WRITE_URL", app.config["RESPONSE_CACHE_URL"] if cache_server else None
+    )
+
+    app.config["BCRYPT_LOG_ROUNDS"] = int(os.environ.get("BCRYPT_LOG_ROUNDS", 0))
+    app.config["BCRYPT_TARGET_MS"] = int(os.environ.get("BCRYPT_TARGET_MS", 250))
+    app.config["BCRYPT_ROUNDS_FILE"] = os.environ.get("BCRYPT_ROUNDS_FILE")
+    app.config["PASSWORD_HASH_WORKERS"] = int(os.environ.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+    app.config["PASSWORD_HASH_QUEUE"] = int(os.environ.get("PASSWORD_HASH_QUEUE", 4 * app.config["PASSWORD_HASH_WORKERS"] or 4))
+    app.config["PASSWORD_HASH_TIMEOUT"] = int(os.environ.get("PASSWORD_HASH_TIMEOUT", 10))
+
     db.init_app(app)
     ma.init_app(app)
+    if sync_app is None:
+        hasher.init_app(app)
+    else:
+        app.config["BCRYPT_LOG_ROUNDS"] = sync_app.config["BCRYPT_LOG_ROUNDS"]
     bcrypt.init_app(app)
     jwt.init_app(app)
+    cache.init_app(app, shared_with=sync_app)
+    replicas.init_app(app)
 
     from controllers.cli_controllers import db_commands
     app.register_blueprint(db_commands)
@@ -25,8 +83,9 @@ def create_app():
     from controllers.post_controller import posts_bp
     app.register_blueprint(posts_bp)
 
-    from controllers.like_controller import likes_bp
+    from controllers.like_controller import likes_bp, likes_batch_bp
     app.register_blueprint(likes_bp)
+    app.register_blueprint(likes_batch_bp)
 
     from controllers.comment_controller import comments_bp
     app.register_blueprint(comments_bp)
@@ -40,5 +99,14 @@ def create_app():
     from controllers.auth_controller import auth_bp
     app.register_blueprint(auth_bp)
 
+    from controllers.user_controller import users_bp
+    app.register_blueprint(users_bp)
+
+    from controllers.feed_controller import feed_bp
+    app.register_blueprint(feed_bp)
+
+    from controllers.search_controller import search_bp
+    app.register_blueprint(search_bp)
+
 
     return app
\ No newline at end of file
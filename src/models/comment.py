@@ -12,13 +12,20 @@ class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     comment_body = db.Column(db.String, nullable=False)
     timestamp = db.Column(db.DateTime, default=func.now())
+    updated_at = db.Column(db.DateTime, nullable=False, default=func.now(), onupdate=func.now(), server_default=func.now())
+    version = db.Column(db.Integer, nullable=False, default=1, onupdate=db.text("version + 1"), server_default="1")
 
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
-    post_id = db.Column(db.Integer, db.ForeignKey("posts.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey("posts.id", ondelete="CASCADE"), nullable=False)
 
     user = db.relationship("User", back_populates="comments")
     posts = db.relationship("Post", back_populates="comments")
 
+    __table_args__ = (
+        db.Index("ix_comments_post_id_timestamp_id", "post_id", "timestamp", "id"),
+        db.Index("ix_comments_user_id_timestamp_id", "user_id", "timestamp", "id"),
+    )
+
 
 
 class CommentSchema(ma.Schema):
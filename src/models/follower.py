@@ -7,14 +7,15 @@ class Follower(db.Model):
 
     __tablename__ = "followers"
 
-    follower_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
-    followed_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    follower_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete="CASCADE"), primary_key=True)
+    followed_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete="CASCADE"), primary_key=True)
 
     follower = db.relationship("User", foreign_keys=[follower_id], back_populates="following_assoc")
     followed = db.relationship("User", foreign_keys=[followed_id], back_populates="followers_assoc")
 
     __table_args__ = (
         db.UniqueConstraint('follower_id', 'followed_id', name='unique_follow_pair'),
+        db.Index('ix_followers_followed_id_follower_id', 'followed_id', 'follower_id'),
     )
 
 class FollowerSchema(ma.Schema):
@@ -29,6 +30,8 @@ class FollowerSchema(ma.Schema):
         validate=Range(min=1, error="Followed ID must be a positive integer.")
     )
 
+    username = fields.String(dump_only=True)
+
     @validates("follower_id")
     def validate_follower_id(self, value):
         if value <= 0:
@@ -40,7 +43,7 @@ class FollowerSchema(ma.Schema):
             raise ValidationError("Follower ID must be a positive integer.")
 
     class Meta:
-        fields = ["follower_id", "followed_id"]
+        fields = ["follower_id", "followed_id", "username"]
 
 
 follower_schema = FollowerSchema()
@@ -8,12 +8,18 @@ class Like(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
 
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
-    post_id = db.Column(db.Integer, db.ForeignKey("posts.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey("posts.id", ondelete="CASCADE"), nullable=False)
 
     user = db.relationship("User", back_populates="likes")
     posts = db.relationship("Post", back_populates="likes")
 
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "post_id", name="unique_like_pair"),
+        db.Index("ix_likes_post_id", "post_id"),
+        db.Index("ix_likes_user_id_id", "user_id", "id"),
+    )
+
 
 class LikeSchema(ma.Schema):
     user = fields.Nested("UserSchema", only=["username"])
@@ -11,14 +11,25 @@ class Post(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     body = db.Column(db.String, nullable=False)
     timestamp = db.Column(db.DateTime, default=func.now())
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    updated_at = db.Column(db.DateTime, nullable=False, default=func.now(), onupdate=func.now(), server_default=func.now())
+    version = db.Column(db.Integer, nullable=False, default=1, onupdate=db.text("version + 1"), server_default="1")
 
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
-    thread_id = db.Column(db.Integer, db.ForeignKey("threads.id"))
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    thread_id = db.Column(db.Integer, db.ForeignKey("threads.id", ondelete="CASCADE"))
 
     threads = db.relationship("InnovationThread", back_populates="posts")
     user = db.relationship("User", back_populates="posts")
-    comments = db.relationship("Comment", back_populates="posts", cascade="all, delete-orphan")
-    likes = db.relationship("Like", back_populates="posts", cascade="all, delete-orphan")
+    comments = db.relationship("Comment", back_populates="posts", cascade="all, delete-orphan", passive_deletes=True)
+    likes = db.relationship("Like", back_populates="posts", cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        db.Index("ix_posts_timestamp_id", "timestamp", "id"),
+        db.Index("ix_posts_thread_id_timestamp_id", "thread_id", "timestamp", "id"),
+        db.Index("ix_posts_user_id_timestamp_id", "user_id", "timestamp", "id"),
+        db.Index("ix_posts_updated_at", "updated_at"),
+    )
 
 
 
@@ -34,12 +45,15 @@ class PostSchema(ma.SQLAlchemyAutoSchema):
                          )
     
     timestamp = fields.DateTime(format="%Y-%m-%d %H:%M:%S", missing=datetime.now)
+    like_count = fields.Integer(dump_only=True)
+    comment_count = fields.Integer(dump_only=True)
 
 
     class Meta:
 
-        fields = ["id", "body", "timestamp", "user", "comments", "likes", "thread", "thread_id"]
+        fields = ["id", "body", "timestamp", "user", "like_count", "comment_count", "comments", "likes", "thread", "thread_id"]
 
 
 post_schema = PostSchema()
-posts_schema = PostSchema(many=True)
\ No newline at end of file
+posts_schema = PostSchema(many=True)
+thread_posts_schema = PostSchema(many=True, exclude=["comments", "likes"])
\ No newline at end of file
@@ -0,0 +1,17 @@
+from init import db
+
+
+# Trending scores of posts and threads, written by `flask db rank-trending`. Only items active within the trending
+# window are kept. scored_at is the item's updated_at when it was scored, the watermark the next run continues from.
+class Ranking(db.Model):
+    __tablename__ = "rankings"
+
+    kind = db.Column(db.String, primary_key=True)
+    item_id = db.Column(db.Integer, primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+    scored_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_rankings_kind_score_item_id", "kind", "score", "item_id"),
+        db.Index("ix_rankings_kind_scored_at", "kind", "scored_at"),
+    )
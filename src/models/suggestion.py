@@ -0,0 +1,28 @@
+from init import db, ma
+
+from marshmallow import fields
+
+
+class Suggestion(db.Model):
+    __tablename__ = "suggestions"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    suggested_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    score = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_suggestions_suggested_id", "suggested_id"),
+    )
+
+
+class SuggestionSchema(ma.Schema):
+    suggested_id = fields.Integer()
+    username = fields.String()
+    score = fields.Integer()
+
+    class Meta:
+        fields = ["suggested_id", "username", "score"]
+
+
+suggestions_schema = SuggestionSchema(many=True)
@@ -12,11 +12,19 @@ class InnovationThread(db.Model):
     title = db.Column(db.String, nullable=False)
     content = db.Column(db.String, nullable=False)
     timestamp = db.Column(db.DateTime, default=func.now())
+    updated_at = db.Column(db.DateTime, nullable=False, default=func.now(), onupdate=func.now(), server_default=func.now())
+    version = db.Column(db.Integer, nullable=False, default=1, onupdate=db.text("version + 1"), server_default="1")
 
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
 
     user = db.relationship("User", back_populates="threads")
-    posts = db.relationship("Post", back_populates="threads", lazy=True, cascade="all, delete-orphan")
+    posts = db.relationship("Post", back_populates="threads", lazy=True, cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        db.Index("ix_threads_timestamp_id", "timestamp", "id"),
+        db.Index("ix_threads_user_id_timestamp_id", "user_id", "timestamp", "id"),
+        db.Index("ix_threads_updated_at", "updated_at"),
+    )
 
     @validates('title')
     def validate_title(self, key, title):
@@ -55,4 +63,5 @@ class InnovationThreadSchema(ma.Schema):
 
 
 thread_schema = InnovationThreadSchema()
+thread_detail_schema = InnovationThreadSchema(exclude=["posts"])
 threads_schema = InnovationThreadSchema(many=True)
\ No newline at end of file
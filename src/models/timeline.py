@@ -0,0 +1,14 @@
+from init import db
+
+
+class TimelineEntry(db.Model):
+    __tablename__ = "timelines"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+    timestamp = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_timelines_user_id_timestamp_post_id", "user_id", "timestamp", "post_id"),
+        db.Index("ix_timelines_post_id", "post_id"),
+    )
@@ -1,6 +1,7 @@
 from init import db, ma
 from models.follower import Follower
 
+from sqlalchemy import func
 from marshmallow import fields, validate
 from marshmallow.validate import Regexp, Length
 
@@ -21,18 +22,23 @@ class User(db.Model):
     github_url = db.Column(db.String)
     job_title = db.Column(db.String)
     is_admin = db.Column(db.Boolean, default=False)
+    follower_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    following_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    updated_at = db.Column(db.DateTime, nullable=False, default=func.now(), onupdate=func.now(), server_default=func.now())
+    version = db.Column(db.Integer, nullable=False, default=1, onupdate=db.text("version + 1"), server_default="1")
 
-    threads = db.relationship("InnovationThread", back_populates="user", cascade="all, delete-orphan")
-    posts = db.relationship("Post", back_populates="user", cascade="all, delete-orphan")
-    comments = db.relationship("Comment", back_populates="user", cascade="all, delete-orphan")
-    likes = db.relationship("Like", back_populates="user", cascade="all, delete-orphan")
+    threads = db.relationship("InnovationThread", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    posts = db.relationship("Post", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    comments = db.relationship("Comment", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    likes = db.relationship("Like", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
 
     followers_assoc = db.relationship(
         "Follower",
         foreign_keys=[Follower.followed_id],
         back_populates="followed",
         lazy="dynamic",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True
     )
 
     following_assoc = db.relationship(
@@ -40,7 +46,8 @@ class User(db.Model):
         foreign_keys=[Follower.follower_id],
         back_populates="follower",
         lazy="dynamic",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True
     )
     
 
@@ -78,10 +85,27 @@ class UserSchema(ma.Schema):
     github_url = fields.String()
     skills = fields.List(fields.String())
     job_title = fields.String()
+    follower_count = fields.Integer(dump_only=True)
+    following_count = fields.Integer(dump_only=True)
 
     class Meta:
-        fields = ["id", "username", "email", "password", "profile_picture_url", "bio", "date_of_birth", "location", "website_url", "linkedin_url", "github_url", "skills", "job_title", "is_admin", "posts", "comment", "likes", "followed", "following", "threads"]
+        fields = ["id", "username", "email", "password", "profile_picture_url", "bio", "date_of_birth", "location", "website_url", "linkedin_url", "github_url", "skills", "job_title", "is_admin", "follower_count", "following_count", "posts", "comment", "likes", "followed", "following", "threads"]
+
+
+class ProfileSchema(UserSchema):
+    thread_count = fields.Integer(dump_only=True)
+    post_count = fields.Integer(dump_only=True)
+    comment_count = fields.Integer(dump_only=True)
+    like_count = fields.Integer(dump_only=True)
+    recent_threads = fields.List(fields.Nested('InnovationThreadSchema', exclude=["user", "posts"]))
+    recent_posts = fields.List(fields.Nested('PostSchema', exclude=["user", "comments", "likes"]))
+    recent_comments = fields.List(fields.Nested('CommentSchema', exclude=["user"]))
+    recent_likes = fields.List(fields.Nested('LikeSchema', exclude=["user"]))
+
+    class Meta:
+        fields = ["id", "username", "email", "profile_picture_url", "bio", "date_of_birth", "location", "website_url", "linkedin_url", "github_url", "skills", "job_title", "is_admin", "follower_count", "following_count", "thread_count", "post_count", "comment_count", "like_count", "recent_threads", "recent_posts", "recent_comments", "recent_likes"]
 
 
 user_schema = UserSchema(exclude=["password"])
-users_schema = UserSchema(many=True, exclude=["password"])
\ No newline at end of file
+users_schema = UserSchema(many=True, exclude=["password"])
+profile_schema = ProfileSchema()
\ No newline at end of file
@@ -0,0 +1,110 @@
+from flask import current_app, g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from flask_sqlalchemy.session import Session
+from jwt import PyJWTError
+from sqlalchemy.engine import make_url
+
+from cache import redis_backend
+
+
+READ_BIND = "read"
+READ_METHODS = ("GET", "HEAD")
+
+
+def engine_options(config, url):
+    """
+    Returns the engine options for a database URL from the DATABASE_POOL_* settings.
+
+    SQLite engines only get pre-ping and recycling: Flask-SQLAlchemy gives in-memory databases a single static
+    connection, which takes no pool size.
+    """
+    options = {
+        "pool_pre_ping": config["DATABASE_POOL_PRE_PING"],
+        "pool_recycle": config["DATABASE_POOL_RECYCLE"],
+    }
+    if url and make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            pool_size=config["DATABASE_POOL_SIZE"],
+            max_overflow=config["DATABASE_MAX_OVERFLOW"],
+            pool_timeout=config["DATABASE_POOL_TIMEOUT"],
+        )
+    return options
+
+
+class RoutingSession(Session):
+    """
+    Session sending the reads of GET requests to the "read" bind, when one is configured, and everything else to the
+    primary database.
+
+    Flushes and INSERT, UPDATE and DELETE statements always go to the primary, as does every query outside a request
+    (CLI commands) and in requests that ReadReplicas has pinned to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not getattr(clause, "is_dml", False) and reads_from_replica():
+            engine = self._db.engines.get(READ_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def reads_from_replica():
+    return has_request_context() and g.get("read_replica", False)
+
+
+class ReadReplicas:
+    """
+    Decides per request whether the queries of a request may read from the replica bound as DATABASE_READ_URL.
+
+    GET requests read from the replica unless their user wrote something in the last READ_AFTER_WRITE_SECONDS. Those
+    are pinned to the primary and bypass the response cache, so users always see their own writes despite
+    replication lag. A marker of each write, expiring after that many seconds, is kept on the redis server at
+    READ_AFTER_WRITE_URL, which every worker shares. Without one a worker cannot know whether a user wrote through
+    another worker, so every request with an access token is pinned.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        url = app.config.get("READ_AFTER_WRITE_URL")
+        app.extensions["read_after_write"] = redis_backend(app, url, "read-after-write:") if url else None
+        app.before_request(self.choose_bind)
+        app.after_request(self.remember_write)
+
+    @property
+    def markers(self):
+        """
+        The read-after-write store of the current app, or None if it has no redis server for it.
+        """
+        return current_app.extensions.get("read_after_write")
+
+    def choose_bind(self):
+        g.writer_id = self.identity()
+        if request.method in READ_METHODS and current_app.config.get("DATABASE_READ_URL"):
+            markers = self.markers
+            g.pinned_to_primary = g.writer_id is not None and (markers is None or bool(markers.get(f"{g.writer_id}")))
+            g.read_replica = not g.pinned_to_primary
+
+    def remember_write(self, response):
+        markers = self.markers
+        if (
+            markers is not None and request.method not in READ_METHODS and response.status_code < 400
+            and g.get("writer_id") is not None
+        ):
+            markers.set(f"{g.writer_id}", True, current_app.config.get("READ_AFTER_WRITE_SECONDS", 5))
+        return response
+
+    @staticmethod
+    def identity():
+        """
+        Returns the user ID of the request's access token, or None if it has none or it is invalid; the view's own
+        jwt_required reports invalid tokens.
+        """
+        try:
+            verify_jwt_in_request(optional=True)
+            return get_jwt_identity()
+        except (JWTExtendedException, PyJWTError):
+            return None
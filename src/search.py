@@ -0,0 +1,336 @@
+import html
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+
+from flask import current_app, has_app_context
+from marshmallow import fields
+from sqlalchemy import DDL, event
+
+from init import db, ma
+from models.post import Post
+from models.comment import Comment
+from models.thread import InnovationThread
+from serializers import dump
+from utils import decode_cursor, encode_cursor
+
+
+SEARCH_CONFIG = "english"
+# ts_headline marks matches with control characters, which are stripped from the document first, so the headline can
+# be HTML-escaped before the marks are turned into <b></b>.
+START_MARK, STOP_MARK = "\x02", "\x03"
+HEADLINE_OPTIONS = (
+    f"StartSel=\"{START_MARK}\", StopSel=\"{STOP_MARK}\", "
+    "MaxFragments=2, MaxWords=20, MinWords=8, FragmentDelimiter=\" ... \""
+)
+SNIPPET_CHARS = 160
+
+# Searchable documents: result type -> (model, text columns). A thread's title counts as more relevant than its content.
+DOCUMENTS = {
+    "post": (Post, ("body",)),
+    "comment": (Comment, ("comment_body",)),
+    "thread": (InnovationThread, ("title", "content")),
+}
+
+# Keys of the result order, used to encode and decode page cursors.
+SEARCH_KEYS = (db.column("rank", db.Float), db.column("type", db.String), db.column("id", db.Integer))
+
+STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+
+class SearchResultSchema(ma.Schema):
+    type = fields.String()
+    id = fields.Integer()
+    post_id = fields.Integer(allow_none=True)
+    rank = fields.Float()
+    snippet = fields.String()
+
+    class Meta:
+        fields = ["type", "id", "post_id", "rank", "snippet"]
+
+
+search_results_schema = SearchResultSchema(many=True)
+
+
+# POSTGRESQL: GENERATED TSVECTOR COLUMNS WITH GIN INDEXES
+
+
+def vector_sql(columns):
+    # The first of several columns (a thread's title) gets weight A; body text gets weight B everywhere.
+    parts = [
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({column}, '')), '{'A' if index == 0 and len(columns) > 1 else 'B'}')"
+        for index, column in enumerate(columns)
+    ]
+    return " || ".join(parts)
+
+def search_ddl(table, columns):
+    """
+    Statements adding a generated tsvector column and its GIN index to a table. The database recomputes the column
+    on every INSERT and UPDATE, so it never drifts from the text it is built from.
+    """
+    return [
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS ({vector_sql(columns)}) STORED",
+        f"CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING GIN (search_vector)",
+    ]
+
+for model, columns in DOCUMENTS.values():
+    for statement in search_ddl(model.__tablename__, columns):
+        event.listen(model.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
+
+def postgres_search(text, cursor, limit):
+    """
+    Ranks matching posts, comments and threads with ts_rank_cd in a single UNION ALL over the GIN-indexed vectors.
+
+    Snippets are highlighted with ts_headline in an outer query, so only the rows of the returned page are headlined,
+    and HTML-escaped by escape_headline.
+    """
+    query = db.func.websearch_to_tsquery(SEARCH_CONFIG, text)
+    selects = []
+    for kind, (model, columns) in DOCUMENTS.items():
+        table = model.__table__
+        vector = db.literal_column(f"{table.name}.search_vector")
+        document = db.func.translate(
+            db.func.concat_ws(" ", *[table.c[column] for column in columns]), START_MARK + STOP_MARK, ""
+        )
+        post_id = table.c.post_id if "post_id" in table.c else db.cast(db.null(), db.Integer)
+        selects.append(
+            db.select(
+                db.literal(kind).label("type"),
+                table.c.id.label("id"),
+                post_id.label("post_id"),
+                db.cast(db.func.ts_rank_cd(vector, query), db.Float).label("rank"),
+                document.label("document")
+            )
+            .select_from(table)
+            .where(vector.op("@@")(query))
+        )
+    matches = db.union_all(*selects).subquery("matches")
+    keys = [matches.c[key.key] for key in SEARCH_KEYS]
+    if cursor:
+        matches_stmt = db.select(matches).where(db.tuple_(*keys) < db.tuple_(*decode_cursor(cursor, SEARCH_KEYS)))
+    else:
+        matches_stmt = db.select(matches)
+    page = matches_stmt.order_by(*[key.desc() for key in keys]).limit(limit + 1).subquery("page")
+
+    stmt = db.select(
+        page.c.type, page.c.id, page.c.post_id, page.c.rank,
+        db.func.ts_headline(SEARCH_CONFIG, page.c.document, query, HEADLINE_OPTIONS).label("snippet")
+    ).order_by(*[page.c[key.key].desc() for key in SEARCH_KEYS])
+    return [dict(row._asdict(), snippet=escape_headline(row.snippet)) for row in db.session.execute(stmt)]
+
+
+# OTHER DATABASES: IN-PROCESS INVERTED INDEX
+
+
+def tokenize(text):
+    return [word for word in re.findall(r"\w+", (text or "").lower()) if word not in STOP_WORDS]
+
+def document_text(kind, values):
+    """
+    Returns the text indexed for a document. A thread's title is repeated so its words weigh more, as in PostgreSQL.
+    """
+    if kind == "thread":
+        title, content = values
+        return f"{title} {title} {content}"
+    return " ".join(value or "" for value in values)
+
+
+class InvertedIndex:
+    """
+    In-process inverted index over posts, comments and threads, used for search when the database has no full-text
+    support (e.g. SQLite in development and tests). Matches must contain every query word; they are ranked with BM25.
+
+    The index is built from the database on first use and then kept in step by the session listeners below, which
+    apply committed inserts, updates and deletes. Every worker process holds its own copy, and rows removed with bulk
+    DELETE statements or by the database's ON DELETE CASCADE are only dropped when a search finds them missing.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        self.documents = {}
+        self.total_length = 0
+        self.loaded = False
+        self._lock = threading.RLock()
+
+    def load(self, batch_size=10000):
+        with self._lock:
+            if self.loaded:
+                return
+            for kind, (model, columns) in DOCUMENTS.items():
+                table = model.__table__
+                post_id = table.c.post_id if "post_id" in table.c else db.literal(None)
+                stmt = db.select(table.c.id, post_id, *[table.c[column] for column in columns])
+                for row in db.session.execute(stmt, execution_options={"yield_per": batch_size}):
+                    self.add((kind, row[0]), row[1], row[2:])
+            self.loaded = True
+
+    def add(self, key, post_id, values):
+        with self._lock:
+            self.remove(key)
+            text = " ".join(value or "" for value in values)
+            terms = Counter(tokenize(document_text(key[0], values)))
+            length = sum(terms.values())
+            for term, frequency in terms.items():
+                self.postings[term][key] = frequency
+            self.documents[key] = (post_id, text, length, tuple(terms))
+            self.total_length += length
+
+    def remove(self, key):
+        with self._lock:
+            document = self.documents.pop(key, None)
+            if document is None:
+                return
+            self.total_length -= document[2]
+            for term in document[3]:
+                postings = self.postings.get(term)
+                if postings is not None:
+                    postings.pop(key, None)
+                    if not postings:
+                        del self.postings[term]
+
+    def search(self, terms):
+        """
+        Returns (rank, type, id) for every document containing all of the terms, best match first.
+        """
+        with self._lock:
+            if not terms or not self.documents:
+                return []
+            postings = [self.postings.get(term, {}) for term in terms]
+            postings.sort(key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+            count = len(self.documents)
+            average_length = self.total_length / count or 1
+            ranked = []
+            for key in candidates:
+                length = self.documents[key][2]
+                rank = 0.0
+                for term_postings in postings:
+                    frequency = term_postings[key]
+                    idf = math.log(1 + (count - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+                    rank += idf * frequency * (self.K1 + 1) / (frequency + self.K1 * (1 - self.B + self.B * length / average_length))
+                ranked.append((round(rank, 6), key[0], key[1]))
+            ranked.sort(reverse=True)
+            return ranked
+
+
+def search_index():
+    index = current_app.extensions.get("search_index")
+    if index is None:
+        index = current_app.extensions.setdefault("search_index", InvertedIndex())
+    return index
+
+def escape_headline(headline):
+    """
+    HTML-escapes a ts_headline snippet and turns its match marks into <b></b>.
+    """
+    return html.escape(headline or "").replace(START_MARK, "<b>").replace(STOP_MARK, "</b>")
+
+def highlight(text, terms):
+    """
+    Cuts a window of about SNIPPET_CHARS around the first matching word, HTML-escapes it and wraps matching words in
+    <b></b>, so markup in the stored text reaches clients as text.
+    """
+    pattern = re.compile(r"\b(" + "|".join(re.escape(term) for term in terms) + r")\w*", re.IGNORECASE)
+    match = pattern.search(text)
+    start = max((match.start() if match else 0) - SNIPPET_CHARS // 4, 0)
+    snippet = text[start:start + SNIPPET_CHARS]
+    parts, end = [], 0
+    for found in pattern.finditer(snippet):
+        parts.append(html.escape(snippet[end:found.start()]))
+        parts.append(f"<b>{html.escape(found.group(0))}</b>")
+        end = found.end()
+    parts.append(html.escape(snippet[end:]))
+    return ("..." if start else "") + "".join(parts) + ("..." if start + SNIPPET_CHARS < len(text) else "")
+
+def existing_keys(keys):
+    found = set()
+    for kind, (model, _) in DOCUMENTS.items():
+        ids = [key[1] for key in keys if key[0] == kind]
+        if ids:
+            found.update((kind, id) for id in db.session.scalars(db.select(model.id).where(model.id.in_(ids))))
+    return found
+
+def index_search(text, cursor, limit):
+    """
+    Pages through the inverted index ranking, checking the page against the database so rows deleted in bulk are
+    skipped and dropped from the index.
+    """
+    index = search_index()
+    index.load()
+    terms = list(dict.fromkeys(tokenize(text)))
+    ranked = index.search(terms)
+    if cursor:
+        after = tuple(decode_cursor(cursor, SEARCH_KEYS))
+        ranked = [entry for entry in ranked if entry < after]
+
+    results = []
+    while ranked and len(results) <= limit:
+        chunk, ranked = ranked[:limit + 1], ranked[limit + 1:]
+        found = existing_keys([(kind, id) for _, kind, id in chunk])
+        for rank, kind, id in chunk:
+            if (kind, id) not in found:
+                index.remove((kind, id))
+                continue
+            post_id, document, *_ = index.documents[(kind, id)]
+            results.append({"type": kind, "id": id, "post_id": post_id, "rank": rank, "snippet": highlight(document, terms)})
+    return results[:limit + 1]
+
+
+@event.listens_for(db.session, "after_flush")
+def collect_search_changes(session, flush_context):
+    changes = session.info.setdefault("search_changes", {})
+    for kind, (model, columns) in DOCUMENTS.items():
+        for instance in session.new | session.dirty:
+            if isinstance(instance, model):
+                changes[(kind, instance.id)] = (getattr(instance, "post_id", None), [getattr(instance, column) for column in columns])
+        for instance in session.deleted:
+            if isinstance(instance, model):
+                changes[(kind, instance.id)] = None
+
+@event.listens_for(db.session, "after_commit")
+def apply_search_changes(session):
+    changes = session.info.pop("search_changes", None)
+    index = current_app.extensions.get("search_index") if changes and has_app_context() else None
+    if index is None or not index.loaded:
+        return
+    for key, document in changes.items():
+        if document is None:
+            index.remove(key)
+        else:
+            index.add(key, *document)
+
+@event.listens_for(db.session, "after_rollback")
+def discard_search_changes(session):
+    session.info.pop("search_changes", None)
+
+
+def search(text, cursor, limit):
+    """
+    Runs a full-text search over posts, comments and threads and returns one page of results.
+
+    Uses the tsvector columns on PostgreSQL and the in-process inverted index elsewhere.
+
+    Returns:
+        dict: The results under "data" and the cursor of the next page under "next_cursor".
+
+    Raises:
+        ValueError: If the cursor is invalid.
+    """
+    if db.session.get_bind().dialect.name == "postgresql":
+        rows = postgres_search(text, cursor, limit)
+    else:
+        rows = index_search(text, cursor, limit)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1][key.key] for key in SEARCH_KEYS])
+    return {"data": dump(search_results_schema, rows), "next_cursor": next_cursor}
@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from main import create_app
+
+
+DATABASE_DIR = tempfile.mkdtemp()
+
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(DATABASE_DIR, 'test.db')}",
+    "JWT_SECRET_KEY": "test-secret",
+    "PASSWORD_HASH_WORKERS": "0",
+    "BCRYPT_LOG_ROUNDS": "4",
+    "RESPONSE_CACHE_BACKEND": "null",
+})
+os.environ.pop("DATABASE_READ_URL", None)
+
+
+@pytest.fixture(scope="session")
+def app():
+    app = create_app()
+    runner = app.test_cli_runner()
+    for args in (
+        ["db", "create"],
+        ["db", "seed"],
+        ["db", "seed-scale", "--users", "40", "--posts", "400", "--threads", "60", "--comments", "1200",
+         "--likes", "3000", "--follows", "400", "--thread-share", "0.5", "--random-seed", "1"],
+        ["db", "rank-trending"],
+        ["db", "suggest-follows"],
+    ):
+        result = runner.invoke(args=args)
+        assert result.exception is None, result.output
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(scope="session")
+def auth_headers(app):
+    def headers(user_id):
+        with app.app_context():
+            return {"Authorization": f"Bearer {create_access_token(identity=str(user_id))}"}
+    return headers
+
+
+@pytest.fixture
+def app_copy(app, tmp_path, monkeypatch):
+    """
+    Returns a function creating an app on a copy of the seeded database, for tests that write or need other settings.
+    Its keyword arguments are environment variables, and database_read_url also gets its own copy of the database
+    that never catches up with the primary.
+    """
+    seeded = app.config["SQLALCHEMY_DATABASE_URI"].removeprefix("sqlite:///")
+
+    def create(**env):
+        primary = tmp_path / "primary.db"
+        shutil.copy(seeded, primary)
+        monkeypatch.setenv("DATABASE_URL", f"sqlite:///{primary}")
+        if env.pop("database_read_url", False):
+            replica = tmp_path / "replica.db"
+            shutil.copy(seeded, replica)
+            monkeypatch.setenv("DATABASE_READ_URL", f"sqlite:///{replica}")
+        for name, value in env.items():
+            monkeypatch.setenv(name.upper(), value)
+        copy = create_app()
+        copy.primary = primary
+        return copy
+
+    return create
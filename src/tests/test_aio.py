@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+from sqlalchemy.util import greenlet_spawn
+
+from aio import AsyncReads
+from main import create_app
+
+
+# Blueprints whose reads were moved to the event loop: posts, threads, comments, likes and followers.
+ASYNC_READS = ("posts", "threads", "comments", "likes", "follower")
+
+
+@pytest.fixture(scope="module")
+def asgi_app(app):
+    return AsyncReads(create_app(async_engines=True, sync_app=app), app)
+
+
+def scope(method, path):
+    return {"type": "http", "method": method, "path": path, "query_string": b"", "headers": [], "http_version": "1.1"}
+
+def get_paths(app, blueprints):
+    urls = app.url_map.bind("localhost")
+    for rule in app.url_map.iter_rules():
+        if "GET" in rule.methods and rule.endpoint.split(".")[0] in blueprints:
+            yield rule.endpoint, urls.build(rule.endpoint, {argument: 1 for argument in rule.arguments})
+
+async def call(asgi_app, path):
+    response = {"body": b""}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        else:
+            response["body"] += message.get("body", b"")
+
+    try:
+        await asgi_app(scope("GET", path), receive, send)
+    finally:
+        await greenlet_spawn(asgi_app.dispose)
+    return response
+
+
+def test_every_read_of_the_async_blueprints_is_served_async(asgi_app):
+    paths = list(get_paths(asgi_app.async_app, ASYNC_READS))
+    assert any(endpoint.startswith("comments.") for endpoint, _ in paths)
+    for endpoint, path in paths:
+        assert asgi_app.is_async_read(scope("GET", path)), f"{endpoint} ({path}) is served by the regular app"
+
+def test_writes_and_other_reads_are_served_by_the_regular_app(asgi_app):
+    assert not asgi_app.is_async_read(scope("POST", "/posts/"))
+    assert not asgi_app.is_async_read(scope("DELETE", "/posts/1/comments/1"))
+    assert not asgi_app.is_async_read(scope("GET", "/auth/user/1"))
+    assert not asgi_app.is_async_read(scope("GET", "/feed/"))
+
+def test_async_read_returns_the_comments(asgi_app):
+    response = asyncio.run(call(asgi_app, "/posts/1/comments/"))
+    assert response["status"] == 200
+    assert b"First Comment" in response["body"]
@@ -0,0 +1,22 @@
+from init import db
+from models.comment import Comment
+
+
+def test_editing_a_comment_evicts_its_author_profile(app_copy, auth_headers):
+    app = app_copy(response_cache_backend="local")
+    client = app.test_client()
+    with app.app_context():
+        comment = db.session.scalar(db.select(Comment).order_by(Comment.timestamp.desc(), Comment.id.desc()))
+        post_id, comment_id, user_id = comment.post_id, comment.id, comment.user_id
+    profile = f"/auth/user/{user_id}"
+    assert client.get(profile).status_code == 200
+
+    response = client.put(
+        f"/posts/{post_id}/comments/{comment_id}", json={"comment_body": "Edited comment"}, headers=auth_headers(user_id)
+    )
+    assert response.status_code == 200
+
+    recent = client.get(profile).get_json()["recent_comments"]
+    assert {"id": comment_id, "comment_body": "Edited comment"}.items() <= next(
+        item for item in recent if item["id"] == comment_id
+    ).items()
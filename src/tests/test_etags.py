@@ -0,0 +1,92 @@
+import pytest
+
+from init import db
+from models.comment import Comment
+from models.like import Like
+from models.post import Post
+from models.ranking import Ranking
+from models.thread import InnovationThread
+from models.timeline import TimelineEntry
+from models.user import User
+
+
+# Conditional endpoints, with the user whose username the response embeds and who is renamed between two reads.
+CASES = [
+    ("/posts/{post}", "author"),
+    ("/posts/{post}", "commenter"),
+    ("/posts/{post}", "liker"),
+    ("/posts/?limit=5", "newest_author"),
+    ("/posts/trending?limit=5", "trending_author"),
+    ("/posts/{post}/comments/", "commenter"),
+    ("/posts/{post}/comments/{comment}", "commenter"),
+    ("/posts/{post}/likes/", "liker"),
+    ("/threads/{thread}", "creator"),
+    ("/threads/?limit=5", "newest_creator"),
+    ("/users/{author}/posts?limit=5", "author"),
+    ("/feed/?limit=5", "followed"),
+]
+
+
+@pytest.fixture(scope="module")
+def ids(app):
+    with app.app_context():
+        post = db.session.scalar(
+            db.select(Post).where(Post.comment_count > 0, Post.like_count > 0).order_by(Post.comment_count.desc())
+        )
+        comment = db.session.scalar(
+            db.select(Comment).filter_by(post_id=post.id).order_by(Comment.timestamp.desc(), Comment.id.desc())
+        )
+        newest = db.session.scalar(db.select(Post).order_by(Post.timestamp.desc(), Post.id.desc()))
+        newest_thread = db.session.scalar(
+            db.select(InnovationThread).order_by(InnovationThread.timestamp.desc(), InnovationThread.id.desc())
+        )
+        trending = db.session.scalar(
+            db.select(Post.user_id).join(Ranking, db.and_(Ranking.kind == "post", Ranking.item_id == Post.id))
+            .order_by(Ranking.score.desc(), Ranking.item_id.desc())
+        )
+        entry = db.session.scalar(
+            db.select(TimelineEntry).order_by(TimelineEntry.user_id, TimelineEntry.timestamp.desc(),
+                                              TimelineEntry.post_id.desc())
+        )
+        return {
+            "post": post.id,
+            "author": post.user_id,
+            "comment": comment.id,
+            "commenter": comment.user_id,
+            "liker": db.session.scalar(db.select(Like.user_id).filter_by(post_id=post.id).order_by(Like.id)),
+            "newest_author": newest.user_id,
+            "trending_author": trending,
+            "thread": newest_thread.id,
+            "creator": newest_thread.user_id,
+            "newest_creator": newest_thread.user_id,
+            "reader": entry.user_id,
+            "followed": db.session.get(Post, entry.post_id).user_id,
+        }
+
+
+def rename(client, auth_headers, user_id, username):
+    response = client.put(f"/auth/editprofile/{user_id}", json={"username": username}, headers=auth_headers(user_id))
+    assert response.status_code == 200, response.get_data(as_text=True)
+
+def original_username(app, user_id):
+    with app.app_context():
+        return db.session.get(User, user_id).username
+
+
+@pytest.mark.parametrize("url, renamed", CASES)
+def test_renaming_an_embedded_user_changes_the_etag(app, client, auth_headers, ids, url, renamed):
+    url = url.format(**ids)
+    headers = auth_headers(ids["reader"])
+    user_id = ids[renamed]
+    before = client.get(url, headers=headers)
+    assert before.status_code == 200 and before.headers.get("ETag")
+    username = original_username(app, user_id)
+
+    rename(client, auth_headers, user_id, f"renamed-{user_id}")
+    try:
+        after = client.get(url, headers={**headers, "If-None-Match": before.headers["ETag"]})
+        assert after.status_code == 200
+        assert f"renamed-{user_id}" in after.get_data(as_text=True)
+        assert after.headers["ETag"] != before.headers["ETag"]
+    finally:
+        rename(client, auth_headers, user_id, username)
@@ -0,0 +1,41 @@
+import os
+
+import pytest
+from flask import Flask
+
+import hashing
+from hashing import HasherBusy, PasswordHasher
+
+
+def hasher_app(tmp_path, **config):
+    app = Flask(__name__)
+    app.config.update(BCRYPT_LOG_ROUNDS=0, BCRYPT_ROUNDS_FILE=str(tmp_path / "bcrypt_rounds"), PASSWORD_HASH_WORKERS=0)
+    app.config.update(config)
+    return app
+
+
+def test_workers_share_the_first_calibrated_cost(tmp_path, monkeypatch):
+    first, second = PasswordHasher(), PasswordHasher()
+    monkeypatch.setattr(hashing, "calibrate", lambda target_ms: 11)
+    first.init_app(hasher_app(tmp_path))
+    monkeypatch.setattr(hashing, "calibrate", lambda target_ms: 13)
+    second.init_app(hasher_app(tmp_path))
+
+    assert first.rounds == second.rounds == 11
+
+def test_only_cheaper_hashes_are_rehashed(tmp_path):
+    hasher = PasswordHasher(hasher_app(tmp_path, BCRYPT_LOG_ROUNDS=5))
+
+    assert hasher.needs_rehash(hashing._hash("password1", 4))
+    assert not hasher.needs_rehash(hashing._hash("password1", 5))
+    assert not hasher.needs_rehash(hashing._hash("password1", 6))
+    assert hasher.needs_rehash("not a bcrypt hash")
+
+def test_a_crashed_worker_is_replaced(tmp_path):
+    hasher = PasswordHasher(hasher_app(tmp_path, BCRYPT_LOG_ROUNDS=4, PASSWORD_HASH_WORKERS=1))
+    try:
+        with pytest.raises(HasherBusy):
+            hasher._run(os._exit, 1)
+        assert hasher.check(hasher.hash("password1"), "password1")
+    finally:
+        hasher._pool().shutdown()
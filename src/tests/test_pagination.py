@@ -0,0 +1,26 @@
+import base64
+import json
+
+import pytest
+
+
+def cursor(*values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+
+@pytest.mark.parametrize("values", [
+    ("2026-10-18T00:00:00", "abc"),
+    ("not a date", 1),
+    ("2026-10-18T00:00:00",),
+    ("2026-10-18T00:00:00", [1]),
+])
+def test_invalid_cursor_is_rejected(client, values):
+    response = client.get(f"/posts/?cursor={cursor(*values)}")
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Invalid pagination cursor."}
+
+def test_next_cursor_continues_the_page(client):
+    first = client.get("/posts/?limit=2").get_json()
+    second = client.get(f"/posts/?limit=2&cursor={first['next_cursor']}").get_json()
+    assert len(second["data"]) == 2
+    assert {post["id"] for post in first["data"]}.isdisjoint(post["id"] for post in second["data"])
@@ -0,0 +1,124 @@
+import pytest
+from sqlalchemy import event
+
+from init import db
+from models.comment import Comment
+from models.follower import Follower
+from models.like import Like
+from models.post import Post
+from models.suggestion import Suggestion
+from models.thread import InnovationThread
+
+
+# List endpoints, read at limit 5 and limit 50 as the user following the most users.
+LISTS = [
+    "/posts/?limit={limit}",
+    "/posts/trending?limit={limit}",
+    "/posts/threads/{thread}?limit={limit}",
+    "/posts/{post}/comments/?limit={limit}",
+    "/threads/?limit={limit}",
+    "/threads/trending?limit={limit}",
+    "/threads/{thread}?limit={limit}",
+    "/users/{followed}/followers?limit={limit}",
+    "/users/{reader}/following?limit={limit}",
+    "/users/{creator}/threads?limit={limit}",
+    "/users/{author}/posts?limit={limit}",
+    "/users/{author}/comments?limit={limit}",
+    "/users/{author}/likes?limit={limit}",
+    "/feed/?limit={limit}",
+]
+
+# Detail endpoints, read for the busiest and the quietest entity of their kind that embeds rows of every kind.
+DETAILS = [
+    "/posts/{post}",
+    "/posts/{post}/likes/",
+    "/posts/{thread_post}/threads/{thread}",
+    "/posts/{post}/comments/{comment}",
+    "/auth/user/{author}",
+    "/users/{reader}/suggestions",
+]
+
+
+def extremes(column, score, *where):
+    """
+    Returns the values of a column with the highest and the lowest score among the rows matching the conditions.
+    """
+    stmt = db.select(column).where(*where).group_by(column).order_by(score.desc(), column)
+    values = db.session.scalars(stmt).all()
+    return values[0], values[-1]
+
+
+@pytest.fixture(scope="module")
+def busy_ids(app):
+    """
+    Returns the IDs used in the URLs above: the busiest entities first, then the quietest.
+    """
+    with app.app_context():
+        engaged = (Post.comment_count > 0, Post.like_count > 0)
+        engagement = db.func.max(Post.comment_count + Post.like_count)
+        thread, _ = extremes(Post.thread_id, db.func.count(), Post.thread_id.is_not(None))
+        active = (
+            Post.user_id.in_(db.select(Comment.user_id)),
+            Post.user_id.in_(db.select(Like.user_id)),
+            Post.user_id.in_(db.select(InnovationThread.user_id)),
+        )
+        columns = {
+            "post": extremes(Post.id, engagement, *engaged),
+            "thread_post": extremes(Post.id, engagement, Post.thread_id == thread, *engaged),
+            "author": extremes(Post.user_id, db.func.count(), *active),
+            "creator": extremes(InnovationThread.user_id, db.func.count()),
+            "followed": extremes(Follower.followed_id, db.func.count()),
+            "reader": extremes(
+                Follower.follower_id, db.func.count(), Follower.follower_id.in_(db.select(Suggestion.user_id))
+            ),
+        }
+        busy, quiet = ({name: values[index] for name, values in columns.items()} for index in (0, 1))
+        for ids in (busy, quiet):
+            ids["thread"] = thread
+            ids["comment"] = db.session.scalar(db.select(Comment.id).filter_by(post_id=ids["post"]))
+        return busy, quiet
+
+
+def count_statements(app, client, url, headers):
+    """
+    Returns the number of statements a GET request runs and its JSON body, after a first unmeasured request.
+    """
+    client.get(url, headers=headers)
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        response = client.get(url, headers=headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return len(statements), response.get_json()
+
+
+@pytest.mark.parametrize("url", LISTS)
+def test_list_query_count_does_not_grow_with_the_page(app, client, auth_headers, busy_ids, url):
+    ids = busy_ids[0]
+    headers = auth_headers(ids["reader"])
+    small_count, small = count_statements(app, client, url.format(**ids, limit=5), headers)
+    large_count, large = count_statements(app, client, url.format(**ids, limit=50), headers)
+
+    # A thread embeds its page of posts; every other list is the page itself.
+    if url.startswith("/threads/{thread}"):
+        small, large = small["posts"], large["posts"]
+    assert len(small["data"]) < len(large["data"])
+    assert small_count == large_count
+
+@pytest.mark.parametrize("url", DETAILS)
+def test_detail_query_count_does_not_grow_with_embedded_rows(app, client, auth_headers, busy_ids, url):
+    busy, quiet = busy_ids
+    headers = auth_headers(1)
+    busy_count, busy_body = count_statements(app, client, url.format(**busy), headers)
+    quiet_count, quiet_body = count_statements(app, client, url.format(**quiet), headers)
+
+    assert busy_body != quiet_body
+    assert busy_count == quiet_count
@@ -0,0 +1,37 @@
+import pytest
+
+from controllers.cli_controllers import plan_failures
+from init import db
+
+
+# Indexes serving the hot reads, with the table each read falls back to scanning without them.
+HOT_INDEXES = [
+    ("ix_posts_timestamp_id", "posts"),
+    ("ix_posts_thread_id_timestamp_id", "posts"),
+    ("ix_posts_user_id_timestamp_id", "posts"),
+    ("ix_comments_post_id_timestamp_id", "comments"),
+    ("ix_comments_user_id_timestamp_id", "comments"),
+]
+
+
+def describe(failures):
+    return "\n".join(
+        f"{path}: sequential scan on {', '.join(sorted(scans))}\n    {' '.join(statement.split())}"
+        for path, statement, scans in failures
+    )
+
+
+def test_hot_reads_use_indexes(app):
+    with app.app_context():
+        failures, checked = plan_failures()
+    assert checked > 0
+    assert not failures, describe(failures)
+
+@pytest.mark.parametrize("index, table", HOT_INDEXES)
+def test_a_dropped_index_is_reported(app_copy, index, table):
+    app = app_copy()
+    with app.app_context():
+        db.session.execute(db.text(f"DROP INDEX {index}"))
+        db.session.commit()
+        failures, _ = plan_failures()
+    assert any(table in scans for _, _, scans in failures), describe(failures)
@@ -0,0 +1,65 @@
+import sqlite3
+
+import pytest
+
+from cache import LocalRedis, RedisBackend
+from init import db
+from models.post import Post
+
+
+@pytest.fixture
+def replica_app(app_copy):
+    """
+    Returns an app whose read replica never catches up with the primary, with read-after-write markers in a store
+    standing in for a redis server.
+    """
+    replica_app = app_copy(database_read_url=True, response_cache_backend="local")
+    replica_app.extensions["read_after_write"] = RedisBackend(LocalRedis(), "read-after-write:")
+    return replica_app
+
+
+def owner_of(app, post_id):
+    with app.app_context():
+        return db.session.get(Post, post_id).user_id
+
+def edit(client, headers, post_id, body):
+    response = client.put(f"/posts/{post_id}", json={"body": body}, headers=headers)
+    assert response.status_code == 200, response.get_data(as_text=True)
+
+def read(client, post_id, headers=None):
+    response = client.get(f"/posts/{post_id}", headers=headers)
+    assert response.status_code == 200
+    return response.get_json()["body"]
+
+
+def test_writer_reads_their_write_past_the_cache(replica_app, auth_headers):
+    client = replica_app.test_client()
+    headers = auth_headers(owner_of(replica_app, 1))
+    before = read(client, 1)
+
+    edit(client, headers, 1, "Edited after the replica was copied")
+
+    # Anonymous readers still get the lagging replica, but their reads must not refill the evicted entry.
+    assert read(client, 1) == before
+    with replica_app.app_context():
+        assert replica_app.extensions["response_cache"].get("/posts/1?") is None
+    assert read(client, 1, headers) == "Edited after the replica was copied"
+
+def test_readers_without_writes_read_from_the_replica(replica_app, auth_headers):
+    client = replica_app.test_client()
+    headers = auth_headers(owner_of(replica_app, 2))
+    before = read(client, 2)
+    with sqlite3.connect(replica_app.primary) as connection:
+        connection.execute("UPDATE posts SET body = 'Written elsewhere', version = version + 1 WHERE id = 2")
+
+    assert read(client, 2, headers) == before
+
+def test_every_token_reads_from_the_primary_without_a_shared_store(replica_app, auth_headers):
+    replica_app.extensions["read_after_write"] = None
+    client = replica_app.test_client()
+    headers = auth_headers(owner_of(replica_app, 3))
+    with sqlite3.connect(replica_app.primary) as connection:
+        connection.execute("UPDATE posts SET body = 'Written by another worker', version = version + 1 WHERE id = 3")
+
+    assert read(client, 3, headers) == "Written by another worker"
+    assert read(client, 3) != "Written by another worker"
@@ -0,0 +1,24 @@
+from search import START_MARK, STOP_MARK, escape_headline, highlight
+
+
+def test_highlight_escapes_the_stored_text():
+    text = "<script>alert('flask')</script> Flask & <img src=x onerror=alert(1)> api"
+    snippet = highlight(text, ["flask", "api"])
+
+    assert "<script>" not in snippet and "<img" not in snippet
+    assert snippet == (
+        "&lt;script&gt;alert(&#x27;<b>flask</b>&#x27;)&lt;/script&gt; <b>Flask</b> &amp; "
+        "&lt;img src=x onerror=alert(1)&gt; <b>api</b>"
+    )
+
+def test_highlight_escapes_the_cut_window():
+    text = "x " * 200 + "<b>flask</b>" + " y" * 200
+    snippet = highlight(text, ["flask"])
+
+    assert snippet.startswith("...") and snippet.endswith("...")
+    assert "&lt;b&gt;<b>flask</b>&lt;/b&gt;" in snippet
+
+def test_postgres_headlines_are_escaped_before_their_marks_become_tags():
+    headline = f"<i>raw</i> {START_MARK}flask{STOP_MARK} & co"
+
+    assert escape_headline(headline) == "&lt;i&gt;raw&lt;/i&gt; <b>flask</b> &amp; co"
@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+from init import db
+from controllers.follower_controller import follow_page
+from models.comment import Comment, comments_schema
+from models.follower import Follower, followers_schema
+from models.like import Like, likes_schema
+from models.post import Post, posts_schema, thread_posts_schema
+from models.suggestion import Suggestion, suggestions_schema
+from models.thread import InnovationThread, threads_schema
+from models.user import User, profile_schema, users_schema
+from search import index_search, search_results_schema
+from serializers import dump
+from utils import get_fieldset, load_profile_summary, loader_options
+
+
+# Schemas dumping model instances, with the sparse fieldsets (query strings) each is checked with.
+MODEL_SCHEMAS = {
+    "posts": (Post, posts_schema, [
+        "", "fields=id,body,user.username", "include=user", "include=comments,likes", "fields=id,comments.user.username"
+    ]),
+    "thread_posts": (Post, thread_posts_schema, ["", "fields=id,timestamp,user.id"]),
+    "comments": (Comment, comments_schema, ["", "fields=id,comment_body", "include=user", "fields=posts.body"]),
+    "threads": (InnovationThread, threads_schema, [
+        "", "fields=id,title", "include=user", "fields=id,posts.body,posts.comments.comment_body"
+    ]),
+    "likes": (Like, likes_schema, ["", "fields=id", "include=posts"]),
+    "users": (User, users_schema, ["", "fields=id,username"]),
+}
+
+
+def assert_same_output(app, schema, data):
+    """
+    Asserts that the compiled serialiser returns what marshmallow does, down to the key order of the encoded JSON.
+    """
+    expected = schema.dump(data)
+    actual = dump(schema, data)
+    assert actual == expected
+    assert json.dumps(actual) == json.dumps(expected)
+    assert app.json.dumps(actual) == app.json.dumps(expected)
+
+def fieldset(app, schema, query):
+    with app.test_request_context(f"/?{query}"):
+        return get_fieldset(schema)
+
+
+@pytest.mark.parametrize(
+    "name, query",
+    [
+        pytest.param(name, query, id=f"{name}?{query}")
+        for name, (_, _, queries) in MODEL_SCHEMAS.items() for query in queries
+    ]
+)
+def test_model_schemas_dump_like_marshmallow(app, name, query):
+    model, schema, _ = MODEL_SCHEMAS[name]
+    schema = fieldset(app, schema, query)
+    with app.app_context():
+        stmt = db.select(model).options(*loader_options(model, schema)).order_by(model.id).limit(300)
+        rows = db.session.scalars(stmt).all()
+        assert rows
+        assert_same_output(app, schema, rows)
+
+@pytest.mark.parametrize("query", ["", "fields=username", "fields=follower_id,followed_id"])
+def test_follow_rows_dump_like_marshmallow(app, query):
+    schema = fieldset(app, followers_schema, query)
+    with app.app_context():
+        stmt = db.select(Follower.followed_id).group_by(Follower.followed_id).order_by(db.func.count().desc())
+        user_id = db.session.scalars(stmt).first()
+        for side in ("followers", "following"):
+            with app.test_request_context("/?limit=100"):
+                rows = db.session.execute(follow_page(user_id, side)[0]).all()
+            assert_same_output(app, schema, rows)
+
+def test_suggestion_rows_dump_like_marshmallow(app):
+    with app.app_context():
+        stmt = (
+            db.select(Suggestion.suggested_id, User.username, Suggestion.score)
+            .join(User, User.id == Suggestion.suggested_id)
+            .order_by(Suggestion.user_id, Suggestion.rank)
+        )
+        rows = db.session.execute(stmt).all()
+        assert rows
+        assert_same_output(app, suggestions_schema, rows)
+
+def test_search_results_dump_like_marshmallow(app):
+    with app.test_request_context("/"):
+        rows = index_search("api", None, 100)
+        assert rows
+        assert_same_output(app, search_results_schema, rows)
+
+@pytest.mark.parametrize("query", ["", "fields=id,username,post_count,recent_posts.body", "include=recent_likes"])
+def test_profile_dumps_like_marshmallow(app, query):
+    schema = fieldset(app, profile_schema, query)
+    with app.app_context():
+        users = db.session.scalars(db.select(User).options(*loader_options(User, schema)).order_by(User.id).limit(20))
+        for user in users:
+            load_profile_summary(user, schema)
+            assert_same_output(app, schema, user)
@@ -1,18 +1,56 @@
-from functools import wraps
-from flask_jwt_extended import get_jwt_identity
-from sqlalchemy.orm.exc import NoResultFound
+import base64
+import hashlib
+import json
+from datetime import date, datetime, timezone
+from functools import lru_cache, wraps
+
+from flask import current_app, g, make_response, request, stream_with_context
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from marshmallow import fields
+from sqlalchemy import inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import load_only, selectinload
 from psycopg2 import errorcodes
 
 from init import db
+from serializers import compile_schema, dump
 from models.user import User
 from models.post import Post
 from models.comment import Comment
 from models.like import Like
 from models.follower import Follower
 from models.thread import InnovationThread
+from models.ranking import Ranking
 
 
-def auth_user_action(model, id_arg_name):
+def get_current_user():
+    """
+    Returns the user identified by the request's JWT, loading it at most once per request.
+    """
+    if "current_user" not in g:
+        g.current_user = db.session.get(User, int(get_jwt_identity()))
+    return g.current_user
+
+
+def authorize(model, id_arg_name, inject, owner_field="user_id", name=None, options=(), **scope):
+    """
+    Loads the instance named by a URL argument and checks that the current user owns it or is an administrator.
+
+    Ownership is decided from the JWT identity and the loaded instance alone, so an owner's request costs a single
+    query. The current user is only loaded (once per request) when an administrator override has to be checked.
+    The loaded instance is passed to the view as a keyword argument.
+
+    Args:
+        model (Model): The model class to load.
+        id_arg_name (str): The URL argument holding the instance ID.
+        inject (str): The keyword argument the instance is passed to the view as.
+        owner_field (str): The instance attribute holding the owner's user ID.
+        name (str): Name used in error messages. Defaults to the model's class name.
+        options (tuple): Loader options applied to the query, e.g. to load a parent in the same round trip.
+        **scope: Model columns mapped to URL arguments the instance must also match, e.g. post_id="post_id".
+    """
+    name = name or model.__name__
+
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
@@ -20,116 +58,31 @@ def auth_user_action(model, id_arg_name):
             instance_id = kwargs.get(id_arg_name)
 
             if instance_id is None:
-                return {"error": "Instance ID not provided."}, 400
-
-            user = db.session.query(User).filter_by(id=user_id).first()
-            if not user:
-                return {"error": "User not found"}, 404
-    
-            instance = db.session.query(model).filter_by(id=instance_id).first()
-            if not instance:
-                return {"error": f"{model.__name__} with ID {instance_id} not found."}, 404
-            
-            is_admin = user.is_admin
-            is_owner = str(instance.id) == str(user_id)
-
-            if not is_admin and not is_owner:
-                return {"error": "Unauthorized to perform this action."}, 403
-            
-            kwargs[id_arg_name] = instance_id
+                return {"error": f"{name} ID not provided."}, 400
+
+            filters = {column: kwargs[arg] for column, arg in scope.items()}
+            stmt = db.select(model).filter_by(id=instance_id, **filters).options(*options)
+            instance = db.session.scalar(stmt)
+            if instance is None:
+                return {"error": f"{name} with ID {instance_id} not found."}, 404
+
+            if str(getattr(instance, owner_field)) == str(user_id):
+                if model is User:
+                    g.current_user = instance
+            else:
+                user = get_current_user()
+                if not user:
+                    return {"error": "User not found"}, 404
+                if not user.is_admin:
+                    return {"error": "Unauthorized to perform this action."}, 403
+
+            kwargs[inject] = instance
             return func(*args, **kwargs)
-        
-        return wrapper
-    
-    return decorator
-
-
-def auth_comment_action(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        user_id = get_jwt_identity()
-        comment_id = kwargs.get('comment_id')
-
-        if comment_id is None:
-            return {"error": "Comment ID not provided."}, 400
-
-        user = db.session.query(User).filter_by(id=user_id).first()
-        if not user:
-            return {"error": "User not found"}, 404
-
-        try:
-            comment = db.session.query(Comment).filter_by(id=comment_id).one()
-        except NoResultFound:
-            return {"error": f"Comment with ID {comment_id} not found."}, 404
 
-        is_admin = user.is_admin
-        is_owner = str(comment.user_id) == str(user_id)
-
-        if not is_admin and not is_owner:
-            return {"error": "Unauthorized to perform this action."}, 403
-
-        return func(*args, **kwargs)
-    
-    return wrapper
-
-
-def auth_like_action(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        user_id = get_jwt_identity()
-        like_id = kwargs.get('like_id')
-
-        if like_id is None:
-            return {"error": "Like ID not provided."}, 400
-
-        user = db.session.query(User).filter_by(id=user_id).first()
-        if not user:
-            return {"error": "User not found"}, 404
-
-        try:
-            like = db.session.query(Like).filter_by(id=like_id).one()
-        except NoResultFound:
-            return {"error": f"Like with ID {like_id} not found."}, 404
-
-        is_admin = user.is_admin
-        is_owner = str(like.user_id) == str(user_id)
-
-        if not is_admin and not is_owner:
-            return {"error": "Unauthorized to perform this action."}, 403
-
-        return func(*args, **kwargs)
-    
-    return wrapper
-
-
-
-def auth_thread_action(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        user_id = get_jwt_identity()
-        thread_id = kwargs.get("thread_id")
-
-        if thread_id is None:
-            return {"error": "Thread ID not provided."}, 400
-
-        user = db.session.query(User).filter_by(id=user_id).first()
-        if not user:
-            return {"error": "User not found"}, 404
-
-        thread = db.session.query(InnovationThread).filter_by(id=thread_id).first()
-        if not thread:
-            return {"error": f"Thread with ID {thread_id} not found."}, 404
-
-        is_admin = user.is_admin
-        is_owner = str(thread.user_id) == str(user_id)
-
-        if not is_admin and not is_owner:
-            return {"error": "Unauthorized to perform this action."}, 403
+        return wrapper
 
-        kwargs["thread_id"] = thread_id
-        return func(*args, **kwargs)
+    return decorator
 
-    return wrapper
 
 def auth_unfollow_action(func):
     @wraps(func)
@@ -143,38 +96,256 @@ def auth_unfollow_action(func):
         if int(current_user_id) == int(user_id):
             return {"error": "You cannot follow or unfollow yourself."}, 400
 
-        user = db.session.query(User).filter_by(id=user_id).first()
-        if not user:
-            return {"error": f"User with ID {user_id} not found."}, 404
-
-        existing_follow = Follower.query.filter_by(follower_id=current_user_id, followed_id=user_id).first()
+        stmt = db.select(Follower).filter_by(follower_id=current_user_id, followed_id=user_id)
+        existing_follow = db.session.scalar(stmt)
         if existing_follow is None:
+            if db.session.get(User, user_id) is None:
+                return {"error": f"User with ID {user_id} not found."}, 404
             return {"error": "You are already not following this user."}, 400
 
+        kwargs["follow"] = existing_follow
         return func(*args, **kwargs)
     
     return wrapper
 
 
-def get_post(post_id):
-    stmt = db.select(Post).filter_by(id=post_id)
+def get_post(post_id, *options):
+    stmt = db.select(Post).filter_by(id=post_id).options(*options)
     return db.session.scalar(stmt)
 
-def get_comment(comment_id, post_id):
-    stmt = db.select(Comment).filter_by(id=comment_id, post_id=post_id)
+def get_comment(comment_id, post_id, *options):
+    stmt = db.select(Comment).filter_by(id=comment_id, post_id=post_id).options(*options)
     return db.session.scalar(stmt)
 
-def get_user_by_id(user_id):
-    stmt = db.select(User).filter_by(id=user_id)
+def get_user_by_id(user_id, *options):
+    stmt = db.select(User).filter_by(id=user_id).options(*options)
     return db.session.scalar(stmt)
 
-def get_thread(thread_id):
-    stmt = db.select(InnovationThread).filter_by(id=thread_id)
+def get_thread(thread_id, *options):
+    stmt = db.select(InnovationThread).filter_by(id=thread_id).options(*options)
+    return db.session.scalar(stmt)
+
+def get_thread_post(post_id, thread_id, *options):
+    stmt = db.select(Post).filter_by(id=post_id, thread_id=thread_id).options(*options)
     return db.session.scalar(stmt)
 
-def get_thread_post(post_id, thread_id):
-    stmt = db.select(Post).filter_by(id=post_id, thread_id=thread_id)
-    post = db.session.scalar(stmt)
+
+def insert_ignore(model):
+    """
+    Returns an INSERT for a model that skips rows conflicting with a unique constraint (ON CONFLICT DO NOTHING).
+
+    Combined with RETURNING, a skipped row returns nothing, so duplicates are detected without a prior SELECT.
+    """
+    dialects = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+    dialect = db.session.get_bind().dialect.name
+    if dialect not in dialects:
+        raise NotImplementedError(f"INSERT ... ON CONFLICT is not supported on {dialect}.")
+    return dialects[dialect](model).on_conflict_do_nothing()
+
+def adjust_post_counters(*post_ids, likes=0, comments=0):
+    """
+    Adds to the denormalised like and comment counts of one or more posts in the current transaction.
+
+    The increment is evaluated by the database (SET like_count = like_count + n), so concurrent writers cannot
+    lose each other's updates. The update also bumps the version of the posts and of the threads containing them.
+    """
+    values = {}
+    if likes:
+        values["like_count"] = Post.like_count + likes
+    if comments:
+        values["comment_count"] = Post.comment_count + comments
+    if values and post_ids:
+        stmt = db.update(Post).where(Post.id.in_(post_ids)).values(**values).returning(Post.thread_id)
+        touch_thread(*db.session.scalars(stmt).all())
+
+def adjust_follow_counters(follower_id, *followed_ids, delta):
+    """
+    Adds delta to the follower count of each followed user and, once per followed user, to the following count of
+    the follower, in the current transaction. Like adjust_post_counters, the increments are evaluated by the database.
+    """
+    if not followed_ids:
+        return
+    db.session.execute(
+        db.update(User)
+        .where(User.id.in_(followed_ids))
+        .values(follower_count=User.follower_count + delta)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(
+        db.update(User)
+        .where(User.id == follower_id)
+        .values(following_count=User.following_count + delta * len(followed_ids))
+        .execution_options(synchronize_session=False)
+    )
+
+def touch_post(post):
+    """
+    Bumps the version of a post, and of the thread containing it, after something embedded in it changed.
+    """
+    db.session.execute(db.update(Post).where(Post.id == post.id).values(updated_at=db.func.now()))
+    touch_thread(post.thread_id)
+
+def touch_thread(*thread_ids):
+    """
+    Bumps the version of the threads whose posts changed. IDs of None, for posts outside a thread, are ignored.
+    """
+    thread_ids = {thread_id for thread_id in thread_ids if thread_id is not None}
+    if thread_ids:
+        stmt = db.update(InnovationThread).where(InnovationThread.id.in_(thread_ids)).values(updated_at=db.func.now())
+        db.session.execute(stmt)
+
+def release_user_counters(user_id):
+    """
+    Removes a user's likes and comments from the counts of the posts they were left on, and their follows from the
+    follower and following counts of the other users, ahead of deleting the user.
+    """
+    for model, column in ((Like, Post.like_count), (Comment, Post.comment_count)):
+        authored = (
+            db.select(db.func.count())
+            .where(model.post_id == Post.id, model.user_id == user_id)
+            .scalar_subquery()
+        )
+        stmt = (
+            db.update(Post)
+            .where(Post.id.in_(db.select(model.post_id).where(model.user_id == user_id)))
+            .values({column: column - authored})
+            .execution_options(synchronize_session=False)
+        )
+        db.session.execute(stmt)
+
+    for column, own_side, other_side in (
+        (User.follower_count, Follower.follower_id, Follower.followed_id),
+        (User.following_count, Follower.followed_id, Follower.follower_id)
+    ):
+        stmt = (
+            db.update(User)
+            .where(User.id.in_(db.select(other_side).where(own_side == user_id)))
+            .values({column: column - 1})
+            .execution_options(synchronize_session=False)
+        )
+        db.session.execute(stmt)
+
+
+def nested_schema(field):
+    if isinstance(field, fields.List):
+        field = field.inner
+    if isinstance(field, fields.Nested):
+        return field.schema
+    return None
+
+@lru_cache(maxsize=1024)
+def loader_options(model, schema, *columns, depth=4):
+    """
+    Builds the loading plan needed to dump instances of a model with a schema.
+
+    Only the columns the schema (after its only/exclude) will serialise are loaded, plus the primary and foreign keys
+    and any extra columns given. Every relationship it serialises is loaded with selectinload, recursing into the
+    nested schemas, so a dump issues one query per relationship in the plan no matter how many rows are returned.
+
+    Args:
+        model (Model): The model class being queried.
+        schema (Schema): The schema instance that will dump the results.
+        *columns (InstrumentedAttribute): Columns the caller reads besides the schema's, e.g. keyset pagination keys.
+        depth (int): Maximum nesting depth to follow.
+
+    Returns:
+        tuple: Loader options to pass to Select.options().
+    """
+    if depth == 0:
+        return ()
+    mapper = inspect(model)
+    relationships = mapper.relationships
+    loaded_columns = {column.key for column in columns}
+    loaded_columns.update(
+        prop.key for prop in mapper.column_attrs
+        if any(column.primary_key or column.foreign_keys for column in prop.columns)
+    )
+    options = []
+    for name, field in schema.dump_fields.items():
+        key = field.attribute or name
+        if key in mapper.column_attrs:
+            loaded_columns.add(key)
+        relationship = relationships.get(key)
+        if relationship is None or relationship.lazy == "dynamic":
+            continue
+        loader = selectinload(getattr(model, relationship.key))
+        nested = nested_schema(field)
+        if nested is not None:
+            loader = loader.options(*loader_options(relationship.mapper.class_, nested, depth=depth - 1))
+        options.append(loader)
+    options.append(load_only(*[mapper.column_attrs[key].class_attribute for key in sorted(loaded_columns)]))
+    return tuple(options)
+
+def split_fields(value):
+    return [name.strip() for name in (value or "").split(",") if name.strip()]
+
+def check_field(schema, name, path=None):
+    head, _, rest = name.partition(".")
+    field = schema.dump_fields.get(head)
+    nested = nested_schema(field) if field is not None else None
+    if field is None or (rest and nested is None):
+        raise ValueError(f"Unknown field '{path or name}'.")
+    if rest:
+        check_field(nested, rest, path or name)
+
+@lru_cache(maxsize=256)
+def pruned_schema(schema, only):
+    return type(schema)(only=only, exclude=schema.exclude, many=schema.many, context=schema.context)
+
+def get_fieldset(schema):
+    """
+    Prunes a schema to the sparse fieldset requested with the `fields` and `include` query parameters.
+
+    `fields` lists the fields to return, using dotted names for the fields of nested objects (e.g. id,body,user.username).
+    `include` lists the nested objects to return; when it is given, nested objects that are not listed are left out.
+    The pruned schema is cached, so loader_options and the compiled serialisers are only built once per fieldset.
+    Clients choose the fieldsets, so all three caches are bounded.
+
+    Raises:
+        ValueError: If a requested field does not exist in the schema.
+    """
+    requested, included = split_fields(request.args.get("fields")), split_fields(request.args.get("include"))
+    if not requested and not included:
+        return schema
+    for name in requested + included:
+        check_field(schema, name)
+
+    only = set(requested)
+    if included:
+        if not requested:
+            only.update(name for name, field in schema.dump_fields.items() if nested_schema(field) is None)
+        only.update(included)
+    order = list(schema.dump_fields)
+    return pruned_schema(schema, tuple(sorted(only, key=lambda name: (order.index(name.partition(".")[0]), name))))
+
+def user_collection(user_id, collection, schema):
+    """
+    Selects a user's threads, posts, comments or likes with the loader options needed to dump them with a schema.
+    """
+    model, keys = USER_COLLECTIONS[collection]
+    return db.select(model).where(model.user_id == user_id).options(*loader_options(model, schema, *keys))
+
+def load_profile_summary(user, schema):
+    """
+    Sets the counts and most recent items of a user's threads, posts, comments and likes that a profile schema dumps
+    (e.g. post_count and recent_posts) as attributes of the user.
+
+    The counts are read together in one query and each list of recent items with an index-ordered LIMIT, so the cost
+    of a profile does not grow with the user's history. The number of recent items is set by PROFILE_RECENT_ITEMS.
+    """
+    limit = current_app.config["PROFILE_RECENT_ITEMS"]
+    counts = {}
+    for collection, (model, keys) in USER_COLLECTIONS.items():
+        if f"{collection[:-1]}_count" in schema.dump_fields:
+            counts[f"{collection[:-1]}_count"] = db.select(db.func.count()).where(model.user_id == user.id).scalar_subquery()
+        field = schema.dump_fields.get(f"recent_{collection}")
+        if field is not None:
+            stmt = user_collection(user.id, collection, nested_schema(field)).order_by(*[key.desc() for key in keys]).limit(limit)
+            setattr(user, f"recent_{collection}", db.session.scalars(stmt).all())
+    if counts:
+        row = db.session.execute(db.select(*counts.values())).one()
+        for name, count in zip(counts, row):
+            setattr(user, name, count)
 
 def handle_db_exceptions(error):
     db.session.rollback()
@@ -185,4 +356,277 @@ def handle_db_exceptions(error):
         errorcodes.CHECK_VIOLATION: "Check constraint failed",
         errorcodes.EXCLUSION_VIOLATION: "Exclusion constraint failed"
     }
-    return {"error": error_map.get(error.orig.pgcode, "Database error")}, 500
\ No newline at end of file
+    return {"error": error_map.get(error.orig.pgcode, "Database error")}, 500
+
+
+# A user's collections and the columns that order them, newest first. Profiles show the most recent items of each,
+# and /users/<id>/<collection> pages through them.
+USER_COLLECTIONS = {
+    "threads": (InnovationThread, (InnovationThread.timestamp, InnovationThread.id)),
+    "posts": (Post, (Post.timestamp, Post.id)),
+    "comments": (Comment, (Comment.timestamp, Comment.id)),
+    "likes": (Like, (Like.id,)),
+}
+
+# Streamed response formats and their content types.
+STREAM_FORMATS = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+
+DEFAULT_PAGE_LIMIT = 20
+MAX_PAGE_LIMIT = 100
+MAX_BATCH_SIZE = 100
+
+
+def encode_cursor(values):
+    payload = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor, keys):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError
+        decoded = []
+        for key, value in zip(keys, values):
+            python_type = key.type.python_type
+            if value is not None:
+                value = python_type.fromisoformat(value) if python_type in (date, datetime) else python_type(value)
+            decoded.append(value)
+        return decoded
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError("Invalid pagination cursor.")
+
+def get_page_args():
+    cursor = request.args.get("cursor") or None
+    limit = request.args.get("limit", DEFAULT_PAGE_LIMIT)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError("Limit must be an integer.")
+    if limit < 1 or limit > MAX_PAGE_LIMIT:
+        raise ValueError(f"Limit must be between 1 and {MAX_PAGE_LIMIT}.")
+    return cursor, limit
+
+def get_batch_ids(key):
+    """
+    Reads a list of IDs for a batch endpoint from the JSON body, dropping repeats but keeping the order.
+
+    Raises:
+        ValueError: If the list is missing, empty, longer than MAX_BATCH_SIZE or holds anything but integers.
+    """
+    body = request.get_json(silent=True)
+    ids = body.get(key) if isinstance(body, dict) else None
+    if not isinstance(ids, list) or not ids:
+        raise ValueError(f"'{key}' must be a non-empty list of IDs.")
+    if len(ids) > MAX_BATCH_SIZE:
+        raise ValueError(f"'{key}' cannot hold more than {MAX_BATCH_SIZE} IDs.")
+    if not all(isinstance(value, int) and not isinstance(value, bool) for value in ids):
+        raise ValueError(f"'{key}' must only contain integer IDs.")
+    return list(dict.fromkeys(ids))
+
+def keyset(stmt, cursor, limit, *keys):
+    """
+    Restricts a select to one page in descending order of the given key columns.
+
+    The last key must be unique (normally the primary key) so the ordering is total. One extra row is
+    fetched so the caller can tell whether another page follows.
+    """
+    if cursor:
+        stmt = stmt.where(db.tuple_(*keys) < db.tuple_(*decode_cursor(cursor, keys)))
+    return stmt.order_by(*[key.desc() for key in keys]).limit(limit + 1)
+
+def page_response(schema, rows, limit, *keys):
+    rows = list(rows)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], key.key) for key in keys])
+    return {"data": dump(schema, rows), "next_cursor": next_cursor}
+
+def trending(kind, model, limit, *columns):
+    """
+    Selects the given columns of the highest scored posts or threads in the rankings table, best first.
+
+    The rankings index is read backwards from the top score, so the cost depends on the limit alone.
+    """
+    return (
+        db.select(*columns)
+        .join(Ranking, db.and_(Ranking.kind == kind, Ranking.item_id == model.id))
+        .order_by(Ranking.score.desc(), Ranking.item_id.desc())
+        .limit(limit)
+    )
+
+def paginate(stmt, schema, *keys):
+    """
+    Runs a select one keyset page at a time using the cursor and limit query parameters.
+
+    Args:
+        stmt (Select): The select to paginate, without an ORDER BY.
+        schema (Schema): Schema (many=True) used to serialise the rows.
+        *keys (Column): Columns that define the page order, most significant first.
+
+    Returns:
+        dict: The serialised rows under "data" and the cursor of the next page under "next_cursor".
+
+    Raises:
+        ValueError: If the cursor or limit query parameters are invalid.
+    """
+    cursor, limit = get_page_args()
+    rows = db.session.scalars(keyset(stmt, cursor, limit, *keys)).all()
+    return page_response(schema, rows, limit, *keys)
+
+def get_stream_format():
+    """
+    Returns the format requested with the `stream` query parameter ("json" or "ndjson"), or None for a paged response.
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    stream_format = request.args.get("stream")
+    if stream_format is not None and stream_format not in STREAM_FORMATS:
+        raise ValueError(f"Stream must be one of: {', '.join(STREAM_FORMATS)}.")
+    return stream_format
+
+def stream_response(stmt, schema, stream_format, *keys, owner_id=None):
+    """
+    Streams every row of a select, in descending order of the keys, as a chunked JSON array or NDJSON.
+
+    Rows are read through a server-side cursor in batches of STREAM_BATCH_SIZE and each batch is serialised and sent
+    before the next is read, so memory use stays flat however many rows are returned. Streaming is open to
+    administrators and, when owner_id is given, to the owner of the rows. A `cursor` query parameter resumes the
+    stream after the row it points at.
+
+    Args:
+        stmt (Select): The select to stream, without an ORDER BY.
+        schema (Schema): Schema used to serialise each row.
+        stream_format (str): "json" for a single array, "ndjson" for one object per line.
+        *keys (Column): Columns that define the order, most significant first.
+        owner_id (int): The ID of the user whose rows are streamed, who may stream them without being an administrator.
+
+    Returns:
+        Response: The streamed response, or an error message with a 401 or 403 status.
+
+    Raises:
+        ValueError: If the cursor query parameter is invalid.
+    """
+    verify_jwt_in_request(optional=True)
+    user_id = get_jwt_identity()
+    if user_id is None:
+        return {"error": "Streaming requires an access token."}, 401
+    if owner_id is None or str(owner_id) != str(user_id):
+        user = get_current_user()
+        if not user or not user.is_admin:
+            return {"error": "Unauthorized to perform this action."}, 403
+
+    cursor = request.args.get("cursor")
+    if cursor:
+        stmt = stmt.where(db.tuple_(*keys) < db.tuple_(*decode_cursor(cursor, keys)))
+    stmt = stmt.order_by(*[key.desc() for key in keys]).execution_options(yield_per=current_app.config["STREAM_BATCH_SIZE"])
+    serialize = compile_schema(schema)
+    encode = current_app.json.dumps
+
+    def generate():
+        separator = ""
+        if stream_format == "json":
+            yield "["
+        for rows in db.session.scalars(stmt).partitions():
+            if stream_format == "json":
+                yield separator + ",".join(encode(serialize(row)) for row in rows)
+                separator = ","
+            else:
+                yield "".join(encode(serialize(row)) + "\n" for row in rows)
+        if stream_format == "json":
+            yield "]"
+
+    return current_app.response_class(stream_with_context(generate()), mimetype=STREAM_FORMATS[stream_format])
+
+
+def user_versions(column, *where):
+    """
+    Selects the sum of the versions of the users a column (e.g. Comment.user_id) refers to in the rows matching the
+    conditions.
+    """
+    return (
+        db.select(db.func.coalesce(db.func.sum(User.version), 0))
+        .join_from(column.class_, User, User.id == column)
+        .where(*where)
+        .scalar_subquery()
+    )
+
+def embedded_user_versions(model, nested=True):
+    """
+    Selects the versions of the users whose usernames the serialised rows of a model embed, for the version queries
+    of conditional views: the author of each row and, for posts and threads, the users who commented on or liked
+    them. Renaming a user bumps their version, so it changes the ETag of every response embedding them.
+
+    Commenters and likers are summed per row; adding or removing a comment or like already bumps the version of its
+    post and thread.
+
+    Args:
+        model (Model): Post, Comment, InnovationThread or Like.
+        nested (bool): Also selects the commenters and likers, for schemas embedding the comments and likes.
+    """
+    columns = [db.select(User.version).where(User.id == model.user_id).scalar_subquery()]
+    if nested and model is Post:
+        columns.append(user_versions(Comment.user_id, Comment.post_id == Post.id))
+        columns.append(user_versions(Like.user_id, Like.post_id == Post.id))
+    elif nested and model is InnovationThread:
+        in_thread = (Post.thread_id == InnovationThread.id,)
+        columns.append(user_versions(Comment.user_id, Comment.post_id == Post.id, *in_thread))
+        columns.append(user_versions(Like.user_id, Like.post_id == Post.id, *in_thread))
+    return columns
+
+def conditional(version_query, last_modified=False):
+    """
+    Adds an ETag, and optionally a Last-Modified, validator to a GET view and answers matching conditional requests
+    with 304.
+
+    The validators are computed from a lightweight version query instead of the response body, so a request for an
+    unchanged resource skips the main query and the marshmallow dump entirely.
+
+    Args:
+        version_query (callable): Receives the view's keyword arguments and returns a select of the version columns
+            (e.g. id, version, updated_at) of every entity the response depends on. When it returns no rows, or
+            raises ValueError for invalid pagination arguments, the view runs unconditionally. Streamed responses
+            are never conditional.
+        last_modified (bool): Also sends Last-Modified, the latest updated_at of the version rows. Only for views
+            whose version rows are bumped when anything in the response is deleted (a single post, comment or
+            thread). Removing a row from a list leaves the latest updated_at of the remaining rows unchanged, so
+            lists are validated by their ETag alone.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if "stream" in request.args:
+                return func(*args, **kwargs)
+            try:
+                rows = db.session.execute(version_query(**kwargs)).all()
+            except ValueError:
+                rows = None
+            if not rows:
+                return func(*args, **kwargs)
+
+            source = repr((request.full_path, [tuple(row) for row in rows]))
+            etag = hashlib.sha1(source.encode("utf-8")).hexdigest()
+            modified = None
+            if last_modified:
+                timestamps = [value for row in rows for value in row if isinstance(value, datetime)]
+                modified = max(timestamps).replace(microsecond=0, tzinfo=timezone.utc) if timestamps else None
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            else:
+                not_modified = bool(modified and request.if_modified_since and modified <= request.if_modified_since)
+
+            response = make_response(("", 304) if not_modified else func(*args, **kwargs))
+            if not_modified or response.status_code == 200:
+                response.set_etag(etag)
+                if modified:
+                    response.last_modified = modified
+            return response
+
+        return wrapper
+
+    return decorator